@@ -0,0 +1,98 @@
+"""
+Compact, token-budgeted RAG context for agent prompts.
+Retrieved tickets and documentation chunks are deduplicated, trimmed to
+RAG_SNIPPET_MAX_TOKENS each and added most relevant first until
+RAG_CONTEXT_TOKEN_BUDGET is spent, then rendered as one line per item:
+
+    Similar past tickets:
+    - OPS-12 (Bug, Done): Daily ingestion failed. The bronze job stopped after...
+    Relevant documentation:
+    - [runbook.md] Restart the ingestion worker with...
+"""
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.rag.chunker import estimate_tokens, CHARS_PER_TOKEN
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+SNIPPET_MAX_TOKENS = int(os.getenv("RAG_SNIPPET_MAX_TOKENS", "150"))
+
+SECTIONS = [
+    ("similar_tickets", "Similar past tickets:"),
+    ("relevant_docs", "Relevant documentation:"),
+]
+TICKET_TEXT_PATTERN = re.compile(r"Summary:\s*(.*?)\s*Description:\s*(.*)", re.DOTALL)
+
+
+def compact(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def trim(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens at a word boundary, marking the cut with '...'."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit - 3)
+    return text[:cut if cut > limit // 2 else limit - 3].rstrip(" .,;:") + "..."
+
+
+def render_ticket(ticket_id: str, text: str, metadata: Dict[str, Any], max_tokens: int) -> str:
+    match = TICKET_TEXT_PATTERN.match(text)
+    summary, description = (compact(match.group(1)), compact(match.group(2))) if match else ("", compact(text))
+    body = f"{summary.rstrip('.')}. {description}" if summary and description else summary or description
+    labels = [value for value in (metadata.get('issuetype'), metadata.get('status')) if value and value != "Unknown"]
+    prefix = f"{ticket_id} ({', '.join(labels)})" if labels else ticket_id
+    return f"- {prefix}: {trim(body, max_tokens)}"
+
+
+def render_doc(text: str, metadata: Dict[str, Any], max_tokens: int) -> str:
+    source = metadata.get('source') or metadata.get('parent_id')
+    body = trim(compact(text), max_tokens)
+    return f"- [{source}] {body}" if source else f"- {body}"
+
+
+def build_rag_context(retrieved: Optional[Dict[str, Any]], budget: int = None,
+                      snippet_tokens: int = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Render query_context() results within `budget` tokens. Returns the text
+    and a usage report: tokens and kept ids per section, items dropped.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    snippet_tokens = snippet_tokens or SNIPPET_MAX_TOKENS
+
+    # (relevance, section, id, line), deduplicated by id and by normalized text
+    candidates: List[Tuple[float, str, str, str]] = []
+    seen = set()
+    for section, _ in SECTIONS:
+        result = (retrieved or {}).get(section) or {}
+        rows = zip(result.get('ids', [[]])[0], result.get('documents', [[]])[0],
+                   result.get('metadatas', [[]])[0], result.get('distances', [[]])[0])
+        for item_id, text, metadata, distance in rows:
+            fingerprint = compact(text).lower()
+            if not fingerprint or item_id in seen or fingerprint in seen:
+                continue
+            seen.update((item_id, fingerprint))
+            line = (render_ticket(item_id, text, metadata or {}, snippet_tokens) if section == "similar_tickets"
+                    else render_doc(text, metadata or {}, snippet_tokens))
+            candidates.append((1.0 - distance, section, item_id, line))
+
+    # Most relevant first; items that do not fit are skipped so smaller ones can
+    kept: Dict[str, List[str]] = {section: [] for section, _ in SECTIONS}
+    usage = {"budget": budget, "tokens": 0, "dropped": 0,
+             "sections": {section: {"items": 0, "tokens": 0, "ids": []} for section, _ in SECTIONS}}
+    for _, section, item_id, line in sorted(candidates, key=lambda candidate: candidate[0], reverse=True):
+        # A section's header is paid for with its first item
+        cost = estimate_tokens(line + "\n") + (0 if kept[section] else estimate_tokens(dict(SECTIONS)[section] + "\n"))
+        if usage["tokens"] + cost > budget:
+            usage["dropped"] += 1
+            continue
+        kept[section].append(line)
+        usage["tokens"] += cost
+        usage["sections"][section]["items"] += 1
+        usage["sections"][section]["tokens"] += cost
+        usage["sections"][section]["ids"].append(item_id)
+
+    blocks = ["\n".join([header, *kept[section]]) for section, header in SECTIONS if kept[section]]
+    return "\n".join(blocks), usage
@@ -1,43 +1,52 @@
-import os
 import json
-from typing import Dict, Any, List
-from google import genai
-from google.genai import types
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
-# RAG with Pinecone for production
+# RAG store (Pinecone in production, local backend otherwise)
 from app.rag.store import rag_store
+from app.services.gemini_client import gemini_client
+from app.services.llm_cache import llm_cache, cache_key
+from app.agents.context_builder import build_rag_context
+
+# Bump when the prompt changes so cached results from the old prompt are not reused
+PROMPT_VERSION = 3
 
 class RequestCreatorAgent:
     def __init__(self):
-        self.api_key = os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
+        if not gemini_client.configured:
             print("WARNING: GOOGLE_API_KEY not found. Agent will fail.")
-            self.client = None
-        else:
-            self.client = genai.Client(api_key=self.api_key)
 
         self.model = "gemini-2.0-flash-exp"
 
-    async def create_request(self, context: str, project_config: Dict[str, Any] = None, jira_schema: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def _prepare(self, context: str, jira_schema: Dict[str, Any] = None,
+                       rag_filters: Dict[str, Any] = None) -> Dict[str, Any]:
         """
-        Decomposes a raw request into a structured JIRA issue using RAG.
+        Retrieve RAG context and build the prompt. Returns the prompt, the
+        result-cache key (None when RAG failed, so the result is not cached),
+        the context usage report and the retrieval time.
         """
-        if not self.client:
-            return self._fallback_creation(context)
-
         # 1. Retrieve Context (RAG with Pinecone)
+        started = time.perf_counter()
+        usage = None
         try:
-            similar_tickets = rag_store.query_similar_tickets(context) if rag_store else None
-            relevant_docs = rag_store.query_docs(context) if rag_store else None
-
-            rag_context = ""
-            if similar_tickets:
-                rag_context += "\nSimilar Past Tickets:\n" + json.dumps(similar_tickets, indent=2)
-            if relevant_docs:
-                rag_context += "\nRelevant Documentation:\n" + str(relevant_docs)
+            # One query embedding, both indexes queried concurrently, off the event loop
+            store = await rag_store.aget()
+            retrieved = await store.aquery_context(context, filters=rag_filters) if store else None
+            retrieved_ids = {
+                key: retrieved[key]['ids'][0] for key in ('similar_tickets', 'relevant_docs')
+            } if retrieved else {}
+
+            # Deduplicated, trimmed and capped at RAG_CONTEXT_TOKEN_BUDGET
+            rag_context, usage = build_rag_context(retrieved)
+            print(f"RAG context: {usage['tokens']}/{usage['budget']} tokens "
+                  f"(tickets {usage['sections']['similar_tickets']['tokens']}, "
+                  f"docs {usage['sections']['relevant_docs']['tokens']}, dropped {usage['dropped']})")
         except Exception as e:
             print(f"RAG query error: {e}")
             rag_context = "\n(RAG temporarily unavailable - using direct AI inference)"
+            # Not cached: a retry once RAG is back should see the retrieved context
+            retrieved_ids = None
+        retrieval_seconds = time.perf_counter() - started
 
         # 2. Define Schema
         if jira_schema:
@@ -72,7 +81,7 @@ class RequestCreatorAgent:
         Do not invent new keys or use default JIRA keys if they are not in the schema.
         
         Target Schema (JSON):
-        {json.dumps(schema, indent=2)}
+        {json.dumps(schema)}
         
         Instructions:
         - Map the extracted information to the fields defined in the Target Schema.
@@ -95,21 +104,105 @@ class RequestCreatorAgent:
         Ensure the output is valid JSON matching the schema.
         """
 
-        # 4. Generate Content
+        key = None
+        if retrieved_ids is not None:
+            key = cache_key("request_creator", self.model, context, prompt_version=PROMPT_VERSION,
+                            schema=schema, retrieved=retrieved_ids)
+        return {"prompt": prompt, "cache_key": key, "usage": usage, "retrieval_seconds": retrieval_seconds}
+
+    def _cached(self, key: Optional[str], use_cache: bool) -> Optional[Dict[str, Any]]:
+        if not use_cache:
+            llm_cache.record_bypass()
+            return None
+        return llm_cache.get(key) if key else None
+
+    async def create_request(self, context: str, project_config: Dict[str, Any] = None, jira_schema: Dict[str, Any] = None,
+                             rag_filters: Dict[str, Any] = None, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Decomposes a raw request into a structured JIRA issue using RAG.
+        `rag_filters` restricts similar tickets (e.g. {"project": "PROJ"}).
+        Results are cached per (normalized context, schema, retrieved ids,
+        model); use_cache=False skips the lookup and stores a fresh result.
+        """
+        if not gemini_client.configured:
+            return self._fallback_creation(context)
+
+        plan = await self._prepare(context, jira_schema, rag_filters)
+
+        # 4. Generate Content (or reuse the result for identical inputs)
+        cached = self._cached(plan["cache_key"], use_cache)
+        if cached is not None:
+            return cached
+
         try:
-            response = self.client.models.generate_content(
+            # Shared async client; rate limited and retried on 429/5xx
+            text = await gemini_client.agenerate(
+                plan["prompt"],
                 model=self.model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
+                response_mime_type="application/json"
             )
-            
-            return json.loads(response.text)
+
+            result = self._parse_result(text)
+            if plan["cache_key"]:
+                llm_cache.put(plan["cache_key"], "request_creator", result)
+            return result
         except Exception as e:
             print(f"Error in RequestCreatorAgent: {e}")
             return self._fallback_creation(context)
 
+    async def stream_request(self, context: str, jira_schema: Dict[str, Any] = None,
+                             rag_filters: Dict[str, Any] = None,
+                             use_cache: bool = True) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        create_request() as (event, data) stages:
+          retrieval - context retrieved: ids used, token usage, seconds
+          token     - a piece of the model's JSON as it is generated
+          result    - the parsed result ("cached" when served from the cache,
+                      "fallback" when generation or parsing failed)
+        Closing the generator early stops the generation.
+        """
+        if not gemini_client.configured:
+            yield "result", {"result": self._fallback_creation(context), "fallback": True}
+            return
+
+        plan = await self._prepare(context, jira_schema, rag_filters)
+        usage = plan["usage"]
+        yield "retrieval", {
+            "available": usage is not None,
+            "ids": {section: info["ids"] for section, info in usage["sections"].items()} if usage else {},
+            "tokens": usage["tokens"] if usage else 0,
+            "seconds": round(plan["retrieval_seconds"], 3)
+        }
+
+        cached = self._cached(plan["cache_key"], use_cache)
+        if cached is not None:
+            yield "result", {"result": cached, "cached": True}
+            return
+
+        chunks = []
+        try:
+            async for chunk in gemini_client.astream(plan["prompt"], model=self.model,
+                                                     response_mime_type="application/json"):
+                if chunk:
+                    chunks.append(chunk)
+                    yield "token", {"text": chunk}
+            result = self._parse_result("".join(chunks))
+        except Exception as e:
+            print(f"Error in RequestCreatorAgent stream: {e}")
+            yield "result", {"result": self._fallback_creation(context), "fallback": True, "error": str(e)}
+            return
+
+        if plan["cache_key"]:
+            llm_cache.put(plan["cache_key"], "request_creator", result)
+        yield "result", {"result": result}
+
+    def _parse_result(self, text: str) -> Dict[str, Any]:
+        """The model's JSON output; anything but an object (e.g. [] or "n/a") is an error."""
+        result = json.loads(text)
+        if not isinstance(result, dict):
+            raise ValueError(f"expected a JSON object, got {type(result).__name__}")
+        return result
+
     def _fallback_creation(self, context: str) -> Dict[str, Any]:
         return {
             "summary": f"New Request: {context[:50]}...",
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from app.database import get_db
 from app.models.connection import Connection
 from app.services.jira_service import JiraService
+from app.services.schema_compiler import schema_compiler
 
 router = APIRouter()
 
@@ -56,6 +57,7 @@ def update_connection(connection_id: int, updates: ConnectionUpdate, db: Session
         db_connection.jira_project_key = updates.jira_project_key
     if updates.field_config is not None:
         db_connection.field_config = updates.field_config
+        schema_compiler.invalidate(connection_id)
     
     db.commit()
     db.refresh(db_connection)
@@ -130,6 +132,7 @@ def get_field_config(connection_id: int, db: Session = Depends(get_db)):
     # Save to database
     db_connection.field_config = field_config
     db.commit()
+    schema_compiler.invalidate(connection_id)
     
     return field_config
 
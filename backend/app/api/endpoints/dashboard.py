@@ -2,6 +2,9 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.request import Request
+from app.services.rate_limiter import gemini_limiter
+from app.services.gemini_client import gemini_client
+from app.services.llm_cache import llm_cache
 
 router = APIRouter()
 
@@ -33,3 +36,16 @@ def get_activity(db: Session = Depends(get_db)):
         }
         for r in recent
     ]
+
+@router.get("/llm-cache")
+def get_llm_cache_stats():
+    """Agent result cache size, hit rate, bypasses and evictions."""
+    return llm_cache.stats()
+
+@router.get("/rate-limits")
+def get_rate_limits():
+    """
+    Gemini throttling counters per model (requests, throttled, retries, failed,
+    dropped) and shared-client call counts and latency per operation:model.
+    """
+    return {"limits": gemini_limiter.stats(), "calls": gemini_client.stats()}
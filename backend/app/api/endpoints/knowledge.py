@@ -1,17 +1,19 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from fastapi.responses import FileResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from typing import List
-import csv
-import io
+from typing import List, Optional
 import os
+import time
 import shutil
 from pathlib import Path
-# RAG with Pinecone for production
-from app.rag.store import rag_store
-from app.services.parsing_service import docling_parser
 from app.database import get_db
-from app.models.knowledge_item import KnowledgeItem
+from app.rag.store import rag_store
+from app.models.ingestion_job import IngestionJob
+from app.services.knowledge_ingestion import ingest_file, delete_items, reconcile_vectors
+from app.services.ingestion_jobs import ingestion_queue
+from app.services.blocking import run_blocking
+from app.services.knowledge_content import list_items, get_document_content, get_jira_ticket_content
 
 router = APIRouter()
 
@@ -20,139 +22,72 @@ router = APIRouter()
 UPLOAD_DIR = Path("/tmp/uploaded_files")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-def get_mime_type(filename: str) -> str:
-    """Determine MIME type from filename."""
-    ext = filename.lower().split('.')[-1]
-    mime_types = {
-        'pdf': 'application/pdf',
-        'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        'doc': 'application/msword',
-        'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-        'ppt': 'application/vnd.ms-powerpoint',
-        'txt': 'text/plain',
-        'md': 'text/markdown',
-        'csv': 'text/csv',
-        'png': 'image/png',
-        'jpg': 'image/jpeg',
-        'jpeg': 'image/jpeg',
-    }
-    return mime_types.get(ext, 'application/octet-stream')
-
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Universal file upload endpoint with Gemini-powered parsing."""
+async def upload_file(file: UploadFile = File(...), prune: bool = False, background: bool = False,
+                      connection_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Universal file upload endpoint with Gemini-powered parsing.
+    Re-uploads are incremental; with prune=true a JIRA CSV is treated as the
+    full ticket set and tickets missing from it are removed.
+    With background=true the file is queued as an ingestion job and the job
+    id is returned immediately (see /jobs/{job_id}). JIRA tickets are tagged
+    with their project key and the optional connection_id for filtered retrieval.
+    """
     try:
-        content = await file.read()
-        
-        # Save original file
+        # Save original file (streamed from the spooled upload, never fully in memory)
         file_path = UPLOAD_DIR / file.filename
+        file.file.seek(0)
         with open(file_path, 'wb') as f:
-            f.write(content)
-        
-        # Check if it's a JIRA CSV based on headers
-        if file.filename.endswith('.csv'):
-            try:
-                decoded_content = content.decode('utf-8')
-                csv_reader = csv.DictReader(io.StringIO(decoded_content))
-                first_row = next(csv_reader, None)
-                
-                # Check if it looks like JIRA export
-                if first_row and any(key in first_row for key in ['Issue key', 'Key', 'Summary']):
-                    # Process as JIRA CSV
-                    csv_reader = csv.DictReader(io.StringIO(decoded_content))
-                    tickets = []
-                    for row in csv_reader:
-                        ticket = {
-                            "id": row.get('Issue key', row.get('Key', f"CSV-{len(tickets)}")),
-                            "summary": row.get('Summary', ''),
-                            "description": row.get('Description', ''),
-                            "status": row.get('Status', 'Unknown'),
-                            "issuetype": row.get('Issue Type', 'Unknown')
-                        }
-                        if ticket['id']:
-                            tickets.append(ticket)
-                    
-                    if tickets:
-                        rag_store.add_jira_tickets(tickets)
-
-                        # Save each ticket to database
-                        for ticket in tickets:
-                            knowledge_item = KnowledgeItem(
-                                item_id=ticket['id'],
-                                item_type="jira_ticket",
-                                title=ticket['summary'],
-                                status=ticket.get('status', 'Unknown'),
-                                issue_type=ticket.get('issuetype', 'Unknown'),
-                                chunk_count=1
-                            )
-                            db.merge(knowledge_item)  # Use merge to handle duplicates
-                        db.commit()
+            shutil.copyfileobj(file.file, f)
 
-                        return {
-                            "message": f"Successfully uploaded {file.filename} as JIRA history",
-                            "type": "jira_csv",
-                            "count": len(tickets)
-                        }
-            except:
-                pass  # If not JIRA CSV, treat as document
-        
-        # Process as document using Docling parser
-        mime_type = get_mime_type(file.filename)
-        
-        try:
-            # Use Docling for advanced parsing (97.9% table accuracy)
-            text_content = await docling_parser.parse_document(content, file.filename, mime_type)
-        except Exception as e:
-            print(f"Docling parsing failed, using fallback: {e}")
-            # Fallback to basic extraction for text files
-            if file.filename.endswith(('.txt', '.md')):
-                text_content = content.decode('utf-8')
-            else:
-                text_content = f"# {file.filename}\n\n[Advanced parsing unavailable - content stored as binary]"
-        
-        doc = {
-            "id": file.filename,
-            "content": text_content,
-            "source": file.filename
-        }
-
-        rag_store.add_documents([doc])
-
-        # Calculate chunk count (simple chunking by paragraphs)
-        chunks = [chunk.strip() for chunk in text_content.split('\n\n') if chunk.strip()]
-
-        # Save document metadata to database
-        knowledge_item = KnowledgeItem(
-            item_id=file.filename,
-            item_type="document",
-            title=file.filename,
-            file_path=str(file_path),
-            file_size=len(content),
-            mime_type=mime_type,
-            chunk_count=len(chunks)
-        )
-        db.merge(knowledge_item)  # Use merge to handle duplicates
-        db.commit()
+        if background:
+            job = ingestion_queue.enqueue(db, file.filename, file_path, prune=prune, connection_id=connection_id)
+            return {
+                "message": f"Queued {file.filename} for ingestion",
+                "job_id": job.id,
+                "status": job.status
+            }
 
-        return {
-            "message": f"Successfully uploaded {file.filename}",
-            "type": "document",
-            "size": len(text_content)
-        }
+        return await ingest_file(db, file_path, file.filename, prune=prune, connection_id=connection_id)
     
     except HTTPException:
         raise
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@router.get("/jobs")
+async def list_ingestion_jobs(limit: int = 50, db: Session = Depends(get_db)):
+    """List recent ingestion jobs, newest first."""
+    jobs = db.query(IngestionJob).order_by(IngestionJob.id.desc()).limit(limit).all()
+    return {
+        "jobs": [job.to_dict() for job in jobs],
+        "total": len(jobs)
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: int, db: Session = Depends(get_db)):
+    """Get an ingestion job's status and progress."""
+    job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_ingestion_job(job_id: int, db: Session = Depends(get_db)):
+    """Cancel a queued or running ingestion job."""
+    job = ingestion_queue.cancel(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 @router.get("/list")
-async def list_knowledge_base(db: Session = Depends(get_db)):
-    """List all files in the knowledge base."""
-    # Query all knowledge items from database
-    items = db.query(KnowledgeItem).order_by(KnowledgeItem.created_at.desc()).all()
+async def list_knowledge_base(item_type: Optional[str] = None, db: Session = Depends(get_db)):
+    """List all files in the knowledge base (optionally only 'document' or 'jira_ticket' items)."""
+    items = await run_blocking(list_items, db, item_type)
 
     return {
-        "items": [item.to_dict() for item in items],
+        "items": items,
         "total": len(items)
     }
 
@@ -190,66 +125,108 @@ async def download_file(filename: str):
         headers=headers
     )
 
+def _remove_upload(doc_id: str):
+    """Delete the original uploaded file if it exists."""
+    file_path = UPLOAD_DIR / doc_id
+    if file_path.exists():
+        file_path.unlink()
+
 @router.delete("/item/{item_type}/{item_id}")
 async def delete_item(item_type: str, item_id: str, db: Session = Depends(get_db)):
     """Delete an item from the knowledge base."""
+    if item_type not in ("document", "jira_ticket"):
+        raise HTTPException(status_code=400, detail="Invalid item type")
+
     try:
-        # Delete from database
-        knowledge_item = db.query(KnowledgeItem).filter(
-            KnowledgeItem.item_id == item_id,
-            KnowledgeItem.item_type == item_type
-        ).first()
+        # Delete every chunk listed in the manifest from the vector store, then from the database
+        result = await run_blocking(delete_items, db, item_type, [item_id])
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Deletion failed: {str(e)}")
 
-        if not knowledge_item:
-            raise HTTPException(status_code=404, detail="Item not found")
+    if result["not_found"]:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if result["failed"]:
+        raise HTTPException(status_code=502, detail="Deletion failed: vector store delete did not succeed")
 
-        # Delete from Pinecone
-        if item_type == "document":
-            success = rag_store.delete_document(item_id)
-            # Also delete the original file if it exists
-            file_path = UPLOAD_DIR / item_id
-            if file_path.exists():
-                file_path.unlink()
-        elif item_type == "jira_ticket":
-            success = rag_store.delete_jira_ticket(item_id)
-        else:
-            raise HTTPException(status_code=400, detail="Invalid item type")
+    if item_type == "document":
+        _remove_upload(item_id)
 
-        # Delete from database
-        db.delete(knowledge_item)
-        db.commit()
+    return {"message": f"Successfully deleted {item_id}", "vectors_deleted": result["vectors"]}
 
-        return {"message": f"Successfully deleted {item_id}"}
-    except HTTPException:
-        raise
+class BulkDeleteRequest(BaseModel):
+    documents: List[str] = []
+    jira_tickets: List[str] = []
+
+@router.post("/bulk-delete")
+async def bulk_delete_items(request: BulkDeleteRequest, db: Session = Depends(get_db)):
+    """Delete many documents and tickets with batched vector store deletes."""
+    try:
+        results = {
+            "documents": await run_blocking(delete_items, db, "document", request.documents),
+            "jira_tickets": await run_blocking(delete_items, db, "jira_ticket", request.jira_tickets)
+        }
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Deletion failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Bulk deletion failed: {str(e)}")
+
+    for doc_id in results["documents"]["deleted"]:
+        _remove_upload(doc_id)
+
+    return results
+
+@router.post("/reconcile")
+async def reconcile_knowledge_base(dry_run: bool = True, db: Session = Depends(get_db)):
+    """
+    Find vectors that no manifest entry accounts for and (unless dry_run)
+    purge them, dropping manifest entries whose vectors are gone.
+    """
+    try:
+        return await run_blocking(reconcile_vectors, db, dry_run=dry_run)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Reconciliation failed: {str(e)}")
+
+@router.post("/warmup")
+def warm_up_rag_store():
+    """
+    Build the RAG store now instead of on the first query (e.g. from a
+    scheduled ping after deploys). Blocks until it is ready.
+    """
+    start = time.perf_counter()
+    was_initialized = rag_store.initialized
+    store = rag_store.get()
+    return {
+        "ready": store is not None,
+        "backend": store.backend_name if store else None,
+        "already_warm": was_initialized,
+        "seconds": round(time.perf_counter() - start, 3)
+    }
 
 @router.get("/item/{item_type}/{item_id}/content")
-async def get_item_content(item_type: str, item_id: str):
-    """Get full content of an item from the knowledge base."""
+async def get_item_content(item_type: str, item_id: str, db: Session = Depends(get_db)):
+    """Get full content of an item from the knowledge base (served from the local chunk store)."""
     try:
         if item_type == "document":
-            docs_data = rag_store.docs_collection.get(ids=[item_id])
-            if not docs_data['ids']:
+            doc = await run_blocking(get_document_content, db, item_id)
+            if not doc:
                 raise HTTPException(status_code=404, detail="Document not found")
             return {
                 "id": item_id,
                 "type": "document",
-                "source": docs_data['metadatas'][0].get('source', 'Unknown'),
-                "content": docs_data['documents'][0]
+                "source": doc['source'],
+                "content": doc['content']
             }
         elif item_type == "jira_ticket":
-            tickets_data = rag_store.jira_collection.get(ids=[item_id])
-            if not tickets_data['ids']:
+            ticket = await run_blocking(get_jira_ticket_content, db, item_id)
+            if not ticket:
                 raise HTTPException(status_code=404, detail="Ticket not found")
             return {
                 "id": item_id,
                 "type": "jira_ticket",
-                "status": tickets_data['metadatas'][0].get('status', 'Unknown'),
-                "issuetype": tickets_data['metadatas'][0].get('issuetype', 'Unknown'),
-                "content": tickets_data['documents'][0]
+                "status": ticket['status'],
+                "issuetype": ticket['issuetype'],
+                "content": ticket['content']
             }
         else:
             raise HTTPException(status_code=400, detail="Invalid item type")
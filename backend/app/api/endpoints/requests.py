@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.database import get_db
+from app.services.blocking import run_blocking
 from app.models.request import Request
 from pydantic import BaseModel
 
@@ -135,16 +136,69 @@ class AnalyzeRequest(BaseModel):
     description: str
     files: Optional[List[str]] = None
     jira_schema: Optional[dict] = None
+    # Narrow similar-ticket retrieval (project, connection_id, issuetype, status,
+    # created_after, created_before)
+    rag_filters: Optional[dict] = None
+    # Regenerate instead of returning a cached result for identical inputs
+    bypass_cache: bool = False
+    # Compile the schema from this JIRA connection's field configuration
+    # (issue_type defaults to its first configured type); takes precedence
+    # over a hand-built jira_schema
+    connection_id: Optional[int] = None
+    issue_type: Optional[str] = None
+
+def _compiled_schema(request: AnalyzeRequest, db: Session):
+    """The compiled JIRA schema of the request's connection, if it names one."""
+    from app.models.connection import Connection
+    from app.services.schema_compiler import schema_compiler
+
+    if request.connection_id is None:
+        return None
+    connection = db.query(Connection).filter(Connection.id == request.connection_id).first()
+    if not connection:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    return schema_compiler.get(connection, request.issue_type)
 
 @router.post("/analyze", response_model=dict)
-async def analyze_request(request: AnalyzeRequest):
+async def analyze_request(request: AnalyzeRequest, db: Session = Depends(get_db)):
     """
     Analyze request context and extract structured data for JIRA.
     """
     from app.services.ai_service import ai_service
-    extracted_data = await ai_service.extract_request_details(request.description, request.files, request.jira_schema)
+
+    extracted_data = await ai_service.extract_request_details(
+        request.description, request.files, request.jira_schema, rag_filters=request.rag_filters,
+        use_cache=not request.bypass_cache, compiled_schema=await run_blocking(_compiled_schema, request, db)
+    )
     return extracted_data
 
+@router.post("/analyze/stream")
+async def analyze_request_stream(request: AnalyzeRequest, db: Session = Depends(get_db)):
+    """
+    Analyze like /analyze, streaming server-sent events as stages finish:
+    `retrieval` (ids of the tickets/docs used), `token` (pieces of the
+    model's JSON) and `result` (the parsed object, same shape as /analyze).
+    Disconnecting stops the generation.
+    """
+    import json
+    from fastapi.responses import StreamingResponse
+    from app.services.ai_service import ai_service
+
+    stages = ai_service.stream_request_details(
+        request.description, request.jira_schema, rag_filters=request.rag_filters,
+        use_cache=not request.bypass_cache, compiled_schema=await run_blocking(_compiled_schema, request, db)
+    )
+
+    async def events():
+        try:
+            async for event, data in stages:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            await stages.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 class ReleaseRequest(BaseModel):
     request_ids: List[int]
 
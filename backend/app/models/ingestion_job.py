@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)  # Uploaded file the worker ingests
+    kind = Column(String, nullable=True)  # 'jira_csv' or 'document' (set once detected)
+    status = Column(String, default="queued", index=True)  # queued, running, completed, failed, cancelled
+    prune = Column(Boolean, default=False)
+    connection_id = Column(Integer, nullable=True)  # JIRA connection the tickets are tagged with
+    cancel_requested = Column(Boolean, default=False)
+
+    # Lease held by the process running the job (renewed by its heartbeat)
+    worker_id = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Progress
+    items_parsed = Column(Integer, default=0)
+    items_embedded = Column(Integer, default=0)
+    items_upserted = Column(Integer, default=0)
+    items_failed = Column(Integer, default=0)
+
+    result = Column(JSON, nullable=True)  # Final upload response
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "kind": self.kind,
+            "status": self.status,
+            "connection_id": self.connection_id,
+            "cancel_requested": self.cancel_requested,
+            "progress": {
+                "parsed": self.items_parsed,
+                "embedded": self.items_embedded,
+                "upserted": self.items_upserted,
+                "failed": self.items_failed
+            },
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
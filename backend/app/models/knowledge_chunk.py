@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class KnowledgeChunk(Base):
+    __tablename__ = "knowledge_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chunk_id = Column(String, unique=True, index=True, nullable=False)  # Vector id (ticket key, or {doc_id}_chunk_{i})
+    parent_id = Column(String, index=True, nullable=False)  # KnowledgeItem.item_id
+    item_type = Column(String, nullable=False)  # 'document' or 'jira_ticket'
+    chunk_index = Column(Integer, default=0)  # Position within the parent document
+
+    # Fingerprint of everything that was embedded/upserted for this chunk
+    content_hash = Column(String, nullable=False)
+
+    # Local copy of the stored text and metadata, so listing and content
+    # lookups never need a vector store round trip
+    text = Column(Text, nullable=True)
+    char_start = Column(Integer, nullable=True)  # Offsets within the parent document
+    char_end = Column(Integer, nullable=True)
+    chunk_metadata = Column(JSON, nullable=True)  # Vector metadata other than the text
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_knowledge_chunks_parent_order", "item_type", "parent_id", "chunk_index"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.chunk_id,
+            "parent_id": self.parent_id,
+            "chunk_index": self.chunk_index,
+            "text": self.text,
+            "start": self.char_start,
+            "end": self.char_end,
+            **(self.chunk_metadata or {})
+        }
@@ -0,0 +1,231 @@
+"""
+Approximate nearest-neighbour (IVF) index for the local vector store.
+
+Vectors are partitioned into `nlist` clusters by spherical k-means; a query
+only scores the rows in its `nprobe` closest clusters, trading recall for
+latency. Inserts are assigned to their nearest centroid incrementally and
+deletes clear the row's assignment, so the index never needs a full
+rebuild to stay correct (only to stay balanced as the collection grows).
+"""
+import os
+import json
+from array import array
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+
+# 0 = choose automatically from the collection size when training
+DEFAULT_NLIST = int(os.getenv("RAG_IVF_NLIST", "0"))
+DEFAULT_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+
+# Below this many vectors exact search is already fast; don't train
+MIN_TRAIN_SIZE = int(os.getenv("RAG_IVF_MIN_TRAIN_SIZE", "10000"))
+
+# Retrain once the collection has grown this much since the last training
+RETRAIN_GROWTH = 4.0
+
+KMEANS_ITERATIONS = 10
+MAX_TRAIN_SAMPLE = 100_000
+ASSIGN_CHUNK_ROWS = 8192
+
+
+def auto_nlist(size: int) -> int:
+    """Roughly 4 * sqrt(n) clusters, the usual IVF starting point."""
+    return int(min(65536, max(16, 4 * np.sqrt(max(size, 1)))))
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Assign each (normalized) vector to its most similar centroid, in chunks."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_ROWS):
+        block = np.asarray(vectors[start:start + ASSIGN_CHUNK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS,
+                     seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity; returns (nlist, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    centroids = np.array(vectors[rng.choice(len(vectors), nlist, replace=False)], dtype=np.float32)
+
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        sorted_assignments = assignments[order]
+        clusters, starts = np.unique(sorted_assignments, return_index=True)
+        sums = np.add.reduceat(np.asarray(vectors, dtype=np.float32)[order], starts, axis=0)
+
+        updated = np.array(vectors[rng.choice(len(vectors), nlist)], dtype=np.float32)  # re-seed empty clusters
+        updated[clusters] = sums
+        norms = np.linalg.norm(updated, axis=1, keepdims=True)
+        centroids = updated / np.where(norms == 0, 1.0, norms)
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the rows of a LocalVectorIndex matrix.
+
+    State on disk: centroids.npy, assignments.i32 (one cluster id per row,
+    -1 when unassigned) and ivf.json. Inverted lists are rebuilt from the
+    assignments at load time.
+    """
+
+    def __init__(self, directory: Path, dim: int, nlist: int = None, nprobe: int = None):
+        self.directory = Path(directory)
+        self.dim = dim
+        self.configured_nlist = nlist if nlist is not None else DEFAULT_NLIST
+        self.nprobe = nprobe or DEFAULT_NPROBE
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self.lists: List[array] = []
+        self.assignments = np.full(0, -1, dtype=np.int32)
+
+        self._load()
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        meta_path = self.directory / "ivf.json"
+        centroids_path = self.directory / "centroids.npy"
+        assignments_path = self.directory / "assignments.i32"
+        if not (meta_path.exists() and centroids_path.exists() and assignments_path.exists()):
+            return
+
+        meta = json.loads(meta_path.read_text())
+        self.centroids = np.load(centroids_path)
+        self.trained_size = meta.get("trained_size", 0)
+        self.assignments = np.fromfile(assignments_path, dtype=np.int32)
+        self._rebuild_lists()
+
+    def _save_centroids(self):
+        np.save(self.directory / "centroids.npy", self.centroids)
+        (self.directory / "ivf.json").write_text(json.dumps({
+            "nlist": self.nlist,
+            "trained_size": self.trained_size
+        }))
+
+    def _save_assignments(self, rows: List[int] = None):
+        """Persist all assignments, or only the given rows (in place)."""
+        path = self.directory / "assignments.i32"
+        if rows is None or not path.exists():
+            self.assignments.tofile(path)
+            return
+        with open(path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            written = f.tell() // 4
+            if written < len(self.assignments):
+                f.write(self.assignments[written:].tobytes())
+            for row in rows:
+                if row < written:
+                    f.seek(row * 4)
+                    f.write(self.assignments[row:row + 1].tobytes())
+
+    def _rebuild_lists(self):
+        self.lists = [array("i") for _ in range(self.nlist)]
+        rows = np.flatnonzero(self.assignments >= 0)
+        for row, cluster in zip(rows.tolist(), self.assignments[rows].tolist()):
+            self.lists[cluster].append(row)
+
+    def _ensure_capacity(self, size: int):
+        if len(self.assignments) < size:
+            grown = np.full(max(size, 2 * len(self.assignments)), -1, dtype=np.int32)
+            grown[:len(self.assignments)] = self.assignments
+            self.assignments = grown
+
+    # ------------------------------------------------------------------
+    # Training and maintenance
+    # ------------------------------------------------------------------
+
+    def needs_training(self, live_count: int) -> bool:
+        if live_count < MIN_TRAIN_SIZE:
+            return False
+        return not self.trained or live_count >= RETRAIN_GROWTH * self.trained_size
+
+    def train(self, matrix: np.ndarray, live_rows: np.ndarray, nlist: int = None):
+        """(Re)build centroids from the live rows and reassign every row."""
+        nlist = nlist or self.configured_nlist or auto_nlist(len(live_rows))
+        rng = np.random.default_rng(0)
+        sample_rows = live_rows
+        if len(live_rows) > MAX_TRAIN_SAMPLE:
+            sample_rows = np.sort(rng.choice(live_rows, MAX_TRAIN_SAMPLE, replace=False))
+
+        self.centroids = spherical_kmeans(matrix[sample_rows], nlist)
+        self.trained_size = len(live_rows)
+
+        self.assignments = np.full(len(matrix), -1, dtype=np.int32)
+        self.assignments[live_rows] = nearest_centroids(matrix[live_rows], self.centroids)
+        self._rebuild_lists()
+        self._save_centroids()
+        self._save_assignments()
+
+    def add(self, rows: List[int], vectors: np.ndarray):
+        """Assign newly written (normalized) rows to their nearest cluster."""
+        if not self.trained or not rows:
+            return
+        self._ensure_capacity(max(rows) + 1)
+        clusters = nearest_centroids(vectors, self.centroids)
+        for row, cluster in zip(rows, clusters.tolist()):
+            # A rewritten row may leave a stale entry in its old list; search filters it out
+            if self.assignments[row] != cluster:
+                self.assignments[row] = cluster
+                self.lists[cluster].append(row)
+        self._save_assignments(rows)
+
+    def remove(self, rows: List[int]):
+        if not self.trained:
+            return
+        rows = [row for row in rows if row < len(self.assignments)]
+        self.assignments[rows] = -1
+        self._save_assignments(rows)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def candidates(self, query: np.ndarray, nprobe: int = None) -> np.ndarray:
+        """Rows in the `nprobe` clusters closest to the (normalized) query."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        nonempty = [cluster for cluster in probes.tolist() if len(self.lists[cluster])]
+        if not nonempty:
+            return np.empty(0, dtype=np.int64)
+        parts = [np.frombuffer(self.lists[cluster], dtype=np.int32) for cluster in nonempty]
+        owners = np.repeat(nonempty, [len(part) for part in parts])
+        rows = np.concatenate(parts).astype(np.int64)
+        del parts  # release the buffer views so the lists stay appendable
+        # Drop stale entries left behind by rewritten or deleted rows
+        return np.unique(rows[self.assignments[rows] == owners])
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, top_k: int,
+               nprobe: int = None, mask: np.ndarray = None) -> List[Tuple[int, float]]:
+        """
+        Approximate top-k (row, score) pairs for a normalized query.
+        Candidates outside `mask` (a boolean row mask) are dropped before scoring.
+        """
+        rows = self.candidates(query, nprobe)
+        if mask is not None:
+            rows = rows[rows < len(mask)]
+            rows = rows[mask[rows]]
+        if len(rows) == 0:
+            return []
+        scores = matrix[rows] @ query
+        k = min(top_k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
@@ -0,0 +1,791 @@
+"""
+Backend interface shared by all RAG stores.
+
+A backend only implements a handful of storage primitives (upsert, query,
+fetch, delete, list) per collection. Ingestion, embedding, retrieval and
+content lookup are implemented once here on top of those primitives.
+"""
+import os
+import re
+import asyncio
+from datetime import datetime, timezone
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.rag.chunker import Chunk, chunk_text
+from app.rag.embedding_pipeline import EmbeddingPipeline
+from app.rag.lexical_index import LexicalIndex
+from app.rag.embedding_cache import embedding_cache
+from app.rag.upsert_batcher import UpsertBatcher
+from app.services.rate_limiter import gemini_limiter
+from app.services.gemini_client import gemini_client
+from app.services.blocking import run_blocking
+
+# Ticket metadata fields queries can filter on (plus a created_ts date range)
+FILTER_FIELDS = ("project", "connection_id", "issuetype", "status")
+TICKET_KEY_PATTERN = re.compile(r"^([A-Za-z][A-Za-z0-9_]*)-\d+$")
+
+# Collection kinds
+JIRA = "jira"
+DOCS = "docs"
+
+# Index / collection names (shared by every backend)
+JIRA_INDEX_NAME = "jira-history"
+DOCS_INDEX_NAME = "architecture-docs"
+
+# text-embedding-004 returns 768 dims; smaller output dimensionalities keep
+# the leading components (cheaper storage at some recall cost, see bench_quantization.py)
+FULL_EMBEDDING_DIM = 768
+EMBEDDING_DIM = int(os.getenv("RAG_EMBEDDING_DIM", str(FULL_EMBEDDING_DIM)))
+
+# Pinecone accepts at most 1000 ids per delete request
+DELETE_BATCH_SIZE = int(os.getenv("RAG_DELETE_BATCH_SIZE", "1000"))
+# Ids per fetch request when reading stored vectors back
+FETCH_BATCH_SIZE = 100
+
+# Retrieval: "hybrid" (BM25 + vectors fused with RRF), "vector" or "lexical"
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid").lower()
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# Seconds to wait for the query embedding before answering lexically (0 = no limit)
+QUERY_EMBED_TIMEOUT = float(os.getenv("RAG_QUERY_EMBED_TIMEOUT", "0"))
+
+# Post-retrieval re-ranking (app/rag/rerank.py): "mmr" or "none"
+RERANK_MODE = os.getenv("RAG_RERANK", "mmr").lower()
+# Candidates fetched per requested result
+RERANK_OVERFETCH = int(os.getenv("RAG_RERANK_OVERFETCH", "4"))
+# Deepest candidate pool when duplicates crowd out distinct results
+RERANK_MAX_CANDIDATES = int(os.getenv("RAG_RERANK_MAX_CANDIDATES", "100"))
+
+# Shared pool for fanning out queries to both collections
+_query_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-query")
+
+
+def empty_result() -> Dict[str, Any]:
+    return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+
+
+def format_matches(matches: List[Tuple[str, float, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Format (id, score, metadata) matches like the original ChromaDB API."""
+    return {
+        'ids': [[match_id for match_id, _, _ in matches]],
+        'documents': [[metadata.get('text', '') for _, _, metadata in matches]],
+        'metadatas': [[metadata for _, _, metadata in matches]],
+        'distances': [[1.0 - score for _, score, _ in matches]]
+    }
+
+
+def candidate_count(n_results: int, mode: str, rerank: bool = False) -> int:
+    """How deep each ranked list goes before fusion and re-ranking."""
+    depth = n_results if mode == "vector" else max(n_results * 4, 20)
+    return max(depth, n_results * RERANK_OVERFETCH) if rerank else depth
+
+
+def rrf_fuse(ranked_lists: List[List[Tuple[str, float, Dict[str, Any]]]], n_results: int,
+             k: int = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+    """
+    Reciprocal rank fusion: each list contributes 1 / (k + rank) per id.
+    Scores are scaled so an id ranked first in every list scores 1.0.
+    """
+    k = k or RRF_K
+    scores: Dict[str, float] = {}
+    metadata: Dict[str, Dict[str, Any]] = {}
+    for ranked in ranked_lists:
+        for rank, (match_id, _, match_metadata) in enumerate(ranked, start=1):
+            scores[match_id] = scores.get(match_id, 0.0) + 1.0 / (k + rank)
+            metadata.setdefault(match_id, match_metadata)
+
+    best = len(ranked_lists) / (k + 1) if ranked_lists else 1.0
+    fused = sorted(scores.items(), key=lambda item: -item[1])[:n_results]
+    return [(match_id, score / best, metadata[match_id]) for match_id, score in fused]
+
+
+def index_name(base: str, dim: int = None) -> str:
+    """Collection name for an embedding dimension (reduced dimensions get their own index)."""
+    dim = dim or EMBEDDING_DIM
+    return base if dim == FULL_EMBEDDING_DIM else f"{base}-{dim}"
+
+
+def ticket_text(ticket: Dict[str, Any]) -> str:
+    return f"Summary: {ticket['summary']}\nDescription: {ticket['description']}"
+
+
+def ticket_metadata(ticket: Dict[str, Any]) -> Dict[str, Any]:
+    """Filterable ticket metadata stored with the vector (Pinecone rejects null values)."""
+    metadata = {
+        "status": ticket.get('status', 'Unknown'),
+        "issuetype": ticket.get('issuetype', 'Unknown'),
+        "project": ticket.get('project') or project_key(str(ticket['id']))
+    }
+    if ticket.get('connection_id') is not None:
+        metadata["connection_id"] = str(ticket['connection_id'])
+    if ticket.get('created_ts') is not None:
+        metadata["created_ts"] = int(ticket['created_ts'])
+    return metadata
+
+
+def project_key(ticket_id: str) -> str:
+    """'PROJ-1234' -> 'PROJ' ('' when the id is not a JIRA issue key)."""
+    match = TICKET_KEY_PATTERN.match(ticket_id)
+    return match.group(1) if match else ""
+
+
+# Date formats seen in JIRA CSV exports, tried after ISO 8601
+JIRA_DATE_FORMATS = ["%d/%b/%y %I:%M %p", "%d/%b/%Y %I:%M %p", "%d/%b/%y", "%m/%d/%Y %H:%M", "%m/%d/%Y"]
+
+
+def to_timestamp(value: Any) -> Optional[int]:
+    """Epoch seconds (UTC) from a number, ISO string or JIRA export date; None if unparseable."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        try:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            parsed = None
+            for date_format in JIRA_DATE_FORMATS:
+                try:
+                    parsed = datetime.strptime(text, date_format)
+                    break
+                except ValueError:
+                    continue
+            if parsed is None:
+                return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Turn query filters into {field: [allowed values]} plus an optional
+    "created_ts": (low, high) range. Accepts project, connection_id,
+    issuetype and status as a value or list, and created_after /
+    created_before as epoch seconds or date strings.
+    """
+    normalized: Dict[str, Any] = {}
+    for field in FILTER_FIELDS:
+        value = (filters or {}).get(field)
+        if value is None or value == [] or value == "":
+            continue
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        normalized[field] = [str(v) for v in values]
+
+    low = to_timestamp((filters or {}).get('created_after'))
+    high = to_timestamp((filters or {}).get('created_before'))
+    if low is not None or high is not None:
+        normalized["created_ts"] = (low, high)
+    return normalized
+
+
+def matches_filters(metadata: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    """Whether metadata satisfies normalized filters."""
+    for field, allowed in filters.items():
+        if field == "created_ts":
+            low, high = allowed
+            value = metadata.get("created_ts")
+            if value is None or (low is not None and value < low) or (high is not None and value > high):
+                return False
+        elif str(metadata.get(field)) not in allowed:
+            return False
+    return True
+
+
+def chunk_id(doc_id: str, index: int) -> str:
+    return f"{doc_id}_chunk_{index}"
+
+
+def join_chunks(chunks: List[Dict[str, Any]]) -> str:
+    """
+    Reassemble text from chunk metadata ordered by chunk_index, dropping the
+    overlap between neighbours (chunks without offsets are joined as paragraphs).
+    """
+    parts: List[str] = []
+    covered = 0
+    for chunk in chunks:
+        text, start = chunk.get('text', ''), chunk.get('start')
+        if start is None:
+            parts.append(("\n\n" if parts else "") + text)
+            continue
+        start = int(start)
+        if start >= covered:
+            # Only whitespace was cut between the chunks
+            gap = "" if not parts or start == covered else ("\n\n" if start - covered > 1 else " ")
+            parts.append(gap + text)
+        else:
+            parts.append(text[covered - start:])
+        covered = max(covered, start + len(text))
+    return "".join(parts)
+
+
+class RAGStoreBackend(ABC):
+    """
+    Base class for RAG stores.
+    Subclasses provide storage primitives for the JIRA and DOCS collections.
+    """
+
+    # Human-readable backend name used in log messages
+    backend_name = "vector store"
+
+    # Embedding dimension for Google's text-embedding-004 (RAG_EMBEDDING_DIM)
+    embedding_dim = EMBEDDING_DIM
+
+    # UpsertBatcher overrides (request limits, worker count)
+    upsert_options: Dict[str, Any] = {}
+
+    # BM25 index kept in step with the vectors (set by _init_lexical)
+    lexical: Optional[LexicalIndex] = None
+
+    def _init_embeddings(self):
+        """Use the shared Gemini client for embeddings."""
+        if not gemini_client.configured:
+            print("WARNING: GOOGLE_API_KEY not found. Embeddings will not work.")
+            self.embedding_model = None
+        else:
+            self.embedding_model = "models/text-embedding-004"
+
+    def _init_lexical(self, path: str = None):
+        """Open the local BM25 index used for hybrid and lexical retrieval."""
+        self.lexical = LexicalIndex(path)
+
+    # ------------------------------------------------------------------
+    # Storage primitives
+    # ------------------------------------------------------------------
+
+    @abstractmethod
+    def _ready(self, kind: str) -> bool:
+        """Whether the collection for `kind` is available."""
+
+    @abstractmethod
+    def _upsert(self, kind: str, vectors: List[Dict[str, Any]]):
+        """Insert or overwrite {id, values, metadata} vectors."""
+
+    @abstractmethod
+    def _query(self, kind: str, vector: List[float], n_results: int,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Return the top (id, cosine score, metadata) matches, best first,
+        among vectors matching the normalized `filters`.
+        """
+
+    def _query_with_values(self, kind: str, vector: List[float], n_results: int,
+                           filters: Optional[Dict[str, Any]] = None
+                           ) -> Tuple[List[Tuple[str, float, Dict[str, Any]]], Dict[str, List[float]]]:
+        """
+        Like _query, also returning {id: stored vector} for the matches.
+        Stores that can return values with the query override this.
+        """
+        matches = self._query(kind, vector, n_results, filters)
+        return matches, self._stored_vectors(kind, [match_id for match_id, _, _ in matches])
+
+    def _stored_vectors(self, kind: str, ids: List[str]) -> Dict[str, List[float]]:
+        """Vectors the store can read without a network call (none by default)."""
+        return {}
+
+    @abstractmethod
+    def _fetch(self, kind: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return metadata for the given ids (missing ids are omitted)."""
+
+    def _fetch_vectors(self, kind: str, ids: List[str]) -> Dict[str, Tuple[Optional[List[float]], Dict[str, Any]]]:
+        """
+        Return (values, metadata) for the given ids; values are None when the
+        store cannot read them back. Stores that fetch both at once override this.
+        """
+        values = self._stored_vectors(kind, ids)
+        return {vector_id: (values.get(vector_id), metadata) for vector_id, metadata in self._fetch(kind, ids).items()}
+
+    @abstractmethod
+    def _delete(self, kind: str, ids: List[str]):
+        """Delete vectors by id."""
+
+    @abstractmethod
+    def _document_chunk_ids(self, doc_id: str) -> List[str]:
+        """Return the ids of every stored chunk of a document."""
+
+    @abstractmethod
+    def _list_ids(self, kind: str) -> Iterator[List[str]]:
+        """Yield pages of every vector id in the collection."""
+
+    # ------------------------------------------------------------------
+    # Embeddings
+    # ------------------------------------------------------------------
+
+    def _get_embedding(self, text: str) -> List[float]:
+        """Get embedding for text using Google's embedding model (raises once retries are exhausted)."""
+        if not self.embedding_model:
+            return []
+        return self._get_embeddings([text])[0]
+
+    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts, serving repeats from the embedding cache (raises on failure)."""
+        if not self.embedding_model:
+            raise RuntimeError("Embedding model not configured")
+        return embedding_cache.wrap(self._cache_model(), "retrieval_document", self._embed_uncached)(texts)
+
+    def _cache_model(self) -> str:
+        """Embedding-cache key; reduced-dimension vectors are cached separately from full ones."""
+        if self.embedding_dim != FULL_EMBEDDING_DIM:
+            return f"{self.embedding_model}@{self.embedding_dim}"
+        return self.embedding_model
+
+    def _embed_options(self) -> Dict[str, Any]:
+        return {
+            "model": self.embedding_model,
+            "task_type": "retrieval_document",
+            "output_dimensionality": self.embedding_dim if self.embedding_dim != FULL_EMBEDDING_DIM else None
+        }
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts in a single API call (rate limited, retried on 429/5xx)."""
+        return gemini_client.embed(texts, **self._embed_options())
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def _ingest(self, kind: str, records: Iterator[Tuple[Dict[str, Any], str]], label: str) -> Dict[str, Any]:
+        """
+        Embed (record, text) pairs in batches and stream each finished batch
+        into size-bounded, retried upserts. Returns a per-batch report, or {}
+        when no embedding model is configured.
+        """
+        if not self.embedding_model:
+            print(f"Embedding model not configured. Skipping {label} ingestion.")
+            return {}
+
+        pipeline = EmbeddingPipeline(self._get_embeddings)
+        with UpsertBatcher(lambda vectors: self._upsert_indexed(kind, vectors), label=label,
+                           **self.upsert_options) as batcher:
+            for batch in pipeline.run(records):
+                batcher.add([{**record, "values": embedding} for record, embedding in batch])
+        report = batcher.report()
+        report["failed_ids"] = [record["id"] for record in pipeline.failed_payloads] + report["failed_ids"]
+        report["failed"] += len(pipeline.failed_payloads)
+        gemini_limiter.record_dropped(self.embedding_model, len(pipeline.failed_payloads))
+
+        print(
+            f"Upserted {report['upserted']} {label} to {self.backend_name} "
+            f"({report['failed']} failed, {report['retries']} retries; {pipeline.stats.summary()})"
+        )
+        return {
+            **report,
+            "embedding": pipeline.stats.to_dict(),
+            "embedding_cache": embedding_cache.stats()
+        }
+
+    def _upsert_indexed(self, kind: str, vectors: List[Dict[str, Any]]):
+        """Upsert vectors, then mirror their text into the lexical index."""
+        self._upsert(kind, vectors)
+        if self.lexical:
+            try:
+                self.lexical.upsert(kind, [
+                    (vector["id"], vector["id"] if kind == JIRA else vector["metadata"].get("source", ""),
+                     vector["metadata"])
+                    for vector in vectors
+                ])
+            except Exception as e:
+                print(f"Error updating lexical index: {e}")
+
+    def add_jira_tickets(self, tickets: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Ingest JIRA tickets into vector store."""
+        if not self._ready(JIRA):
+            print(f"{self.backend_name} not initialized. Skipping ticket ingestion.")
+            return {}
+
+        def records():
+            for ticket in tickets:
+                text = ticket_text(ticket)
+                yield {
+                    "id": str(ticket['id']),
+                    "metadata": {"text": text, **ticket_metadata(ticket)}
+                }, text
+
+        return self._ingest(JIRA, records(), "JIRA tickets")
+
+    def adopt_jira_tickets(self, tickets: List[Dict[str, Any]]) -> Set[str]:
+        """
+        Ids of tickets already stored with their current text, e.g. ingested
+        before the chunk manifest existed. Their vectors are kept; out-of-date
+        metadata is rewritten with the stored values, so nothing is embedded.
+        """
+        if not tickets or not self._ready(JIRA):
+            return set()
+
+        by_id = {str(ticket['id']): ticket for ticket in tickets}
+        ids = list(by_id)
+        adopted, unchanged, rewrites = set(), [], []
+        for start in range(0, len(ids), FETCH_BATCH_SIZE):
+            for vector_id, (values, metadata) in self._fetch_vectors(JIRA, ids[start:start + FETCH_BATCH_SIZE]).items():
+                ticket = by_id[vector_id]
+                current = {"text": ticket_text(ticket), **ticket_metadata(ticket)}
+                if metadata.get('text') != current['text']:
+                    continue
+                if metadata == current:
+                    unchanged.append({"id": vector_id, "metadata": current})
+                elif values is not None:
+                    rewrites.append({"id": vector_id, "values": [float(value) for value in values], "metadata": current})
+                else:
+                    continue
+                adopted.add(vector_id)
+
+        if unchanged and self.lexical:
+            try:
+                self.lexical.upsert(JIRA, [(vector["id"], vector["id"], vector["metadata"]) for vector in unchanged])
+            except Exception as e:
+                print(f"Error updating lexical index: {e}")
+        if rewrites:
+            with UpsertBatcher(lambda vectors: self._upsert_indexed(JIRA, vectors), label="adopted JIRA tickets",
+                               **self.upsert_options) as batcher:
+                batcher.add(rewrites)
+            adopted -= set(batcher.report()["failed_ids"])
+        return adopted
+
+    def add_documents(self, docs: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Ingest documents with chunking."""
+        if not self._ready(DOCS):
+            print(f"{self.backend_name} not initialized. Skipping document ingestion.")
+            return {}
+
+        def records():
+            for doc in docs:
+                for i, chunk in enumerate(chunk_text(doc['content'])):
+                    yield self._chunk_record(doc['id'], doc['source'], i, chunk), chunk[0]
+
+        return self._ingest(DOCS, records(), "document chunks")
+
+    def add_document_chunks(self, doc_id: str, source: str, chunks: List[Tuple[int, Chunk]]) -> Dict[str, Any]:
+        """Ingest selected (chunk_index, chunk) chunks of one document."""
+        if not self._ready(DOCS):
+            print(f"{self.backend_name} not initialized. Skipping document ingestion.")
+            return {}
+
+        records = ((self._chunk_record(doc_id, source, i, chunk), chunk[0]) for i, chunk in chunks)
+        return self._ingest(DOCS, records, "document chunks")
+
+    def _chunk_record(self, doc_id: str, source: str, index: int, chunk: Chunk) -> Dict[str, Any]:
+        text, start, end = chunk
+        return {
+            "id": chunk_id(doc_id, index),
+            "metadata": {
+                "text": text,
+                "source": source,
+                "parent_id": doc_id,
+                "chunk_index": index,
+                "start": start,
+                "end": end
+            }
+        }
+
+    # ------------------------------------------------------------------
+    # Retrieval
+    # ------------------------------------------------------------------
+
+    def _embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query, giving up after QUERY_EMBED_TIMEOUT seconds (if set).
+        Returns [] when the query cannot be embedded, so retrieval falls back
+        to lexical results.
+        """
+        try:
+            if not QUERY_EMBED_TIMEOUT:
+                return self._get_embedding(query)
+            return _query_pool.submit(self._get_embedding, query).result(timeout=QUERY_EMBED_TIMEOUT)
+        except FuturesTimeout:
+            print(f"Query embedding exceeded {QUERY_EMBED_TIMEOUT}s; using lexical results only")
+        except Exception as e:
+            print(f"Error embedding query ({e}); using lexical results only")
+        return []
+
+    async def _aembed_query(self, query: str) -> List[float]:
+        """_embed_query on the async Gemini client."""
+        if not self.embedding_model:
+            return []
+        try:
+            cached = embedding_cache.get_many(self._cache_model(), "retrieval_document", [query])[0]
+            if cached is not None:
+                return cached
+            embed = gemini_client.aembed([query], **self._embed_options())
+            vector = (await asyncio.wait_for(embed, QUERY_EMBED_TIMEOUT or None))[0]
+            embedding_cache.put_many(self._cache_model(), "retrieval_document", [query], [vector])
+            return vector
+        except asyncio.TimeoutError:
+            print(f"Query embedding exceeded {QUERY_EMBED_TIMEOUT}s; using lexical results only")
+        except Exception as e:
+            print(f"Error embedding query ({e}); using lexical results only")
+        return []
+
+    def _candidates(self, query: str, query_embedding: List[float],
+                    searches: Dict[str, Tuple[str, int, Dict[str, Any]]], mode: str, with_values: bool
+                    ) -> Dict[str, Tuple[List[Tuple[str, float, Dict[str, Any]]], Dict[str, List[float]]]]:
+        """
+        Run {key: (kind, depth, filters)} searches and fuse each into one
+        best-first candidate list, with any vectors the vector search returned.
+        """
+        lexical = {}
+        if mode != "vector" and self.lexical and self.lexical.enabled:
+            lexical = {
+                key: _query_pool.submit(self.lexical.search, kind, query, depth, filters)
+                for key, (kind, depth, filters) in searches.items()
+            }
+
+        vector = {}
+        if query_embedding:
+            search = self._query_with_values if with_values else self._query
+            vector = {
+                key: _query_pool.submit(search, kind, query_embedding, depth, filters)
+                for key, (kind, depth, filters) in searches.items()
+            }
+
+        candidates = {}
+        for key, (kind, depth, _) in searches.items():
+            ranked, values = [], {}
+            for source, futures in (("vector", vector), ("lexical", lexical)):
+                if key not in futures:
+                    continue
+                try:
+                    result = futures[key].result()
+                    if source == "vector" and with_values:
+                        result, values = result
+                    ranked.append(result)
+                except Exception as e:
+                    print(f"Error in {source} search for {key}: {e}")
+
+            if mode == "vector" or (vector and not lexical):
+                candidates[key] = (ranked[0][:depth] if ranked else [], values)
+            else:
+                candidates[key] = (rrf_fuse(ranked, depth), values)
+        return candidates
+
+    def _retrieve(self, query: str, searches: Dict[str, Tuple[str, int, Dict[str, Any]]],
+                  mode: Optional[str] = None, rerank: Optional[bool] = None,
+                  query_embedding: Optional[List[float]] = None) -> Dict[str, List[Tuple[str, float, Dict[str, Any]]]]:
+        """
+        Run {key: (kind, n_results, normalized filters)} searches for one query.
+
+        "vector" uses embeddings only, "lexical" uses BM25 only (no embedding
+        call), "hybrid" runs both in parallel and fuses them with RRF. Hybrid
+        degrades to lexical results when the query cannot be embedded.
+        Filters are pushed down to both searches.
+
+        With `rerank` (default RAG_RERANK=mmr) each search over-fetches and the
+        candidates are diversified with MMR, collapsing near-duplicates. If
+        duplicates fill the whole pool, the search is repeated once, deeper.
+
+        `query_embedding` skips embedding the query ([] = embedding failed).
+        """
+        mode = (mode or RETRIEVAL_MODE).lower()
+        rerank = RERANK_MODE == "mmr" if rerank is None else rerank
+        searches = {key: search for key, search in searches.items() if self._ready(search[0])}
+        results = {key: [] for key in searches}
+        if not searches:
+            return results
+
+        if query_embedding is None:
+            query_embedding = self._embed_query(query) if mode != "lexical" else []
+        if not rerank:
+            fetched = self._candidates(query, query_embedding, {
+                key: (kind, candidate_count(n, mode), filters) for key, (kind, n, filters) in searches.items()
+            }, mode, with_values=False)
+            return {key: fetched[key][0][:searches[key][1]] for key in searches}
+
+        # NumPy is only imported once a re-ranked query runs
+        from app.rag.rerank import diversify
+        depths = {key: candidate_count(n, mode, rerank=True) for key, (_, n, _) in searches.items()}
+        pending = searches
+        for attempt in range(2):
+            fetched = self._candidates(query, query_embedding, {
+                key: (kind, depths[key], filters) for key, (kind, _, filters) in pending.items()
+            }, mode, with_values=True)
+
+            retry = {}
+            for key, (candidates, values) in fetched.items():
+                kind, n, _ = pending[key]
+                missing = [match_id for match_id, _, _ in candidates if match_id not in values]
+                if missing:
+                    values = {**values, **self._stored_vectors(kind, missing)}
+                results[key] = diversify(candidates, n, values)
+
+                pool_full = len(candidates) >= depths[key]
+                if attempt == 0 and len(results[key]) < n and pool_full and depths[key] < RERANK_MAX_CANDIDATES:
+                    depths[key] = min(depths[key] * RERANK_OVERFETCH, RERANK_MAX_CANDIDATES)
+                    retry[key] = pending[key]
+            if not retry:
+                break
+            pending = retry
+        return results
+
+    def query_similar_tickets(self, query: str, n_results: int = 3, mode: Optional[str] = None,
+                              filters: Optional[Dict[str, Any]] = None, rerank: Optional[bool] = None,
+                              query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """
+        Retrieve similar past tickets (hybrid lexical + vector search by default).
+        `filters` narrows the search to project / connection_id / issuetype /
+        status values and a created_after / created_before range.
+        """
+        searches = {'tickets': (JIRA, n_results, normalize_filters(filters))}
+        return format_matches(self._retrieve(query, searches, mode, rerank, query_embedding).get('tickets', []))
+
+    def query_docs(self, query: str, n_results: int = 5, mode: Optional[str] = None,
+                   rerank: Optional[bool] = None, query_embedding: Optional[List[float]] = None) -> List[str]:
+        """Retrieve relevant documentation."""
+        searches = {'docs': (DOCS, n_results, {})}
+        matches = self._retrieve(query, searches, mode, rerank, query_embedding).get('docs', [])
+        return [metadata.get('text', '') for _, _, metadata in matches]
+
+    def query_context(self, query: str, n_tickets: int = 3, n_docs: int = 5, mode: Optional[str] = None,
+                      filters: Optional[Dict[str, Any]] = None, rerank: Optional[bool] = None,
+                      query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """
+        Retrieve similar tickets and relevant docs for one query.
+        Embeds the query once and searches both collections concurrently;
+        `filters` applies to the ticket search.
+        """
+        matches = self._retrieve(query, {
+            'similar_tickets': (JIRA, n_tickets, normalize_filters(filters)),
+            'relevant_docs': (DOCS, n_docs, {})
+        }, mode, rerank, query_embedding)
+        return {
+            'similar_tickets': format_matches(matches.get('similar_tickets', [])),
+            'relevant_docs': format_matches(matches.get('relevant_docs', []))
+        }
+
+    # ------------------------------------------------------------------
+    # Async API: the query is embedded on the async Gemini client; vector,
+    # BM25 and ingestion work blocks, so it runs on the bounded worker pool
+    # ------------------------------------------------------------------
+
+    async def _aquery_embedding(self, query: str, mode: Optional[str]) -> List[float]:
+        return await self._aembed_query(query) if (mode or RETRIEVAL_MODE).lower() != "lexical" else []
+
+    async def aquery_similar_tickets(self, query: str, n_results: int = 3, mode: Optional[str] = None,
+                                     filters: Optional[Dict[str, Any]] = None,
+                                     rerank: Optional[bool] = None) -> Dict[str, Any]:
+        query_embedding = await self._aquery_embedding(query, mode)
+        return await run_blocking(self.query_similar_tickets, query, n_results, mode, filters, rerank,
+                                  query_embedding=query_embedding)
+
+    async def aquery_docs(self, query: str, n_results: int = 5, mode: Optional[str] = None,
+                          rerank: Optional[bool] = None) -> List[str]:
+        query_embedding = await self._aquery_embedding(query, mode)
+        return await run_blocking(self.query_docs, query, n_results, mode, rerank, query_embedding=query_embedding)
+
+    async def aquery_context(self, query: str, n_tickets: int = 3, n_docs: int = 5, mode: Optional[str] = None,
+                             filters: Optional[Dict[str, Any]] = None, rerank: Optional[bool] = None) -> Dict[str, Any]:
+        query_embedding = await self._aquery_embedding(query, mode)
+        return await run_blocking(self.query_context, query, n_tickets, n_docs, mode, filters, rerank,
+                                  query_embedding=query_embedding)
+
+    async def aadd_jira_tickets(self, tickets: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return await run_blocking(self.add_jira_tickets, tickets)
+
+    async def aadd_documents(self, docs: List[Dict[str, str]]) -> Dict[str, Any]:
+        return await run_blocking(self.add_documents, docs)
+
+    async def aadd_document_chunks(self, doc_id: str, source: str, chunks: List[Tuple[int, Chunk]]) -> Dict[str, Any]:
+        return await run_blocking(self.add_document_chunks, doc_id, source, chunks)
+
+    # ------------------------------------------------------------------
+    # Content and deletion
+    # ------------------------------------------------------------------
+
+    def get_document_content(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Reassemble a document's text from its stored chunks (fallback for the local chunk store)."""
+        if not self._ready(DOCS):
+            return None
+
+        chunk_ids = self._document_chunk_ids(doc_id)
+        if not chunk_ids:
+            return None
+
+        chunks = sorted(self._fetch(DOCS, chunk_ids).values(), key=lambda m: int(m.get('chunk_index', 0)))
+        if not chunks:
+            return None
+
+        return {
+            "id": doc_id,
+            "source": chunks[0].get('source', 'Unknown'),
+            "content": join_chunks(chunks)
+        }
+
+    def get_jira_ticket_content(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """Return a ticket's stored text and metadata."""
+        if not self._ready(JIRA):
+            return None
+
+        metadata = self._fetch(JIRA, [ticket_id]).get(ticket_id)
+        if metadata is None:
+            return None
+
+        return {
+            "id": ticket_id,
+            "status": metadata.get('status', 'Unknown'),
+            "issuetype": metadata.get('issuetype', 'Unknown'),
+            "content": metadata.get('text', '')
+        }
+
+    def delete_ids(self, kind: str, ids: List[str]) -> int:
+        """Delete vectors in batches of DELETE_BATCH_SIZE ids (raises on failure)."""
+        ids = list(ids)
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[start:start + DELETE_BATCH_SIZE]
+            self._delete(kind, batch)
+            if self.lexical:
+                self.lexical.delete(kind, batch)
+        return len(ids)
+
+    def list_ids(self, kind: str) -> Iterator[List[str]]:
+        """Yield pages of every vector id stored for `kind` (used by reconciliation)."""
+        if not self._ready(kind):
+            return iter([])
+        return self._list_ids(kind)
+
+    def delete_document(self, doc_id: str, chunk_ids: Optional[List[str]] = None) -> bool:
+        """
+        Delete a document (all of its chunks) from the vector store.
+        `chunk_ids` comes from the chunk manifest; without it the chunks are
+        looked up in the store.
+        """
+        if not self._ready(DOCS):
+            return False
+
+        try:
+            if chunk_ids is None:
+                chunk_ids = self._document_chunk_ids(doc_id)
+            self.delete_ids(DOCS, chunk_ids)
+            return True
+        except Exception as e:
+            print(f"Error deleting document {doc_id}: {e}")
+            return False
+
+    def delete_document_chunks(self, chunk_ids: List[str]) -> bool:
+        """Delete specific document chunks by id."""
+        if not self._ready(DOCS):
+            return False
+
+        try:
+            self.delete_ids(DOCS, chunk_ids)
+            return True
+        except Exception as e:
+            print(f"Error deleting document chunks: {e}")
+            return False
+
+    def delete_jira_ticket(self, ticket_id: str) -> bool:
+        """Delete a JIRA ticket from the vector store."""
+        return self.delete_jira_tickets([ticket_id])
+
+    def delete_jira_tickets(self, ticket_ids: List[str]) -> bool:
+        """Delete many JIRA tickets in batched requests."""
+        if not self._ready(JIRA):
+            return False
+
+        try:
+            self.delete_ids(JIRA, ticket_ids)
+            return True
+        except Exception as e:
+            print(f"Error deleting {len(ticket_ids)} tickets: {e}")
+            return False
@@ -0,0 +1,89 @@
+"""
+Token-aware sliding-window chunker.
+Walks the text once, cutting windows of about CHUNK_TARGET_TOKENS at the
+best nearby boundary (paragraph, line, sentence, word), never exceeding
+CHUNK_MAX_TOKENS, with CHUNK_OVERLAP_TOKENS of overlap between neighbours.
+Chunks are exact slices of the input and carry their character offsets.
+"""
+import os
+import math
+from typing import List, Optional, Tuple
+
+# (text, start, end) with text == content[start:end]
+Chunk = Tuple[str, int, int]
+
+CHUNK_TARGET_TOKENS = int(os.getenv("CHUNK_TARGET_TOKENS", "400"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+# text-embedding-004 truncates input beyond 2048 tokens
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "1000"))
+
+# Rough average for English text with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+
+# Preferred cut points, best first (the cut goes after the separator)
+BOUNDARIES = ["\n\n", "\n", ". ", "? ", "! ", "; ", " "]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (no tokenizer dependency)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _cut(text: str, start: int, target: int, limit: int) -> int:
+    """Pick where the chunk starting at `start` ends."""
+    low = start + target // 2
+    # Best boundary in the second half of the target window...
+    for separator in BOUNDARIES:
+        position = text.rfind(separator, low, start + target)
+        if position != -1:
+            return position + len(separator)
+    # ...otherwise the first one before the hard limit
+    for separator in BOUNDARIES:
+        position = text.find(separator, start + target, limit)
+        if position != -1:
+            return position + len(separator)
+    return start + target
+
+
+def _skip_space(text: str, position: int, end: int) -> int:
+    while position < end and text[position].isspace():
+        position += 1
+    return position
+
+
+def chunk_text(content: str, target_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None,
+               max_tokens: Optional[int] = None) -> List[Chunk]:
+    """Split content into overlapping (text, start, end) chunks."""
+    max_chars = max(1, max_tokens or CHUNK_MAX_TOKENS) * CHARS_PER_TOKEN
+    target = min(max(1, target_tokens or CHUNK_TARGET_TOKENS) * CHARS_PER_TOKEN, max_chars)
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap = min(overlap_tokens * CHARS_PER_TOKEN, target // 2)
+
+    chunks: List[Chunk] = []
+    length = len(content)
+    start = _skip_space(content, 0, length)
+    while start < length:
+        remaining = length - start
+        # Take the tail whole rather than leaving a sliver for the next chunk
+        if remaining <= max_chars and remaining <= target + target // 2:
+            end = length
+        else:
+            end = _cut(content, start, target, min(start + max_chars, length))
+
+        stripped_end = end
+        while stripped_end > start and content[stripped_end - 1].isspace():
+            stripped_end -= 1
+        chunks.append((content[start:stripped_end], start, stripped_end))
+        if end >= length:
+            break
+
+        # Step back by the overlap, starting on a word boundary
+        next_start = end
+        if overlap:
+            back = content.find(" ", end - overlap, end)
+            if back != -1 and back + 1 > start:
+                next_start = back + 1
+        start = _skip_space(content, next_start, length)
+
+    return chunks
+
@@ -0,0 +1,209 @@
+"""
+Persistent, content-addressed embedding cache.
+Vectors are stored in SQLite keyed by (model, task_type, sha256(text)), so
+byte-identical texts are never embedded twice, even across processes.
+Least-recently-used entries are evicted once the cache exceeds its size bound.
+"""
+import os
+import hashlib
+import sqlite3
+import threading
+from array import array
+from typing import Any, Callable, Dict, List, Optional
+
+# Use /tmp so the cache is writable on Vercel serverless
+DEFAULT_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "/tmp/embedding_cache.db")
+# Room for a 20k-ticket export plus documents and a reduced-dimension copy
+# (about 3 KB per 768-dim vector)
+DEFAULT_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+# Extra share of max_entries evicted once over the bound, so puts right after
+# an eviction do not each trigger another one
+EVICT_SLACK = 0.05
+
+
+def _normalize_model(model: str) -> str:
+    """'models/text-embedding-004' and 'text-embedding-004' share entries."""
+    return model[len("models/"):] if model.startswith("models/") else model
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU cache of embedding vectors with hit/miss counters."""
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._clock = 0
+        # Row count kept in memory so puts do not scan the table
+        self._entries = 0
+        self._conn = None
+
+        if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return
+
+        try:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    task_type TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used INTEGER NOT NULL,
+                    PRIMARY KEY (model, task_type, text_hash)
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+            self._conn.commit()
+            row = self._conn.execute("SELECT MAX(last_used) FROM embeddings").fetchone()
+            self._clock = row[0] or 0
+            self._entries = self._count()
+        except Exception as e:
+            print(f"WARNING: Embedding cache disabled ({self.path}): {e}")
+            self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get_many(self, model: str, task_type: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors in input order (None for misses)."""
+        if not self.enabled or not texts:
+            with self._lock:
+                self.misses += len(texts)
+            return [None] * len(texts)
+
+        model = _normalize_model(model)
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND task_type = ? AND text_hash IN ({placeholders})",
+                    [model, task_type, *chunk]
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = array("f", blob).tolist()
+
+            if found:
+                stamp = self._tick()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND task_type = ? AND text_hash = ?",
+                    [(stamp, model, task_type, digest) for digest in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(digest) for digest in hashes]
+            hit_count = sum(1 for vector in results if vector is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, task_type: str, texts: List[str], vectors: List[List[float]]):
+        """Store vectors for texts, evicting least-recently-used entries if over budget."""
+        if not self.enabled:
+            return
+
+        model = _normalize_model(model)
+        rows = {
+            text_hash(text): array("f", vector).tobytes()
+            for text, vector in zip(texts, vectors) if vector
+        }
+        with self._lock:
+            stamp = self._tick()
+            digests, existing = list(rows), set()
+            for start in range(0, len(digests), 500):
+                chunk = digests[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                existing.update(digest for digest, in self._conn.execute(
+                    f"SELECT text_hash FROM embeddings "
+                    f"WHERE model = ? AND task_type = ? AND text_hash IN ({placeholders})",
+                    [model, task_type, *chunk]
+                ))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, task_type, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(model, task_type, digest, blob, stamp) for digest, blob in rows.items()]
+            )
+            self._entries += len(rows) - len(existing)
+            self._evict()
+            self._conn.commit()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _evict(self):
+        if self._entries <= self.max_entries:
+            return
+        # Recount only when over the bound (other processes may share the file)
+        self._entries = self._count()
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            overflow += int(self.max_entries * EVICT_SLACK)
+            evicted = self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            ).rowcount
+            self._entries -= evicted
+            self.evictions += evicted
+
+    def wrap(self, model: str, task_type: str,
+             embed_batch: Callable[[List[str]], List[List[float]]]) -> Callable[[List[str]], List[List[float]]]:
+        """Return an embed_batch function that only sends cache misses to the API."""
+
+        def cached_embed_batch(texts: List[str]) -> List[List[float]]:
+            vectors = self.get_many(model, task_type, texts)
+            # Embed each distinct missing text once
+            missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+            if missing:
+                fresh = embed_batch(missing)
+                if len(fresh) != len(missing):
+                    raise ValueError(f"expected {len(missing)} embeddings, got {len(fresh)}")
+                self.put_many(model, task_type, missing, fresh)
+                by_text = dict(zip(missing, fresh))
+                vectors = [vector if vector is not None else by_text[text] for text, vector in zip(texts, vectors)]
+            return vectors
+
+        return cached_embed_batch
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        entries = 0
+        if self.enabled:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# Singleton instance shared by every embedding caller
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,160 @@
+"""
+Batched, concurrent embedding pipeline.
+Sends texts to the embedding API in multi-text batches, keeps a bounded
+number of batches in flight and yields finished vectors as they complete,
+so callers can upsert while later batches are still being embedded.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+# Embeds a batch of texts, returning one vector per text (same order)
+EmbedBatchFn = Callable[[List[str]], List[List[float]]]
+
+# Gemini's batch embedding endpoint accepts at most 100 texts per call
+DEFAULT_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+
+
+class PipelineStats:
+    """Throughput counters for one pipeline run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.texts_submitted = 0
+        self.texts_embedded = 0
+        self.texts_failed = 0
+        self.batches_completed = 0
+        self.batches_failed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    def batch_started(self, size: int):
+        with self._lock:
+            self.texts_submitted += size
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def batch_finished(self, size: int, ok: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.batches_completed += 1
+                self.texts_embedded += size
+            else:
+                self.batches_failed += 1
+                self.texts_failed += size
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def texts_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.texts_embedded / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "texts_submitted": self.texts_submitted,
+            "texts_embedded": self.texts_embedded,
+            "texts_failed": self.texts_failed,
+            "batches_completed": self.batches_completed,
+            "batches_failed": self.batches_failed,
+            "batches_in_flight": self.in_flight,
+            "max_batches_in_flight": self.max_in_flight,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "texts_per_second": round(self.texts_per_second, 1),
+        }
+
+    def summary(self) -> str:
+        return (
+            f"{self.texts_embedded}/{self.texts_submitted} texts in {self.elapsed:.2f}s "
+            f"({self.texts_per_second:.1f} texts/s, peak {self.max_in_flight} batches in flight, "
+            f"{self.batches_failed} failed batches)"
+        )
+
+
+class EmbeddingPipeline:
+    """
+    Embeds (payload, text) pairs in batches on a small thread pool.
+
+    Items are pulled lazily from the input iterable, so at most
+    `batch_size * max_in_flight` texts are held in memory at once.
+    """
+
+    def __init__(self, embed_batch: EmbedBatchFn, batch_size: int = None, max_in_flight: int = None):
+        self.embed_batch = embed_batch
+        self.batch_size = max(1, batch_size or DEFAULT_BATCH_SIZE)
+        self.max_in_flight = max(1, max_in_flight or DEFAULT_MAX_IN_FLIGHT)
+        self.stats = PipelineStats()
+        self.failed_payloads: List[Any] = []
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        self.stats.batch_started(len(texts))
+        try:
+            vectors = self.embed_batch(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            print(f"Error embedding batch of {len(texts)} texts: {e}")
+            self.stats.batch_finished(len(texts), ok=False)
+            raise
+        self.stats.batch_finished(len(texts), ok=True)
+        return vectors
+
+    def run(self, items: Iterable[Tuple[Any, str]]) -> Iterator[List[Tuple[Any, List[float]]]]:
+        """
+        Yield lists of (payload, vector) pairs, one list per completed batch.
+        Batches complete in any order; failed batches are counted and skipped
+        (their payloads are kept in `failed_payloads`).
+        """
+        self.stats = PipelineStats()
+        self.failed_payloads = []
+        iterator = iter(items)
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            pending = {}
+
+            def submit_next() -> bool:
+                batch = list(islice(iterator, self.batch_size))
+                if not batch:
+                    return False
+                payloads = [payload for payload, _ in batch]
+                texts = [text for _, text in batch]
+                pending[executor.submit(self._embed, texts)] = payloads
+                return True
+
+            exhausted = False
+            while len(pending) < self.max_in_flight and not exhausted:
+                exhausted = not submit_next()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    payloads = pending.pop(future)
+                    if not exhausted:
+                        exhausted = not submit_next()
+                    if future.exception() is not None:
+                        self.failed_payloads.extend(payloads)
+                        continue
+                    yield list(zip(payloads, future.result()))
+
+        self.stats.finished_at = time.perf_counter()
+
+    def embed_all(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts and return vectors in input order.
+        Texts from failed batches get an empty vector.
+        """
+        vectors: List[List[float]] = [[] for _ in texts]
+        for batch in self.run(enumerate(texts)):
+            for position, vector in batch:
+                vectors[position] = vector
+        return vectors
@@ -0,0 +1,149 @@
+"""
+Local BM25 lexical index over ticket and chunk text (SQLite FTS5).
+Catches exact identifiers ("PROJ-1234", table names, error codes) that
+dense embeddings handle badly, and answers without an embedding call.
+Kept in step with the vector store at upsert and delete time.
+"""
+import os
+import re
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Use /tmp so the index is writable on Vercel serverless
+DEFAULT_LEXICAL_PATH = os.getenv("RAG_LEXICAL_PATH", "/tmp/rag_lexical.db")
+
+# BM25 weight of the key column (ticket key / document source) relative to the text
+KEY_WEIGHT = 5.0
+
+# Words, identifiers and numbers; hyphenated keys are also matched as a phrase
+TOKEN_PATTERN = re.compile(r"\w+(?:-\w+)*")
+
+
+def match_expression(query: str) -> str:
+    """Build an FTS5 MATCH expression that ORs every query term."""
+    clauses = []
+    for token in TOKEN_PATTERN.findall(query.lower()):
+        parts = token.replace("-", " ").split()
+        clauses.extend(f'"{part}"' for part in parts)
+        if len(parts) > 1:
+            clauses.append('"' + " ".join(parts) + '"')
+    return " OR ".join(dict.fromkeys(clauses))
+
+
+class LexicalIndex:
+    """
+    One FTS5 table per collection kind. `key` (ticket key or document source)
+    and `text` are searchable; vector metadata is kept alongside so hits can
+    be returned in the same (id, score, metadata) shape as vector matches.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = str(path or DEFAULT_LEXICAL_PATH)
+        self._lock = threading.Lock()
+        self._tables = set()
+        self._conn = None
+
+        try:
+            # Fails if this SQLite build has no FTS5
+            sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        except Exception as e:
+            print(f"WARNING: Lexical index disabled ({self.path}): {e}")
+            self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def _ensure(self, kind: str):
+        if kind in self._tables:
+            return
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {kind}_docs ("
+            "rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {kind}_fts USING fts5(key, text, tokenize='unicode61')"
+        )
+        self._tables.add(kind)
+
+    def _delete_locked(self, kind: str, ids: List[str]):
+        for vector_id in ids:
+            row = self._conn.execute(f"SELECT rowid FROM {kind}_docs WHERE id = ?", (vector_id,)).fetchone()
+            if row:
+                self._conn.execute(f"DELETE FROM {kind}_fts WHERE rowid = ?", row)
+                self._conn.execute(f"DELETE FROM {kind}_docs WHERE rowid = ?", row)
+
+    def upsert(self, kind: str, documents: List[Tuple[str, str, Dict[str, Any]]]):
+        """Insert or replace (id, key, metadata) documents; the text is metadata['text']."""
+        if not self.enabled or not documents:
+            return
+        with self._lock:
+            self._ensure(kind)
+            self._delete_locked(kind, [vector_id for vector_id, _, _ in documents])
+            for vector_id, key, metadata in documents:
+                fields = {name: value for name, value in metadata.items() if name != "text"}
+                cursor = self._conn.execute(
+                    f"INSERT INTO {kind}_docs (id, metadata) VALUES (?, ?)",
+                    (vector_id, json.dumps(fields, default=str))
+                )
+                self._conn.execute(
+                    f"INSERT INTO {kind}_fts (rowid, key, text) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, key, metadata.get("text", ""))
+                )
+            self._conn.commit()
+
+    def delete(self, kind: str, ids: List[str]):
+        if not self.enabled or not ids:
+            return
+        with self._lock:
+            self._ensure(kind)
+            self._delete_locked(kind, ids)
+            self._conn.commit()
+
+    def search(self, kind: str, query: str, top_k: int,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Return the top (id, BM25 score, metadata) matches, best first.
+        Normalized metadata `filters` are applied in the same query.
+        """
+        expression = match_expression(query)
+        if not self.enabled or not expression:
+            return []
+
+        conditions, params = [f"{kind}_fts MATCH ?"], [expression]
+        for field, allowed in (filters or {}).items():
+            if field == "created_ts":
+                low, high = allowed
+                if low is not None:
+                    conditions.append("json_extract(d.metadata, '$.created_ts') >= ?")
+                    params.append(low)
+                if high is not None:
+                    conditions.append("json_extract(d.metadata, '$.created_ts') <= ?")
+                    params.append(high)
+            else:
+                conditions.append(
+                    f"CAST(json_extract(d.metadata, '$.{field}') AS TEXT) IN ({', '.join('?' * len(allowed))})"
+                )
+                params.extend(allowed)
+
+        with self._lock:
+            self._ensure(kind)
+            rows = self._conn.execute(
+                f"SELECT d.id, -bm25({kind}_fts, {KEY_WEIGHT}, 1.0) AS score, f.text, d.metadata FROM {kind}_fts f "
+                f"JOIN {kind}_docs d ON d.rowid = f.rowid "
+                f"WHERE {' AND '.join(conditions)} ORDER BY score DESC LIMIT ?",
+                (*params, top_k)
+            ).fetchall()
+        return [(vector_id, score, {**json.loads(metadata), "text": text}) for vector_id, score, text, metadata in rows]
+
+    def count(self, kind: str) -> int:
+        if not self.enabled:
+            return 0
+        with self._lock:
+            self._ensure(kind)
+            return self._conn.execute(f"SELECT COUNT(*) FROM {kind}_docs").fetchone()[0]
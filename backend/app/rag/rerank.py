@@ -0,0 +1,120 @@
+"""
+Post-retrieval diversification.
+Retrieval over-fetches candidates; this stage collapses near-duplicates
+("daily ingestion failed" x 300) onto one representative and picks a
+diverse top-k with maximal marginal relevance (MMR). Similarities come from
+the vectors already returned by the search, so it costs no API calls.
+"""
+import os
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+Match = Tuple[str, float, Dict[str, Any]]
+
+# Relevance vs. diversity trade-off (1.0 = pure relevance)
+MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+# Cosine similarity above which two candidates count as the same item
+DUPLICATE_THRESHOLD = float(os.getenv("RAG_DUPLICATE_THRESHOLD", "0.95"))
+
+# Collapsed ids listed on a representative (the count is always exact)
+DUPLICATE_IDS_SHOWN = 5
+
+# Dimensions of the hashed bag-of-words fallback
+TEXT_VECTOR_DIM = 2048
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def text_vectors(texts: List[str]) -> np.ndarray:
+    """Hashed word and bigram counts, for candidates without a stored embedding."""
+    vectors = np.zeros((len(texts), TEXT_VECTOR_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = WORD_PATTERN.findall(text.lower())
+        terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        if terms:
+            buckets = [zlib.crc32(term.encode()) % TEXT_VECTOR_DIM for term in terms]
+            np.add.at(vectors[row], buckets, 1.0)
+    return vectors
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def mmr_select(relevance: np.ndarray, similarity: np.ndarray, k: int, lambda_: float = None,
+               duplicate_threshold: float = None) -> List[Tuple[int, List[int]]]:
+    """
+    Greedy MMR over a candidate similarity matrix.
+    Returns (selected index, [indices collapsed into it]) in selection order.
+    A candidate whose similarity to a selected one reaches duplicate_threshold
+    is collapsed into the most similar selected candidate instead of competing.
+    """
+    lambda_ = MMR_LAMBDA if lambda_ is None else lambda_
+    duplicate_threshold = DUPLICATE_THRESHOLD if duplicate_threshold is None else duplicate_threshold
+    count = len(relevance)
+    available = np.ones(count, dtype=bool)
+    # Highest similarity of each candidate to anything selected so far
+    max_similarity = np.full(count, -np.inf)
+    selected: List[int] = []
+
+    while len(selected) < k and available.any():
+        if selected:
+            scores = lambda_ * relevance - (1.0 - lambda_) * max_similarity
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+        available &= max_similarity < duplicate_threshold
+
+    duplicates: Dict[int, List[int]] = {index: [] for index in selected}
+    unselected = np.setdiff1d(np.arange(count), selected)
+    if len(unselected):
+        closest = np.asarray(selected)[np.argmax(similarity[np.ix_(unselected, selected)], axis=1)]
+        for index, owner in zip(unselected, closest):
+            if similarity[index, owner] >= duplicate_threshold:
+                duplicates[int(owner)].append(int(index))
+    return [(index, duplicates[index]) for index in selected]
+
+
+def diversify(matches: List[Match], k: int, vectors: Optional[Dict[str, Any]] = None,
+              lambda_: float = None, duplicate_threshold: float = None) -> List[Match]:
+    """
+    Re-rank best-first matches into a diverse top-k.
+
+    Uses `vectors` ({id: embedding}) when every candidate has one, otherwise
+    hashed text vectors for all of them, so similarities are comparable.
+    Representatives get `duplicate_count` and the first few `duplicate_ids`
+    of the candidates collapsed into them.
+    """
+    if len(matches) <= 1:
+        return matches[:k]
+
+    vectors = vectors or {}
+    if all(match_id in vectors for match_id, _, _ in matches):
+        candidates = np.asarray([vectors[match_id] for match_id, _, _ in matches], dtype=np.float32)
+    else:
+        candidates = text_vectors([metadata.get('text', '') for _, _, metadata in matches])
+    candidates = _unit_rows(candidates)
+    similarity = candidates @ candidates.T
+
+    # Scores from different searches (cosine, fused RRF) on a common 0..1 scale
+    relevance = np.asarray([score for _, score, _ in matches], dtype=np.float64)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones(len(matches))
+
+    reranked = []
+    for index, collapsed in mmr_select(relevance, similarity, k, lambda_, duplicate_threshold):
+        match_id, score, metadata = matches[index]
+        if collapsed:
+            metadata = {
+                **metadata,
+                "duplicate_count": len(collapsed),
+                "duplicate_ids": [matches[other][0] for other in collapsed[:DUPLICATE_IDS_SHOWN]]
+            }
+        reranked.append((match_id, score, metadata))
+    return reranked
@@ -1,9 +1,134 @@
 """
-RAG store - Now uses Pinecone for Vercel deployment.
-Imports from store_pinecone for cloud-based vector storage.
+RAG store - selects the vector store backend.
+
+RAG_BACKEND=pinecone uses Pinecone (cloud, Vercel deployment);
+RAG_BACKEND=local uses the in-process NumPy store. Defaults to Pinecone
+when PINECONE_API_KEY is set, otherwise the local store.
+
+The store is built on first use rather than at import, so a serverless cold
+start does not pay the backend's network round trips before serving its
+first request. RAG_INIT controls when that happens:
+  lazy       - on first use (default)
+  background - in a thread started by the app's startup hook (warm_up)
+  eager      - at import time
+A build that fails (e.g. Pinecone unreachable) is retried on a later use,
+waiting RAG_INIT_RETRY_SECONDS and doubling up to RAG_INIT_RETRY_MAX_SECONDS.
 """
-# Import Pinecone-based RAG store for Vercel deployment
-from app.rag.store_pinecone import rag_store
+import os
+import time
+import threading
+from typing import Any, Callable, List, Optional
+
+RAG_BACKEND = os.getenv("RAG_BACKEND", "pinecone" if os.getenv("PINECONE_API_KEY") else "local").lower()
+RAG_INIT = os.getenv("RAG_INIT", "lazy").lower()
+RAG_INIT_RETRY_SECONDS = float(os.getenv("RAG_INIT_RETRY_SECONDS", "5"))
+RAG_INIT_RETRY_MAX_SECONDS = float(os.getenv("RAG_INIT_RETRY_MAX_SECONDS", "300"))
+
+
+def create_rag_store(backend: str = RAG_BACKEND):
+    """Build a RAG store for the given backend name."""
+    if backend == "local":
+        from app.rag.store_local import LocalRAGStore
+        return LocalRAGStore()
+    if backend == "pinecone":
+        from app.rag.store_pinecone import PineconeRAGStore
+        return PineconeRAGStore()
+    raise ValueError(f"Unknown RAG_BACKEND: {backend}")
+
+
+class LazyRAGStore:
+    """
+    Stand-in for the RAG store that builds it on first attribute access.
+    Concurrent first uses wait for a single build. It is falsy when the store
+    could not be built, like the None the eager singleton used to be; failed
+    builds are retried with backoff.
+    """
+
+    def __init__(self, factory: Callable[[], Any] = create_rag_store):
+        self._factory = factory
+        self._store = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._on_ready: List[Callable[[Any], None]] = []
+        self.ready_hooks: Optional[threading.Thread] = None
+
+    @property
+    def initialized(self) -> bool:
+        """Built, or failed and not due for another attempt yet."""
+        return self._store is not None or time.monotonic() < self._retry_at
+
+    def get(self) -> Optional[Any]:
+        """The underlying store (built now if needed), or None if it failed to build."""
+        if self.initialized:
+            return self._store
+        with self._lock:
+            if self.initialized:
+                return self._store
+            try:
+                store = self._factory()
+                print(f"✅ RAG store initialized successfully ({store.backend_name})")
+            except Exception as e:
+                self._failures += 1
+                delay = min(RAG_INIT_RETRY_MAX_SECONDS, RAG_INIT_RETRY_SECONDS * 2 ** (self._failures - 1))
+                self._retry_at = time.monotonic() + delay
+                print(f"⚠️ Warning: Could not initialize RAG store: {e} (retrying in {delay:.0f}s)")
+                return None
+            self._store = store
+            callbacks, self._on_ready = self._on_ready, []
+
+        # Hooks (e.g. the lexical index rebuild) run outside the lock and off the
+        # caller's thread, so the request that triggered the build is not held up
+        if callbacks:
+            self.ready_hooks = threading.Thread(target=self._run_hooks, args=(store, callbacks),
+                                                name="rag-ready-hooks", daemon=True)
+            self.ready_hooks.start()
+        return store
+
+    def _run_hooks(self, store: Any, callbacks: List[Callable[[Any], None]]):
+        for callback in callbacks:
+            try:
+                callback(store)
+            except Exception as e:
+                print(f"Warning: RAG store ready hook failed: {e}")
+
+    async def aget(self) -> Optional[Any]:
+        """get() for async callers; a first build runs on the blocking worker pool."""
+        if self.initialized:
+            return self._store
+        from app.services.blocking import run_blocking
+        return await run_blocking(self.get)
+
+    def on_ready(self, callback: Callable[[Any], None]):
+        """Run callback(store) once the store is built (immediately if it already is)."""
+        with self._lock:
+            if self._store is None:
+                self._on_ready.append(callback)
+                return
+        callback(self._store)
+
+    def warm_up(self, background: bool = False) -> Optional[threading.Thread]:
+        """Build the store now, or in a daemon thread with background=True."""
+        if not background:
+            self.get()
+            return None
+        thread = threading.Thread(target=self.get, name="rag-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def __getattr__(self, name: str) -> Any:
+        store = self.get()
+        if store is None:
+            raise AttributeError(f"RAG store unavailable (no attribute {name!r})")
+        return getattr(store, name)
+
+    def __bool__(self) -> bool:
+        return self.get() is not None
+
+
+# Singleton instance
+rag_store = LazyRAGStore()
+if RAG_INIT == "eager":
+    rag_store.warm_up()
 
-# Re-export for backward compatibility
-__all__ = ['rag_store']
+__all__ = ['rag_store', 'create_rag_store', 'LazyRAGStore']
@@ -0,0 +1,427 @@
+"""
+In-process local RAG store.
+Keeps vectors in a memory-mapped NumPy matrix on disk and answers queries
+with a vectorized cosine top-k, so retrieval needs no network hop.
+Suited to small tenants, air-gapped installs and offline benchmarks.
+"""
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+from app.rag.ann_index import IVFIndex
+from app.rag.backend import RAGStoreBackend, JIRA, DOCS, JIRA_INDEX_NAME, DOCS_INDEX_NAME, index_name
+
+# Use /tmp for Vercel serverless (ephemeral storage)
+LOCAL_STORE_DIR = Path(os.getenv("RAG_LOCAL_DIR", "/tmp/rag_local"))
+
+# Search index: "flat" (exact brute force) or "ivf" (approximate, sublinear)
+LOCAL_INDEX_TYPE = os.getenv("RAG_LOCAL_INDEX", "flat").lower()
+
+# Filtered searches matching at most this many rows are scored exactly
+FILTERED_EXACT_MAX_ROWS = int(os.getenv("RAG_FILTERED_EXACT_MAX_ROWS", "20000"))
+
+# In-memory copy scored by exact search: "none" (score the float32 matrix) or
+# "int8" (a quarter of the memory). int8 scores only shortlist candidates,
+# which are then rescored against the float32 rows on disk, so the float32
+# matrix is never scanned and only shortlisted rows are paged in.
+LOCAL_QUANTIZATION = os.getenv("RAG_LOCAL_QUANTIZATION", "none").lower()
+QUANTIZATIONS = ("none", "int8")
+# Shortlist size per requested result when rescoring quantized scores
+RESCORE_FACTOR = int(os.getenv("RAG_RESCORE_FACTOR", "4"))
+# int8 rows widened to float32 at a time while scoring; small enough that the
+# scratch block stays in CPU cache instead of streaming a full copy to memory
+SCORE_BLOCK_ROWS = 256
+
+# Rows allocated up front; the matrix doubles when full
+INITIAL_CAPACITY = 1024
+
+
+def quantize(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantize unit vectors to int8 with one symmetric scale per vector."""
+    scales = np.abs(values).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(values / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class LocalVectorIndex:
+    """
+    Cosine-similarity index over a float32 matrix memory-mapped from disk.
+
+    Vectors are L2-normalized on insert, so a query is one matrix-vector
+    product. Ids and metadata live in a SQLite sidecar; deleted rows are
+    tombstoned and reused by later inserts. With index_type="ivf" queries
+    go through an IVF index once the collection is large enough to train it.
+    With quantization="int8" exact search scores a compact in-memory copy
+    and only reads shortlisted float32 rows from disk.
+    """
+
+    def __init__(self, directory: Path, dim: int, index_type: str = None, quantization: str = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.index_type = (index_type or LOCAL_INDEX_TYPE).lower()
+        self.quantization = (quantization or LOCAL_QUANTIZATION).lower()
+        if self.quantization not in QUANTIZATIONS:
+            raise ValueError(f"unknown quantization {self.quantization!r}, expected one of {QUANTIZATIONS} "
+                             f"(float16 was removed: numpy cannot score it faster than float32)")
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.ann = IVFIndex(self.directory, dim) if self.index_type == "ivf" else None
+        self.vectors_path = self.directory / "vectors.f32"
+        self._lock = threading.RLock()
+
+        self._db = sqlite3.connect(str(self.directory / "metadata.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+        self.ids: List[Optional[str]] = []
+        self.metadata: List[Optional[Dict[str, Any]]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.free_rows: List[int] = []
+        self.size = 0
+        # Per-field metadata arrays for filtering, dropped on every write
+        self._columns: Dict[str, np.ndarray] = {}
+
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        rows = self._db.execute("SELECT row, id, metadata FROM vectors ORDER BY row").fetchall()
+        self.size = rows[-1][0] + 1 if rows else 0
+        self.ids = [None] * self.size
+        self.metadata = [None] * self.size
+        for row, vector_id, metadata in rows:
+            self.ids[row] = vector_id
+            self.metadata[row] = json.loads(metadata)
+            self.id_to_row[vector_id] = row
+        self.free_rows = [row for row in range(self.size) if self.ids[row] is None]
+
+        capacity = max(INITIAL_CAPACITY, self.size)
+        if self.vectors_path.exists():
+            existing = self.vectors_path.stat().st_size // (4 * self.dim)
+            capacity = max(capacity, existing)
+        self._open_matrix(capacity)
+
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        for row in self.id_to_row.values():
+            self.alive[row] = True
+
+        if self.quantization != "none":
+            self._allocate_codes(self.capacity)
+            for start in range(0, self.size, SCORE_BLOCK_ROWS):
+                stop = min(start + SCORE_BLOCK_ROWS, self.size)
+                self._set_codes(np.arange(start, stop), np.asarray(self.matrix[start:stop]))
+
+    def _allocate_codes(self, capacity: int):
+        codes = np.zeros((capacity, self.dim), dtype=np.int8)
+        scales = np.ones(capacity, dtype=np.float32)
+        if self.codes is not None:
+            codes[:len(self.codes)] = self.codes
+            scales[:len(self.scales)] = self.scales
+        self.codes, self.scales = codes, scales
+
+    def _set_codes(self, rows, values: np.ndarray):
+        self.codes[rows], self.scales[rows] = quantize(values)
+
+    def _open_matrix(self, capacity: int):
+        required_bytes = capacity * self.dim * 4
+        with open(self.vectors_path, "ab") as f:
+            if f.tell() < required_bytes:
+                f.truncate(required_bytes)
+        self.matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def _grow(self, needed: int):
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        self.matrix.flush()
+        del self.matrix
+        self._open_matrix(capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+        if self.codes is not None:
+            self._allocate_codes(capacity)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        """Insert or overwrite {id, values, metadata} vectors."""
+        if not vectors:
+            return
+
+        values = np.asarray([vector["values"] for vector in vectors], dtype=np.float32)
+        if values.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-dim vectors, got {values.shape[1]}")
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values /= np.where(norms == 0, 1.0, norms)
+
+        with self._lock:
+            rows = []
+            assigned: Dict[str, int] = {}
+            for vector in vectors:
+                row = self.id_to_row.get(vector["id"], assigned.get(vector["id"]))
+                if row is None:
+                    row = self.free_rows.pop() if self.free_rows else self.size
+                    if row == self.size:
+                        self.size += 1
+                        self.ids.append(None)
+                        self.metadata.append(None)
+                    assigned[vector["id"]] = row
+                rows.append(row)
+
+            self._grow(self.size)
+            self.matrix[rows] = values
+            self.matrix.flush()
+            if self.codes is not None:
+                self._set_codes(rows, values)
+
+            self._columns = {}
+            for row, vector in zip(rows, vectors):
+                metadata = vector.get("metadata") or {}
+                self.ids[row] = vector["id"]
+                self.metadata[row] = metadata
+                self.id_to_row[vector["id"]] = row
+                self.alive[row] = True
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO vectors (row, id, metadata) VALUES (?, ?, ?)",
+                [(row, vector["id"], json.dumps(vector.get("metadata") or {})) for row, vector in zip(rows, vectors)]
+            )
+            self._db.commit()
+
+            if self.ann is not None:
+                if self.ann.needs_training(len(self.id_to_row)):
+                    self.train_ann()
+                else:
+                    self.ann.add(rows, values)
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            rows = [self.id_to_row.pop(vector_id) for vector_id in ids if vector_id in self.id_to_row]
+            if not rows:
+                return
+            self._columns = {}
+            for row in rows:
+                self.ids[row] = None
+                self.metadata[row] = None
+                self.alive[row] = False
+                self.free_rows.append(row)
+            self._db.executemany("DELETE FROM vectors WHERE row = ?", [(row,) for row in rows])
+            self._db.commit()
+            if self.ann is not None:
+                self.ann.remove(rows)
+
+    def train_ann(self, nlist: int = None):
+        """(Re)train the IVF index on every live row."""
+        if self.ann is None:
+            self.ann = IVFIndex(self.directory, self.dim)
+            self.index_type = "ivf"
+        with self._lock:
+            live_rows = np.flatnonzero(self.alive[:self.size])
+            if len(live_rows):
+                self.ann.train(self.matrix, live_rows, nlist)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.id_to_row)
+
+    @property
+    def bytes_per_vector(self) -> int:
+        """Bytes per vector held in memory for exact search."""
+        if self.codes is None:
+            return self.dim * 4
+        return self.dim * self.codes.itemsize + self.scales.itemsize
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Cosine scores for `rows` (all rows when None): exact from the float32
+        matrix, or approximate from the quantized copy, block by block.
+        """
+        if self.codes is None:
+            return self.matrix[rows] @ query if rows is not None else self.matrix[:self.size] @ query
+
+        count = self.size if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        scratch = np.empty((min(SCORE_BLOCK_ROWS, count), self.dim), dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            stop = min(start + SCORE_BLOCK_ROWS, count)
+            block = scratch[:stop - start]
+            block[...] = self.codes[start:stop] if rows is None else self.codes[rows[start:stop]]
+            np.matmul(block, query, out=scores[start:stop])
+        scores *= self.scales[:count] if rows is None else self.scales[rows]
+        return scores
+
+    def _column(self, field: str) -> np.ndarray:
+        """Metadata field as an array over rows (rebuilt lazily after writes)."""
+        column = self._columns.get(field)
+        if column is None:
+            values = [metadata.get(field) if metadata else None for metadata in self.metadata[:self.size]]
+            if field == "created_ts":
+                column = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+            else:
+                column = np.array([None if value is None else str(value) for value in values], dtype=object)
+            self._columns[field] = column
+        return column
+
+    def filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask of live rows matching normalized metadata filters."""
+        mask = self.alive[:self.size].copy()
+        for field, allowed in filters.items():
+            column = self._column(field)
+            if field == "created_ts":
+                low, high = allowed
+                with np.errstate(invalid="ignore"):
+                    mask &= ~np.isnan(column)
+                    if low is not None:
+                        mask &= column >= low
+                    if high is not None:
+                        mask &= column <= high
+            else:
+                mask &= np.isin(column, allowed)
+        return mask
+
+    def search(self, vector: List[float], top_k: int, nprobe: int = None, exact: bool = False,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Cosine top-k over all live rows.
+        Uses the IVF index (probing `nprobe` clusters) when trained, unless exact=True.
+        Normalized `filters` are applied before scoring, so only matching rows
+        are compared with the query.
+        """
+        if not self.id_to_row or top_k <= 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query /= norm
+
+        with self._lock:
+            mask = self.filter_mask(filters) if filters else None
+
+            # A selective filter leaves few rows: scoring them exactly is cheap,
+            # while probing a few IVF clusters could miss sparse matches
+            if mask is not None and np.count_nonzero(mask) <= FILTERED_EXACT_MAX_ROWS:
+                exact = True
+
+            if self.ann is not None and self.ann.trained and not exact:
+                matches = self.ann.search(self.matrix, query, top_k, nprobe, mask=mask)
+                return [
+                    (self.ids[row], score, self.metadata[row])
+                    for row, score in matches if self.alive[row]
+                ]
+
+            if mask is not None:
+                rows = np.flatnonzero(mask)
+                if len(rows) == 0:
+                    return []
+                scores = self._scores(query, rows)
+                live = len(rows)
+            else:
+                scores = self._scores(query, None)
+                scores[~self.alive[:self.size]] = -np.inf
+                rows = np.arange(self.size)
+                live = len(self.id_to_row)
+
+            k = min(top_k, live)
+            if self.codes is not None:
+                # Rescore the quantized shortlist against the float32 rows
+                rows = np.sort(rows[top_indices(scores, min(k * RESCORE_FACTOR, live))])
+                scores = self.matrix[rows] @ query
+            top = top_indices(scores, k)
+            return [(self.ids[rows[i]], float(scores[i]), self.metadata[rows[i]]) for i in top]
+
+    def fetch(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                vector_id: self.metadata[self.id_to_row[vector_id]]
+                for vector_id in ids if vector_id in self.id_to_row
+            }
+
+    def vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored (normalized) vectors for the given ids."""
+        with self._lock:
+            return {
+                vector_id: np.array(self.matrix[self.id_to_row[vector_id]])
+                for vector_id in ids if vector_id in self.id_to_row
+            }
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            return [(vector_id, self.metadata[row]) for vector_id, row in self.id_to_row.items()]
+
+
+class LocalRAGStore(RAGStoreBackend):
+    """RAG store backed by on-disk NumPy matrices (no vector DB required)."""
+
+    backend_name = "local vector store"
+
+    # Writes are serialized by the index lock and have no request-size limit
+    upsert_options = {"max_vectors": 1000, "max_bytes": 1 << 62, "workers": 1}
+
+    def __init__(self, directory: Path = None):
+        self.directory = Path(directory or LOCAL_STORE_DIR)
+
+        # Set up Google Gemini for embeddings
+        self._init_embeddings()
+
+        self.indexes = {
+            JIRA: LocalVectorIndex(self.directory / index_name(JIRA_INDEX_NAME, self.embedding_dim), self.embedding_dim),
+            DOCS: LocalVectorIndex(self.directory / index_name(DOCS_INDEX_NAME, self.embedding_dim), self.embedding_dim),
+        }
+        self._init_lexical(self.directory / "lexical.db")
+
+    def _ready(self, kind: str) -> bool:
+        return kind in self.indexes
+
+    def _upsert(self, kind: str, vectors: List[Dict[str, Any]]):
+        self.indexes[kind].upsert(vectors)
+
+    def _query(self, kind: str, vector: List[float], n_results: int,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+        return self.indexes[kind].search(vector, n_results, filters=filters)
+
+    def _stored_vectors(self, kind: str, ids: List[str]) -> Dict[str, List[float]]:
+        return self.indexes[kind].vectors(ids)
+
+    def _fetch(self, kind: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return self.indexes[kind].fetch(ids)
+
+    def _delete(self, kind: str, ids: List[str]):
+        self.indexes[kind].delete(ids)
+
+    def _list_ids(self, kind: str) -> Iterator[List[str]]:
+        yield [vector_id for vector_id, _ in self.indexes[kind].items()]
+
+    def _document_chunk_ids(self, doc_id: str) -> List[str]:
+        return [
+            chunk_id for chunk_id, metadata in self.indexes[DOCS].items()
+            if metadata.get('parent_id') == doc_id
+        ]
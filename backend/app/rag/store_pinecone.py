@@ -3,18 +3,62 @@ Minimal Pinecone RAG store optimized for Vercel deployment.
 Uses Pinecone SDK and Google Embeddings directly (no llama-index).
 """
 import os
-from typing import List, Dict, Any
+import json
+import time
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 from pinecone import Pinecone, ServerlessSpec
-import google.generativeai as genai
+
+from app.rag.backend import (
+    RAGStoreBackend, JIRA, JIRA_INDEX_NAME, DOCS_INDEX_NAME, index_name, project_key
+)
+
+# Partition the JIRA index into one namespace per project key
+NAMESPACE_BY_PROJECT = os.getenv("PINECONE_NAMESPACE_BY_PROJECT", "true").lower() in ("1", "true", "yes")
+NAMESPACE_CACHE_SECONDS = 60
+
+# Index hosts known to exist, shared by cold starts on the same instance;
+# a fresh entry skips list_indexes() and the host lookup behind pc.Index()
+INDEX_CACHE_PATH = Path(os.getenv("PINECONE_INDEX_CACHE_PATH", "/tmp/pinecone_indexes.json"))
+INDEX_CACHE_SECONDS = int(os.getenv("PINECONE_INDEX_CACHE_SECONDS", "86400"))
+
+# Fans a query out to several namespaces (separate from the backend's query pool)
+_namespace_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pinecone-ns")
+
+
+def pinecone_filter(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Translate normalized filters into a Pinecone metadata filter."""
+    translated: Dict[str, Any] = {}
+    for field, allowed in filters.items():
+        if field == "created_ts":
+            low, high = allowed
+            bounds = {}
+            if low is not None:
+                bounds["$gte"] = low
+            if high is not None:
+                bounds["$lte"] = high
+            translated[field] = bounds
+        else:
+            translated[field] = {"$in": list(allowed)}
+    return translated
 
 
-class PineconeRAGStore:
+class PineconeRAGStore(RAGStoreBackend):
     """
     Minimal RAG store using Pinecone SDK directly.
     Optimized for Vercel serverless deployment (lightweight).
     """
 
+    backend_name = "Pinecone"
+
     def __init__(self):
+        self.jira_index = None
+        self.docs_index = None
+        self.embedding_model = None
+        self._namespace_cache: Dict[str, Tuple[float, List[str]]] = {}
+
         # Initialize Pinecone
         api_key = os.getenv("PINECONE_API_KEY")
 
@@ -26,267 +70,234 @@ class PineconeRAGStore:
         self.pc = Pinecone(api_key=api_key)
 
         # Set up Google Gemini for embeddings
-        gemini_api_key = os.getenv("GOOGLE_API_KEY")
-        if not gemini_api_key:
-            print("WARNING: GOOGLE_API_KEY not found. Embeddings will not work.")
-            self.embedding_model = None
-        else:
-            genai.configure(api_key=gemini_api_key)
-            self.embedding_model = "models/text-embedding-004"
-
-        # Index names
-        self.jira_index_name = "jira-history"
-        self.docs_index_name = "architecture-docs"
+        self._init_embeddings()
+        self._init_lexical()
 
-        # Embedding dimension for Google's text-embedding-004
-        self.embedding_dim = 768
+        # Index names (suffixed with the dimension when RAG_EMBEDDING_DIM is reduced)
+        self.jira_index_name = index_name(JIRA_INDEX_NAME, self.embedding_dim)
+        self.docs_index_name = index_name(DOCS_INDEX_NAME, self.embedding_dim)
 
-        # Create indexes if they don't exist
-        self._ensure_indexes()
-
-        # Get Pinecone indexes
+        # Create indexes if they don't exist, then connect by host
+        self._cache_key = hashlib.sha256(api_key.encode()).hexdigest()[:16]
         try:
-            self.jira_index = self.pc.Index(self.jira_index_name)
-            self.docs_index = self.pc.Index(self.docs_index_name)
+            hosts = self._ensure_indexes()
+            self.jira_index = self._connect(self.jira_index_name, hosts.get(self.jira_index_name))
+            self.docs_index = self._connect(self.docs_index_name, hosts.get(self.docs_index_name))
         except Exception as e:
             print(f"Error connecting to Pinecone indexes: {e}")
+            self._forget_cached_indexes()
             self.jira_index = None
             self.docs_index = None
 
-    def _ensure_indexes(self):
-        """Create Pinecone indexes if they don't exist."""
-        if not self.pc:
-            return
-
-        existing_indexes = [idx.name for idx in self.pc.list_indexes()]
-
-        # Create JIRA index if needed
-        if self.jira_index_name not in existing_indexes:
-            try:
-                self.pc.create_index(
-                    name=self.jira_index_name,
-                    dimension=self.embedding_dim,
-                    metric="cosine",
-                    spec=ServerlessSpec(cloud="aws", region="us-east-1")
-                )
-                print(f"Created Pinecone index: {self.jira_index_name}")
-            except Exception as e:
-                print(f"Error creating JIRA index: {e}")
-
-        # Create docs index if needed
-        if self.docs_index_name not in existing_indexes:
-            try:
-                self.pc.create_index(
-                    name=self.docs_index_name,
-                    dimension=self.embedding_dim,
-                    metric="cosine",
-                    spec=ServerlessSpec(cloud="aws", region="us-east-1")
-                )
-                print(f"Created Pinecone index: {self.docs_index_name}")
-            except Exception as e:
-                print(f"Error creating docs index: {e}")
-
-    def _get_embedding(self, text: str) -> List[float]:
-        """Get embedding for text using Google's embedding model."""
-        if not self.embedding_model:
-            return []
-
-        try:
-            result = genai.embed_content(
-                model=self.embedding_model,
-                content=text,
-                task_type="retrieval_document"
-            )
-            return result['embedding']
-        except Exception as e:
-            print(f"Error getting embedding: {e}")
-            return []
-
-    def add_jira_tickets(self, tickets: List[Dict[str, Any]]):
-        """Ingest JIRA tickets into vector store."""
-        if not self.pc or not self.jira_index:
-            print("Pinecone not initialized. Skipping ticket ingestion.")
-            return
-
-        vectors = []
-        for ticket in tickets:
-            text = f"Summary: {ticket['summary']}\nDescription: {ticket['description']}"
-            embedding = self._get_embedding(text)
-
-            if embedding:
-                vectors.append({
-                    "id": str(ticket['id']),
-                    "values": embedding,
-                    "metadata": {
-                        "text": text,
-                        "status": ticket.get('status', 'Unknown'),
-                        "issuetype": ticket.get('issuetype', 'Unknown')
-                    }
-                })
-
-        if vectors:
-            try:
-                self.jira_index.upsert(vectors=vectors)
-                print(f"Upserted {len(vectors)} JIRA tickets to Pinecone")
-            except Exception as e:
-                print(f"Error upserting tickets: {e}")
-
-    def add_documents(self, docs: List[Dict[str, str]]):
-        """Ingest documents with chunking."""
-        if not self.pc or not self.docs_index:
-            print("Pinecone not initialized. Skipping document ingestion.")
-            return
+    def _connect(self, name: str, host: Optional[str]):
+        return self.pc.Index(name, host=host) if host else self.pc.Index(name)
 
-        vectors = []
-        for doc in docs:
-            # Simple chunking: split by paragraphs (double newline)
-            chunks = [chunk.strip() for chunk in doc['content'].split('\n\n') if chunk.strip()]
-
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{doc['id']}_chunk_{i}"
-                embedding = self._get_embedding(chunk)
-
-                if embedding:
-                    vectors.append({
-                        "id": chunk_id,
-                        "values": embedding,
-                        "metadata": {
-                            "text": chunk,
-                            "source": doc['source'],
-                            "parent_id": doc['id'],
-                            "chunk_index": i
-                        }
-                    })
-
-        if vectors:
-            try:
-                self.docs_index.upsert(vectors=vectors)
-                print(f"Upserted {len(vectors)} document chunks to Pinecone")
-            except Exception as e:
-                print(f"Error upserting documents: {e}")
-
-    def query_similar_tickets(self, query: str, n_results: int = 3) -> Dict[str, Any]:
-        """Retrieve similar past tickets using vector search."""
-        if not self.pc or not self.jira_index:
-            return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
-
-        query_embedding = self._get_embedding(query)
-        if not query_embedding:
-            return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
+    # ------------------------------------------------------------------
+    # Index existence cache (/tmp, survives warm invocations)
+    # ------------------------------------------------------------------
 
+    def _read_index_cache(self) -> Dict[str, Any]:
         try:
-            results = self.jira_index.query(
-                vector=query_embedding,
-                top_k=n_results,
-                include_metadata=True
-            )
-
-            # Format results to match original API
-            ids = [match['id'] for match in results['matches']]
-            documents = [match['metadata'].get('text', '') for match in results['matches']]
-            metadatas = [match['metadata'] for match in results['matches']]
-            distances = [1.0 - match['score'] for match in results['matches']]
-
-            return {
-                'ids': [ids],
-                'documents': [documents],
-                'metadatas': [metadatas],
-                'distances': [distances]
-            }
-        except Exception as e:
-            print(f"Error querying tickets: {e}")
-            return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'distances': [[]]}
-
-    def query_docs(self, query: str, n_results: int = 5) -> List[str]:
-        """Retrieve relevant documentation."""
-        if not self.pc or not self.docs_index:
-            return []
-
-        query_embedding = self._get_embedding(query)
-        if not query_embedding:
-            return []
-
-        try:
-            results = self.docs_index.query(
-                vector=query_embedding,
-                top_k=n_results,
-                include_metadata=True
-            )
-
-            return [match['metadata'].get('text', '') for match in results['matches']]
-        except Exception as e:
-            print(f"Error querying docs: {e}")
-            return []
-
-    def list_documents(self) -> List[Dict[str, Any]]:
-        """List all uploaded documents."""
-        # Note: Pinecone doesn't support listing all documents easily
-        # This would require maintaining a separate metadata store
-        return []
-
-    def list_jira_tickets(self) -> List[Dict[str, Any]]:
-        """List all uploaded JIRA tickets."""
-        # Note: Pinecone doesn't support listing all documents easily
-        return []
-
-    def delete_document(self, doc_id: str) -> bool:
-        """Delete a document from the vector store."""
-        if not self.pc or not self.docs_index:
-            return False
+            cache = json.loads(INDEX_CACHE_PATH.read_text())
+        except (OSError, ValueError):
+            return {}
+        entries = cache.get(self._cache_key, {})
+        return {
+            name: entry for name, entry in entries.items()
+            if time.time() - entry.get("checked_at", 0) < INDEX_CACHE_SECONDS
+            and entry.get("dimension") == self.embedding_dim
+        }
 
+    def _write_index_cache(self, entries: Dict[str, Any]):
         try:
-            # Delete all chunks with this parent_id
-            # Note: Pinecone doesn't support delete by metadata directly
-            # This is a limitation - we can only delete by ID
-            self.docs_index.delete(ids=[doc_id])
-            return True
-        except Exception as e:
-            print(f"Error deleting document {doc_id}: {e}")
-            return False
-
-    def delete_jira_ticket(self, ticket_id: str) -> bool:
-        """Delete a JIRA ticket from the vector store."""
-        if not self.pc or not self.jira_index:
-            return False
-
+            cache = json.loads(INDEX_CACHE_PATH.read_text()) if INDEX_CACHE_PATH.exists() else {}
+        except (OSError, ValueError):
+            cache = {}
+        cache[self._cache_key] = entries
         try:
-            self.jira_index.delete(ids=[ticket_id])
-            return True
-        except Exception as e:
-            print(f"Error deleting ticket {ticket_id}: {e}")
-            return False
-
-    # Collections property for backward compatibility
-    @property
-    def docs_collection(self):
-        """Mock collection object for backward compatibility."""
-        return MockCollection(self.docs_index)
-
-    @property
-    def jira_collection(self):
-        """Mock collection object for backward compatibility."""
-        return MockCollection(self.jira_index)
-
-
-class MockCollection:
-    """Mock collection class for backward compatibility with ChromaDB API."""
-
-    def __init__(self, index):
-        self.index = index
-
-    def get(self, ids=None):
-        """Mock get method - returns empty results."""
+            tmp_path = INDEX_CACHE_PATH.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(cache))
+            tmp_path.replace(INDEX_CACHE_PATH)
+        except OSError as e:
+            print(f"Could not write Pinecone index cache: {e}")
+
+    def _forget_cached_indexes(self):
+        self._write_index_cache({})
+
+    def _ensure_indexes(self) -> Dict[str, Optional[str]]:
+        """
+        Create Pinecone indexes if they don't exist and return {name: host}.
+        Served from the index cache when both indexes were seen recently.
+        """
+        if not self.pc:
+            return {}
+
+        names = (self.jira_index_name, self.docs_index_name)
+        cached = self._read_index_cache()
+        if all(name in cached for name in names):
+            return {name: cached[name].get("host") for name in names}
+
+        existing = {idx.name: idx for idx in self.pc.list_indexes()}
+        for name in names:
+            if name in existing and existing[name].dimension != self.embedding_dim:
+                print(f"WARNING: Pinecone index {name} has dimension {existing[name].dimension}, "
+                      f"expected {self.embedding_dim}; upserts and queries will fail")
+
+        entries = {}
+        for name in names:
+            description = existing.get(name)
+            if description is None:
+                try:
+                    description = self.pc.create_index(
+                        name=name,
+                        dimension=self.embedding_dim,
+                        metric="cosine",
+                        spec=ServerlessSpec(cloud="aws", region="us-east-1")
+                    )
+                    print(f"Created Pinecone index: {name}")
+                except Exception as e:
+                    print(f"Error creating index {name}: {e}")
+                    continue
+            entries[name] = {
+                "host": getattr(description, "host", None),
+                "dimension": getattr(description, "dimension", self.embedding_dim),
+                "checked_at": time.time()
+            }
+        self._write_index_cache(entries)
+        return {name: entry["host"] for name, entry in entries.items()}
+
+    def _index(self, kind: str):
+        return self.jira_index if kind == JIRA else self.docs_index
+
+    def _ready(self, kind: str) -> bool:
+        return bool(self.pc) and self._index(kind) is not None
+
+    # ------------------------------------------------------------------
+    # Namespaces: JIRA tickets are partitioned by project key
+    # ------------------------------------------------------------------
+
+    def _namespace(self, kind: str, vector_id: str) -> str:
+        # Derived from the id alone, so fetch/delete need no lookup
+        return project_key(vector_id) if kind == JIRA and NAMESPACE_BY_PROJECT else ""
+
+    def _group_by_namespace(self, kind: str, items: List[Any], id_of=lambda item: item) -> Dict[str, List[Any]]:
+        groups: Dict[str, List[Any]] = {}
+        for item in items:
+            groups.setdefault(self._namespace(kind, id_of(item)), []).append(item)
+        return groups
+
+    def _namespaces(self, kind: str) -> List[str]:
+        """Namespaces present in the index (cached for NAMESPACE_CACHE_SECONDS)."""
+        if kind != JIRA or not NAMESPACE_BY_PROJECT:
+            return [""]
+        cached = self._namespace_cache.get(kind)
+        if cached and time.monotonic() - cached[0] < NAMESPACE_CACHE_SECONDS:
+            return cached[1]
+        stats = self._index(kind).describe_index_stats()
+        namespaces = list((stats.get('namespaces') or {}).keys()) or [""]
+        self._namespace_cache[kind] = (time.monotonic(), namespaces)
+        return namespaces
+
+    def _upsert(self, kind: str, vectors: List[Dict[str, Any]]):
+        for namespace, group in self._group_by_namespace(kind, vectors, lambda vector: vector["id"]).items():
+            self._index(kind).upsert(vectors=group, namespace=namespace)
+            cached = self._namespace_cache.get(kind)
+            if cached and namespace not in cached[1]:
+                cached[1].append(namespace)
+
+    def _query_namespace(self, kind: str, namespace: str, vector: List[float], n_results: int,
+                         pinecone_filters: Optional[Dict[str, Any]], include_values: bool = False) -> List[Any]:
+        results = self._index(kind).query(
+            vector=vector,
+            top_k=n_results,
+            include_metadata=True,
+            include_values=include_values,
+            namespace=namespace,
+            filter=pinecone_filters or None
+        )
+        return results['matches']
+
+    def _query_matches(self, kind: str, vector: List[float], n_results: int,
+                       filters: Optional[Dict[str, Any]], include_values: bool) -> List[Any]:
+        """Raw matches, best first, across the namespaces the filters select."""
+        filters = filters or {}
+        namespaces = self._namespaces(kind)
+        if kind == JIRA and NAMESPACE_BY_PROJECT and "project" in filters:
+            # Only the requested projects' partitions are searched, plus the
+            # default namespace (tickets upserted before partitioning and ids
+            # that are not issue keys). A project value that names no
+            # partition (metadata 'project' need not be the key) keeps them all.
+            wanted = set(filters["project"])
+            if wanted <= set(namespaces):
+                namespaces = [namespace for namespace in namespaces if namespace in wanted or namespace == ""]
+        pinecone_filters = pinecone_filter(filters)
+
+        if len(namespaces) == 1:
+            return self._query_namespace(kind, namespaces[0], vector, n_results, pinecone_filters, include_values)
+
+        futures = [
+            _namespace_pool.submit(self._query_namespace, kind, namespace, vector, n_results,
+                                   pinecone_filters, include_values)
+            for namespace in namespaces
+        ]
+        merged: Dict[str, Any] = {}
+        for future in futures:
+            for match in future.result():
+                if match['id'] not in merged or match['score'] > merged[match['id']]['score']:
+                    merged[match['id']] = match
+        return sorted(merged.values(), key=lambda match: -match['score'])[:n_results]
+
+    def _query(self, kind: str, vector: List[float], n_results: int,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float, Dict[str, Any]]]:
+        matches = self._query_matches(kind, vector, n_results, filters, include_values=False)
+        return [(match['id'], match['score'], match['metadata']) for match in matches]
+
+    def _query_with_values(self, kind: str, vector: List[float], n_results: int,
+                           filters: Optional[Dict[str, Any]] = None
+                           ) -> Tuple[List[Tuple[str, float, Dict[str, Any]]], Dict[str, List[float]]]:
+        # Values come back with the query, so re-ranking needs no fetch
+        matches = self._query_matches(kind, vector, n_results, filters, include_values=True)
+        return (
+            [(match['id'], match['score'], match['metadata']) for match in matches],
+            {match['id']: match['values'] for match in matches if match['values']}
+        )
+
+    def _fetch_raw(self, kind: str, ids: List[str]) -> Dict[str, Any]:
+        found = {}
+        for namespace, group in self._group_by_namespace(kind, ids).items():
+            found.update(self._index(kind).fetch(ids=group, namespace=namespace)['vectors'])
+
+        # Tickets upserted before partitioning live in the default namespace
+        legacy = [vector_id for vector_id in ids if vector_id not in found and self._namespace(kind, vector_id)]
+        if legacy:
+            found.update(self._index(kind).fetch(ids=legacy, namespace="")['vectors'])
+        return found
+
+    def _fetch(self, kind: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {vector_id: vector['metadata'] or {} for vector_id, vector in self._fetch_raw(kind, ids).items()}
+
+    def _fetch_vectors(self, kind: str, ids: List[str]) -> Dict[str, Tuple[Optional[List[float]], Dict[str, Any]]]:
+        # Fetch returns values with the metadata
         return {
-            'ids': ids or [],
-            'documents': [],
-            'metadatas': []
+            vector_id: (vector['values'] or None, vector['metadata'] or {})
+            for vector_id, vector in self._fetch_raw(kind, ids).items()
         }
 
-
-# Singleton instance
-try:
-    rag_store = PineconeRAGStore()
-    print("✅ Minimal Pinecone RAG store initialized successfully")
-except Exception as e:
-    print(f"⚠️ Warning: Could not initialize Pinecone RAG store: {e}")
-    rag_store = None
+    def _delete(self, kind: str, ids: List[str]):
+        for namespace, group in self._group_by_namespace(kind, ids).items():
+            self._index(kind).delete(ids=group, namespace=namespace)
+            if namespace:
+                # Also remove copies upserted before partitioning
+                self._index(kind).delete(ids=group, namespace="")
+
+    def _list_ids(self, kind: str) -> Iterator[List[str]]:
+        # Paginated id listing (serverless indexes only)
+        for namespace in self._namespaces(kind):
+            yield from self._index(kind).list(namespace=namespace)
+
+    def _document_chunk_ids(self, doc_id: str) -> List[str]:
+        # Chunks are stored as {doc_id}_chunk_{i}; serverless indexes can list ids by prefix
+        chunk_ids = []
+        for page in self.docs_index.list(prefix=f"{doc_id}_chunk_"):
+            chunk_ids.extend(page)
+        return chunk_ids
@@ -0,0 +1,146 @@
+"""
+Size-aware, parallel upserts with retry.
+Splits a stream of vectors into requests bounded by vector count and payload
+bytes, sends them through a small worker pool, retries transient failures
+with exponential backoff and reports what actually landed per batch.
+"""
+import os
+import json
+import time
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List
+
+# Pinecone caps upserts at 1000 vectors / 2MB per request and recommends ~100
+DEFAULT_MAX_VECTORS = int(os.getenv("RAG_UPSERT_BATCH_SIZE", "100"))
+DEFAULT_MAX_BYTES = int(os.getenv("RAG_UPSERT_MAX_BYTES", str(1_800_000)))
+DEFAULT_WORKERS = int(os.getenv("RAG_UPSERT_WORKERS", "4"))
+DEFAULT_MAX_RETRIES = int(os.getenv("RAG_UPSERT_RETRIES", "3"))
+
+# HTTP statuses that will not succeed on retry
+PERMANENT_STATUSES = {400, 401, 403, 404, 413, 422}
+
+
+def vector_payload_bytes(vector: Dict[str, Any]) -> int:
+    """Approximate serialized size of one vector in an upsert request."""
+    return len(json.dumps(vector, separators=(",", ":"), default=str))
+
+
+# Network failures of the HTTP clients vector store SDKs use, as (package, class
+# name) so the check needs none of them installed
+TRANSPORT_ERRORS = {
+    ("urllib3", "ProtocolError"), ("urllib3", "TimeoutError"), ("urllib3", "NewConnectionError"),
+    ("urllib3", "MaxRetryError"), ("requests", "ConnectionError"), ("requests", "Timeout"),
+    ("httpx", "TransportError"),
+}
+
+
+def is_network_error(error: Exception) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any((cls.__module__.split(".")[0], cls.__name__) in TRANSPORT_ERRORS for cls in type(error).__mro__)
+
+
+def is_transient(error: Exception) -> bool:
+    """Retry rate limits, server errors and network failures; anything else is a bug or bad input."""
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if status is None:
+        return is_network_error(error)
+    return status not in PERMANENT_STATUSES
+
+
+class UpsertBatcher:
+    """
+    Accumulates vectors and upserts them in bounded requests.
+
+    At most `workers * 2` requests are queued or in flight; add() blocks on
+    the oldest one beyond that, so memory stays bounded regardless of the
+    upload size.
+    """
+
+    def __init__(self, upsert: Callable[[List[Dict[str, Any]]], Any], max_vectors: int = None,
+                 max_bytes: int = None, workers: int = None, max_retries: int = None,
+                 backoff_seconds: float = 0.5, label: str = "vectors"):
+        self.upsert = upsert
+        self.max_vectors = max_vectors or DEFAULT_MAX_VECTORS
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self.workers = max(1, workers or DEFAULT_WORKERS)
+        self.max_retries = DEFAULT_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_seconds = backoff_seconds
+        self.label = label
+
+        self.reports: List[Dict[str, Any]] = []
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rag-upsert")
+        self._pending: Deque = deque()
+        self._batch: List[Dict[str, Any]] = []
+        self._batch_bytes = 0
+        self._batch_number = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, vectors: List[Dict[str, Any]]):
+        for vector in vectors:
+            size = vector_payload_bytes(vector)
+            if self._batch and (len(self._batch) >= self.max_vectors or self._batch_bytes + size > self.max_bytes):
+                self._submit()
+            self._batch.append(vector)
+            self._batch_bytes += size
+
+    def _submit(self):
+        batch, size = self._batch, self._batch_bytes
+        self._batch, self._batch_bytes = [], 0
+        self._batch_number += 1
+
+        while len(self._pending) >= self.workers * 2:
+            self._pending.popleft().result()
+        self._pending.append(self._executor.submit(self._send, self._batch_number, batch, size))
+
+    def _send(self, number: int, batch: List[Dict[str, Any]], size: int) -> Dict[str, Any]:
+        report = {
+            "batch": number,
+            "count": len(batch),
+            "bytes": size,
+            "first_id": batch[0]["id"],
+            "last_id": batch[-1]["id"],
+            "attempts": 0,
+            "status": "ok",
+        }
+        for attempt in range(self.max_retries + 1):
+            report["attempts"] = attempt + 1
+            try:
+                self.upsert(batch)
+                break
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    print(f"Error upserting {self.label} batch {number} ({len(batch)} vectors): {e}")
+                    report["status"] = "failed"
+                    report["error"] = str(e)
+                    report["ids"] = [vector["id"] for vector in batch]
+                    break
+                time.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+        self.reports.append(report)
+        return report
+
+    def close(self) -> Dict[str, Any]:
+        """Flush the last partial batch, wait for every request and return the report."""
+        if self._batch:
+            self._submit()
+        while self._pending:
+            self._pending.popleft().result()
+        self._executor.shutdown(wait=True)
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        batches = sorted(self.reports, key=lambda r: r["batch"])
+        return {
+            "upserted": sum(r["count"] for r in batches if r["status"] == "ok"),
+            "failed": sum(r["count"] for r in batches if r["status"] == "failed"),
+            "retries": sum(r["attempts"] - 1 for r in batches),
+            "failed_ids": [vector_id for r in batches for vector_id in r.get("ids", [])],
+            "batches": batches,
+        }
@@ -1,21 +1,46 @@
 import json
 import re
-from typing import Dict, Any, Optional
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 from app.agents.request_creator_agent import request_creator
+from app.services.schema_compiler import CompiledSchema
 
 class AIService:
     def __init__(self):
         pass
 
-    async def extract_request_details(self, context: str, files: list = None, jira_schema: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def extract_request_details(self, context: str, files: list = None, jira_schema: Dict[str, Any] = None,
+                                      rag_filters: Dict[str, Any] = None, use_cache: bool = True,
+                                      compiled_schema: Optional[CompiledSchema] = None) -> Dict[str, Any]:
         """
         Extracts structured request details using the Request Creator Agent (with RAG).
+        With a compiled connection schema the prompt uses it (in place of
+        jira_schema) and the result is keyed by real JIRA field keys.
         """
+        if compiled_schema:
+            jira_schema = compiled_schema.prompt_schema()
+
         # Use Request Creator Agent to decompose the request
-        structured_request = await request_creator.create_request(context, jira_schema=jira_schema)
-        
+        structured_request = await request_creator.create_request(context, jira_schema=jira_schema, rag_filters=rag_filters,
+                                                                  use_cache=use_cache)
+
+        if compiled_schema and isinstance(structured_request, dict):
+            structured_request = compiled_schema.map_output(structured_request)
         return structured_request
 
+    async def stream_request_details(self, context: str, jira_schema: Dict[str, Any] = None,
+                                     rag_filters: Dict[str, Any] = None, use_cache: bool = True,
+                                     compiled_schema: Optional[CompiledSchema] = None
+                                     ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """extract_request_details() as the agent's (event, data) stages."""
+        if compiled_schema:
+            jira_schema = compiled_schema.prompt_schema()
+
+        async for event, data in request_creator.stream_request(context, jira_schema=jira_schema,
+                                                                rag_filters=rag_filters, use_cache=use_cache):
+            if event == "result" and compiled_schema and isinstance(data["result"], dict):
+                data = {**data, "result": compiled_schema.map_output(data["result"])}
+            yield event, data
+
     def _extract_first_sentence(self, text: str) -> str:
         match = re.match(r'([^.!?]+[.!?])', text)
         if match:
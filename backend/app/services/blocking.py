@@ -0,0 +1,34 @@
+"""
+Bounded offloading of blocking work from the event loop.
+Vector store, SQLite, database and parser calls are synchronous; async code
+awaits them through run_blocking(), which runs them on one shared pool of
+ASYNC_BLOCKING_WORKERS threads. Concurrent requests overlap instead of
+freezing uvicorn's loop, and the pool caps how many run at once (extra calls
+wait their turn).
+"""
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+BLOCKING_WORKERS = int(os.getenv("ASYNC_BLOCKING_WORKERS", "16"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def blocking_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+    return _executor
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Await fn(*args, **kwargs) run on the shared worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor(), functools.partial(fn, *args, **kwargs))
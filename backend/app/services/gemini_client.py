@@ -0,0 +1,235 @@
+"""
+Shared Gemini client.
+The RAG store, the embeddings wrapper and the agents all call Gemini through
+`gemini_client`, which owns one google-genai Client (a pooled sync httpx
+client plus its async counterpart under .aio). Every call goes through
+`gemini_limiter` and uses the same timeout and connection limits, and per
+model/operation call counts and latencies are exposed at
+/api/dashboard/rate-limits.
+"""
+import os
+import time
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from app.services.rate_limiter import gemini_limiter, model_key
+
+EMBEDDING_MODEL = "text-embedding-004"
+GENERATION_MODEL = "gemini-2.0-flash-exp"
+TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+# Connection pool shared by every caller (sync and async clients each get one)
+MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+# Texts per embed_content request (the API accepts at most 100)
+EMBED_BATCH_SIZE = int(os.getenv("GEMINI_EMBED_BATCH_SIZE", "100"))
+
+
+class CallStats:
+    """Calls, errors, items and latency for one model/operation pair."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.items = 0
+        self.seconds = 0.0
+
+    def record(self, seconds: float, items: int = 0, error: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.items += items
+            self.seconds += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "items": self.items,
+            "avg_latency_ms": round(self.seconds / self.calls * 1000, 1) if self.calls else 0.0,
+        }
+
+
+class GeminiClient:
+    """Lazily built, shared google-genai client with embed, generate and stream calls."""
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key if api_key is not None else os.getenv("GOOGLE_API_KEY", "")
+        self._client = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, CallStats] = {}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def client(self):
+        """The google-genai Client, created on first use (the SDK is slow to import)."""
+        if self._client is None:
+            if not self.configured:
+                raise RuntimeError("GOOGLE_API_KEY not set")
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    from google import genai
+                    from google.genai import types
+
+                    limits = {"limits": httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                                     max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)}
+                    self._client = genai.Client(api_key=self.api_key, http_options=types.HttpOptions(
+                        timeout=int(TIMEOUT_SECONDS * 1000),
+                        client_args=limits,
+                        async_client_args=limits
+                    ))
+        return self._client
+
+    def _record(self, operation: str, model: str, started: float, items: int = 0, error: bool = False):
+        key = f"{operation}:{model_key(model)}"
+        with self._lock:
+            stats = self._stats.setdefault(key, CallStats())
+        stats.record(time.perf_counter() - started, items, error)
+
+    # ------------------------------------------------------------------
+    # Embeddings
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _embed_config(task_type: Optional[str], output_dimensionality: Optional[int]):
+        from google.genai import types
+        return types.EmbedContentConfig(
+            task_type=task_type.upper() if task_type else None,
+            output_dimensionality=output_dimensionality
+        )
+
+    def embed(self, texts: List[str], model: str = EMBEDDING_MODEL, task_type: Optional[str] = None,
+              output_dimensionality: Optional[int] = None) -> List[List[float]]:
+        """Embed texts in EMBED_BATCH_SIZE requests (rate limited, raises once retries are exhausted)."""
+        config = self._embed_config(task_type, output_dimensionality)
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = texts[start:start + EMBED_BATCH_SIZE]
+            started = time.perf_counter()
+            try:
+                response = gemini_limiter.call(model, self.client.models.embed_content,
+                                               model=model, contents=batch, config=config)
+            except Exception:
+                self._record("embed", model, started, error=True)
+                raise
+            self._record("embed", model, started, items=len(batch))
+            vectors.extend(embedding.values for embedding in response.embeddings)
+        return vectors
+
+    async def aembed(self, texts: List[str], model: str = EMBEDDING_MODEL, task_type: Optional[str] = None,
+                     output_dimensionality: Optional[int] = None) -> List[List[float]]:
+        """Async embed() on the shared async client; batches are sent concurrently."""
+        config = self._embed_config(task_type, output_dimensionality)
+
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            started = time.perf_counter()
+            try:
+                response = await gemini_limiter.acall(model, self.client.aio.models.embed_content,
+                                                      model=model, contents=batch, config=config)
+            except Exception:
+                self._record("embed", model, started, error=True)
+                raise
+            self._record("embed", model, started, items=len(batch))
+            return [embedding.values for embedding in response.embeddings]
+
+        batches = await asyncio.gather(*(
+            embed_batch(texts[start:start + EMBED_BATCH_SIZE]) for start in range(0, len(texts), EMBED_BATCH_SIZE)
+        ))
+        return [vector for batch in batches for vector in batch]
+
+    # ------------------------------------------------------------------
+    # Generation
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _generation_config(config: Dict[str, Any]):
+        from google.genai import types
+        return types.GenerateContentConfig(**config) if config else None
+
+    def generate(self, prompt: Any, model: str = GENERATION_MODEL, **config) -> str:
+        """Generate a response and return its text; keyword arguments go to GenerateContentConfig."""
+        started = time.perf_counter()
+        try:
+            response = gemini_limiter.call(model, self.client.models.generate_content, model=model,
+                                           contents=prompt, config=self._generation_config(config))
+        except Exception:
+            self._record("generate", model, started, error=True)
+            raise
+        self._record("generate", model, started)
+        return response.text or ""
+
+    async def agenerate(self, prompt: Any, model: str = GENERATION_MODEL, **config) -> str:
+        """Async generate() on the shared async client."""
+        started = time.perf_counter()
+        try:
+            response = await gemini_limiter.acall(model, self.client.aio.models.generate_content, model=model,
+                                                  contents=prompt, config=self._generation_config(config))
+        except Exception:
+            self._record("generate", model, started, error=True)
+            raise
+        self._record("generate", model, started)
+        return response.text or ""
+
+    def stream(self, prompt: Any, model: str = GENERATION_MODEL, **config) -> Iterator[str]:
+        """
+        Yield response text as it is generated. Opening the stream is rate
+        limited and retried; errors after the first chunk are raised as is.
+        """
+        def open_stream():
+            chunks = self.client.models.generate_content_stream(
+                model=model, contents=prompt, config=self._generation_config(config))
+            return next(chunks, None), chunks
+
+        started = time.perf_counter()
+        chunk_count = 0
+        try:
+            first, chunks = gemini_limiter.call(model, open_stream)
+            if first is not None:
+                chunk_count += 1
+                yield first.text or ""
+                for chunk in chunks:
+                    chunk_count += 1
+                    yield chunk.text or ""
+        except Exception:
+            self._record("stream", model, started, chunk_count, error=True)
+            raise
+        self._record("stream", model, started, chunk_count)
+
+    async def astream(self, prompt: Any, model: str = GENERATION_MODEL, **config) -> AsyncIterator[str]:
+        """Async stream() on the shared async client."""
+        async def open_stream():
+            chunks = await self.client.aio.models.generate_content_stream(
+                model=model, contents=prompt, config=self._generation_config(config))
+            try:
+                return await chunks.__anext__(), chunks
+            except StopAsyncIteration:
+                return None, chunks
+
+        started = time.perf_counter()
+        chunk_count = 0
+        try:
+            first, chunks = await gemini_limiter.acall(model, open_stream)
+            if first is not None:
+                chunk_count += 1
+                yield first.text or ""
+                async for chunk in chunks:
+                    chunk_count += 1
+                    yield chunk.text or ""
+        except Exception:
+            self._record("stream", model, started, chunk_count, error=True)
+            raise
+        self._record("stream", model, started, chunk_count)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            stats = dict(self._stats)
+        return {key: value.to_dict() for key, value in stats.items()}
+
+
+# Create singleton instance
+gemini_client = GeminiClient()
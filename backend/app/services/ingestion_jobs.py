@@ -0,0 +1,222 @@
+"""
+Background ingestion jobs.
+Uploads can be queued instead of ingested inside the HTTP request. Jobs are
+rows in the ingestion_jobs table, so they survive restarts; a local thread
+pool runs them without any external broker.
+"""
+import os
+import time
+import uuid
+import socket
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.database import SessionLocal
+from app.models.ingestion_job import IngestionJob
+from app.services.knowledge_ingestion import ingest_file
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+# A running job whose worker has not renewed its lease for this long is taken over
+JOB_LEASE_SECONDS = float(os.getenv("INGESTION_JOB_LEASE_SECONDS", "120"))
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised from the progress callback when a job's cancellation was requested."""
+
+
+class JobLeaseLost(Exception):
+    """Raised from the progress callback when another worker has taken the job over."""
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class IngestionJobQueue:
+    """
+    Database-backed job queue with a local worker pool.
+    A worker claims a job atomically (queued -> running) and leases it: the
+    job records the claiming process and a heartbeat that process renews
+    while the job runs. Other processes only take over a running job once
+    its lease has expired (its process died), so a job never runs twice when
+    several workers or instances share the database.
+    """
+
+    def __init__(self, workers: int = None, lease_seconds: float = None):
+        self.workers = max(1, workers or INGESTION_WORKERS)
+        self.lease_seconds = lease_seconds or JOB_LEASE_SECONDS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        # Jobs submitted to this process's pool and not finished yet
+        self._active: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def _submit(self, job_id: int):
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingestion")
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="ingestion-heartbeat",
+                                                   daemon=True)
+                self._heartbeat.start()
+        self._executor.submit(self._run, job_id)
+
+    def _claimable(self):
+        """Queued jobs, and running jobs whose lease expired."""
+        expired = utcnow() - timedelta(seconds=self.lease_seconds)
+        return or_(
+            IngestionJob.status == "queued",
+            and_(IngestionJob.status == "running",
+                 or_(IngestionJob.heartbeat_at.is_(None), IngestionJob.heartbeat_at < expired))
+        )
+
+    def _claim(self, db: Session, job_id: int) -> bool:
+        """Take the job's lease if it is claimable; True when this process now owns it."""
+        claimed = db.query(IngestionJob).filter(IngestionJob.id == job_id, self._claimable()).update(
+            {"status": "running", "worker_id": self.worker_id, "heartbeat_at": utcnow(), "started_at": func.now()},
+            synchronize_session=False
+        )
+        db.commit()
+        return bool(claimed)
+
+    def _claimable_ids(self, db: Session) -> List[int]:
+        return [job_id for job_id, in db.query(IngestionJob.id).filter(self._claimable()).order_by(IngestionJob.id)]
+
+    def start(self):
+        """Resume queued jobs and jobs whose worker stopped renewing its lease."""
+        db = SessionLocal()
+        try:
+            claimable = self._claimable_ids(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Could not resume ingestion jobs: {e}")
+            return
+        finally:
+            db.close()
+
+        if claimable:
+            print(f"Resuming {len(claimable)} ingestion jobs")
+        for job_id in claimable:
+            self._submit(job_id)
+
+    def _heartbeat_loop(self):
+        """Renew the leases of jobs running here and pick up jobs abandoned by other workers."""
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            db = SessionLocal()
+            try:
+                with self._lock:
+                    active = list(self._active)
+                if active:
+                    db.query(IngestionJob).filter(
+                        IngestionJob.id.in_(active),
+                        IngestionJob.status == "running",
+                        IngestionJob.worker_id == self.worker_id
+                    ).update({"heartbeat_at": utcnow()}, synchronize_session=False)
+                    db.commit()
+                for job_id in self._claimable_ids(db):
+                    self._submit(job_id)
+            except Exception as e:
+                db.rollback()
+                print(f"Ingestion job heartbeat failed: {e}")
+            finally:
+                db.close()
+
+    def enqueue(self, db: Session, filename: str, file_path: str, prune: bool = False,
+                connection_id: Optional[int] = None) -> IngestionJob:
+        job = IngestionJob(filename=filename, file_path=str(file_path), prune=prune,
+                           connection_id=connection_id, status="queued")
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._submit(job.id)
+        return job
+
+    def cancel(self, db: Session, job_id: int) -> Optional[IngestionJob]:
+        """
+        Cancel a job. Queued jobs are cancelled immediately; running jobs stop
+        after the CSV row or document chunk batch in progress (already
+        committed batches stay ingested).
+        """
+        job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+        if job is None or job.status in FINISHED_STATUSES:
+            return job
+
+        job.cancel_requested = True
+        cancelled = db.query(IngestionJob).filter(
+            IngestionJob.id == job_id,
+            IngestionJob.status == "queued"
+        ).update({"status": "cancelled", "finished_at": func.now()}, synchronize_session=False)
+        db.commit()
+        if cancelled:
+            db.refresh(job)
+        return job
+
+    def _run(self, job_id: int):
+        db = SessionLocal()
+        try:
+            if not self._claim(db, job_id):
+                return
+
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+            filename, file_path, prune, connection_id = job.filename, job.file_path, job.prune, job.connection_id
+
+            def progress(counts: Dict[str, Any]):
+                db.refresh(job)
+                if job.worker_id != self.worker_id:
+                    raise JobLeaseLost()
+                job.kind = counts.get("type", job.kind)
+                job.items_parsed = counts.get("count", 0)
+                job.items_embedded = counts.get("embedded", 0)
+                job.items_upserted = counts.get("upserted", 0)
+                job.items_failed = counts.get("failed", 0)
+                job.heartbeat_at = utcnow()
+                db.commit()
+                if job.cancel_requested:
+                    raise JobCancelled()
+
+            try:
+                result = asyncio.run(ingest_file(db, file_path, filename, prune=prune, progress=progress,
+                                                 connection_id=connection_id))
+                job.status = "completed"
+                job.kind = result.get("type", job.kind)
+                job.result = result
+            except JobLeaseLost:
+                db.rollback()
+                print(f"Ingestion job {job_id} ({filename}) was taken over by another worker")
+                return
+            except JobCancelled:
+                db.rollback()
+                job.status = "cancelled"
+            except Exception as e:
+                db.rollback()
+                print(f"Ingestion job {job_id} failed: {e}")
+                job.status = "failed"
+                job.error = str(e)
+
+            job.finished_at = func.now()
+            db.commit()
+            print(f"Ingestion job {job_id} ({filename}) {job.status}")
+        except Exception as e:
+            db.rollback()
+            print(f"Error running ingestion job {job_id}: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._active.discard(job_id)
+
+
+# Create singleton instance
+ingestion_queue = IngestionJobQueue()
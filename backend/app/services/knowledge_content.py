@@ -0,0 +1,57 @@
+"""
+Knowledge base listing and content lookups.
+Served from the local knowledge_items / knowledge_chunks tables, so each
+call is one indexed query with no vector store round trip. Items ingested
+before chunk text was kept locally fall back to the vector store.
+"""
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+
+from app.rag.store import rag_store
+from app.rag.backend import join_chunks
+from app.models.knowledge_item import KnowledgeItem
+from app.models.knowledge_chunk import KnowledgeChunk
+
+
+def list_items(db: Session, item_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """List knowledge items, newest first, optionally of one type."""
+    query = db.query(KnowledgeItem)
+    if item_type:
+        query = query.filter(KnowledgeItem.item_type == item_type)
+    return [item.to_dict() for item in query.order_by(KnowledgeItem.created_at.desc())]
+
+
+def get_document_content(db: Session, doc_id: str) -> Optional[Dict[str, Any]]:
+    """Reassemble a document from its locally stored chunks."""
+    chunks = db.query(KnowledgeChunk).filter(
+        KnowledgeChunk.item_type == "document",
+        KnowledgeChunk.parent_id == doc_id
+    ).order_by(KnowledgeChunk.chunk_index).all()
+
+    if not chunks or any(chunk.text is None for chunk in chunks):
+        return rag_store.get_document_content(doc_id) if rag_store else None
+
+    return {
+        "id": doc_id,
+        "source": (chunks[0].chunk_metadata or {}).get('source', doc_id),
+        "content": join_chunks([chunk.to_dict() for chunk in chunks])
+    }
+
+
+def get_jira_ticket_content(db: Session, ticket_id: str) -> Optional[Dict[str, Any]]:
+    """Return a ticket's stored text and metadata."""
+    chunk = db.query(KnowledgeChunk).filter(
+        KnowledgeChunk.item_type == "jira_ticket",
+        KnowledgeChunk.chunk_id == ticket_id
+    ).first()
+
+    if chunk is None or chunk.text is None:
+        return rag_store.get_jira_ticket_content(ticket_id) if rag_store else None
+
+    metadata = chunk.chunk_metadata or {}
+    return {
+        "id": ticket_id,
+        "status": metadata.get('status', 'Unknown'),
+        "issuetype": metadata.get('issuetype', 'Unknown'),
+        "content": chunk.text
+    }
@@ -0,0 +1,547 @@
+"""
+Incremental knowledge base ingestion.
+Keeps a content fingerprint per JIRA ticket and per document chunk, so a
+re-upload only embeds and upserts what is new or changed and removes
+chunks that disappeared.
+"""
+import os
+import hashlib
+from itertools import islice
+import csv
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from sqlalchemy.orm import Session
+
+from app.rag.store import rag_store
+from app.services.parsing_service import docling_parser
+from app.services.blocking import run_blocking
+from app.rag.backend import JIRA, DOCS, ticket_text, ticket_metadata, chunk_id, project_key, to_timestamp
+from app.rag.chunker import chunk_text
+from app.models.knowledge_item import KnowledgeItem
+from app.models.knowledge_chunk import KnowledgeChunk
+
+# Keep IN (...) lists below SQLite's bound-parameter limit
+QUERY_CHUNK_SIZE = 500
+
+# Rows parsed, embedded, upserted and committed together when streaming a CSV
+CSV_BATCH_SIZE = int(os.getenv("KNOWLEDGE_CSV_BATCH_SIZE", "500"))
+# Changed document chunks embedded, upserted and committed together
+DOC_BATCH_SIZE = int(os.getenv("KNOWLEDGE_DOC_BATCH_SIZE", "100"))
+
+# Column headers that identify a JIRA export
+JIRA_CSV_HEADERS = ['Issue key', 'Key', 'Summary']
+
+# Called with the running counts as ingestion progresses
+ProgressCallback = Callable[[Dict[str, int]], None]
+
+
+def get_mime_type(filename: str) -> str:
+    """Determine MIME type from filename."""
+    ext = filename.lower().split('.')[-1]
+    mime_types = {
+        'pdf': 'application/pdf',
+        'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'doc': 'application/msword',
+        'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+        'ppt': 'application/vnd.ms-powerpoint',
+        'txt': 'text/plain',
+        'md': 'text/markdown',
+        'csv': 'text/csv',
+        'png': 'image/png',
+        'jpg': 'image/jpeg',
+        'jpeg': 'image/jpeg',
+    }
+    return mime_types.get(ext, 'application/octet-stream')
+
+
+def fingerprint(*parts: Any) -> str:
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def ticket_fingerprint(ticket: Dict[str, Any]) -> str:
+    """Covers the embedded text and every field stored in the vector metadata."""
+    metadata = ticket_metadata(ticket)
+    return fingerprint(ticket_text(ticket), *(f"{key}={metadata[key]}" for key in sorted(metadata)))
+
+
+def new_counts() -> Dict[str, int]:
+    return {"added": 0, "updated": 0, "unchanged": 0, "adopted": 0, "removed": 0, "failed": 0, "embedded": 0,
+            "upserted": 0}
+
+
+def _count_report(counts: Dict[str, int], report: Dict[str, Any]):
+    if report:
+        counts["embedded"] += report.get("embedding", {}).get("texts_embedded", 0)
+        counts["upserted"] += report.get("upserted", 0)
+
+
+def _rows_by_id(db: Session, model, column, ids: Iterable[str]) -> Dict[str, Any]:
+    ids = list(ids)
+    rows = {}
+    for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+        for row in db.query(model).filter(column.in_(ids[start:start + QUERY_CHUNK_SIZE])):
+            rows[getattr(row, column.key)] = row
+    return rows
+
+
+def _landed(report: Dict[str, Any], ids: Iterable[str]) -> Set[str]:
+    """Ids whose vectors actually reached the store."""
+    if not report:
+        return set()
+    failed = set(report.get("failed_ids", []))
+    return {item_id for item_id in ids if item_id not in failed}
+
+
+def _save_item(db: Session, existing: Dict[str, KnowledgeItem], item_id: str, **fields):
+    item = existing.get(item_id)
+    if item is None:
+        item = KnowledgeItem(item_id=item_id, **fields)
+        db.add(item)
+        existing[item_id] = item
+    else:
+        for key, value in fields.items():
+            setattr(item, key, value)
+
+
+def _save_chunk(db: Session, row: Optional[KnowledgeChunk], **fields) -> str:
+    """Insert or update a manifest row; returns the count it belongs to."""
+    if row is None:
+        db.add(KnowledgeChunk(**fields))
+        return "added"
+    for key, value in fields.items():
+        setattr(row, key, value)
+    return "updated"
+
+
+def sync_jira_tickets(db: Session, tickets: List[Dict[str, Any]], prune: bool = False) -> Dict[str, int]:
+    """
+    Upsert only new or changed tickets. With prune=True, tickets missing
+    from this upload are treated as removed. Tickets without a fingerprint
+    that are already stored with the same text (ingested before the manifest
+    existed) are adopted: fingerprinted without being embedded again.
+    """
+    counts = new_counts()
+    tickets = list({ticket['id']: ticket for ticket in tickets}.values())
+    ticket_ids = [ticket['id'] for ticket in tickets]
+
+    fingerprints = _rows_by_id(db, KnowledgeChunk, KnowledgeChunk.chunk_id, ticket_ids)
+    changed = []
+    for ticket in tickets:
+        row = fingerprints.get(ticket['id'])
+        if row is not None and row.content_hash == ticket_fingerprint(ticket):
+            counts["unchanged"] += 1
+        else:
+            changed.append(ticket)
+
+    untracked = [ticket for ticket in changed if ticket['id'] not in fingerprints]
+    adopted = rag_store.adopt_jira_tickets(untracked) if untracked and rag_store else set()
+    embed = [ticket for ticket in changed if ticket['id'] not in adopted]
+
+    report = rag_store.add_jira_tickets(embed) if embed and rag_store else {}
+    landed = _landed(report, (ticket['id'] for ticket in embed)) | adopted
+    _count_report(counts, report)
+
+    items = _rows_by_id(db, KnowledgeItem, KnowledgeItem.item_id, (ticket['id'] for ticket in changed))
+    for ticket in changed:
+        _save_item(
+            db, items, ticket['id'],
+            item_type="jira_ticket",
+            title=ticket['summary'],
+            status=ticket.get('status', 'Unknown'),
+            issue_type=ticket.get('issuetype', 'Unknown'),
+            chunk_count=1
+        )
+
+        if ticket['id'] not in landed:
+            # No fingerprint, so the next upload retries this ticket
+            counts["failed"] += 1
+            continue
+
+        saved_as = _save_chunk(
+            db, fingerprints.get(ticket['id']),
+            chunk_id=ticket['id'],
+            parent_id=ticket['id'],
+            item_type="jira_ticket",
+            chunk_index=0,
+            content_hash=ticket_fingerprint(ticket),
+            text=ticket_text(ticket),
+            chunk_metadata=ticket_metadata(ticket)
+        )
+        counts["adopted" if ticket['id'] in adopted else saved_as] += 1
+
+    if prune:
+        counts["removed"] = _prune_tickets(db, set(ticket_ids))
+
+    db.commit()
+    return counts
+
+
+def _prune_tickets(db: Session, keep_ids: Set[str]) -> int:
+    stale = [
+        ticket_id for ticket_id, in db.query(KnowledgeChunk.chunk_id).filter(KnowledgeChunk.item_type == "jira_ticket")
+        if ticket_id not in keep_ids
+    ]
+    if not stale or not (rag_store and rag_store.delete_jira_tickets(stale)):
+        return 0
+    _forget_items(db, "jira_ticket", stale)
+    return len(stale)
+
+
+def is_jira_csv(fieldnames: Optional[List[str]]) -> bool:
+    """Check if CSV headers look like a JIRA export."""
+    return bool(fieldnames) and any(key in fieldnames for key in JIRA_CSV_HEADERS)
+
+
+def row_to_ticket(row: Dict[str, str], position: int, connection_id: Optional[int] = None) -> Dict[str, Any]:
+    ticket_id = row.get('Issue key', row.get('Key', f"CSV-{position}"))
+    return {
+        "id": ticket_id,
+        "summary": row.get('Summary', ''),
+        "description": row.get('Description', ''),
+        "status": row.get('Status', 'Unknown'),
+        "issuetype": row.get('Issue Type', 'Unknown'),
+        "project": row.get('Project key') or project_key(ticket_id or ''),
+        "connection_id": connection_id,
+        "created_ts": to_timestamp(row.get('Created'))
+    }
+
+
+def ingest_jira_csv(db: Session, rows: Iterable[Dict[str, str]], prune: bool = False,
+                    batch_size: int = None, progress: ProgressCallback = None,
+                    connection_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Stream JIRA CSV rows into the knowledge base in fixed-size batches.
+    Each batch is fingerprinted, embedded, upserted and committed before the
+    next one is parsed, so memory depends on the batch size, not the file.
+    `progress` is called with the running counts after every batch.
+    Tickets are tagged with their project key and `connection_id`.
+    """
+    batch_size = batch_size or CSV_BATCH_SIZE
+    counts = new_counts()
+    counts["count"] = 0
+    seen_ids: Set[str] = set()
+
+    tickets = (
+        ticket for ticket in (row_to_ticket(row, position, connection_id) for position, row in enumerate(rows))
+        if ticket['id']
+    )
+    while True:
+        batch = list(islice(tickets, batch_size))
+        if not batch:
+            break
+        for key, value in sync_jira_tickets(db, batch).items():
+            counts[key] += value
+        counts["count"] += len(batch)
+        if prune:
+            seen_ids.update(ticket['id'] for ticket in batch)
+        if progress:
+            progress(counts)
+
+    if prune and counts["count"]:
+        counts["removed"] = _prune_tickets(db, seen_ids)
+        db.commit()
+    return counts
+
+
+def sync_document(db: Session, doc_id: str, source: str, content: str, batch_size: int = None,
+                  progress: ProgressCallback = None, **item_fields) -> Dict[str, int]:
+    """
+    Upsert only new or changed chunks of a document and delete chunks that
+    no longer exist. Changed chunks are embedded, upserted and committed in
+    batches; `progress` is called with the running counts after each one.
+    Counts are per chunk.
+    """
+    batch_size = batch_size or DOC_BATCH_SIZE
+    counts = new_counts()
+    chunks = chunk_text(content)
+
+    fingerprints = {
+        row.chunk_id: row for row in db.query(KnowledgeChunk).filter(
+            KnowledgeChunk.parent_id == doc_id,
+            KnowledgeChunk.item_type == "document"
+        )
+    }
+
+    # Offsets are stored in the vector metadata, so they are part of the fingerprint
+    changed = []
+    for i, chunk in enumerate(chunks):
+        row = fingerprints.get(chunk_id(doc_id, i))
+        if row is not None and row.content_hash == fingerprint(*chunk, source):
+            counts["unchanged"] += 1
+        else:
+            changed.append((i, chunk))
+
+    # Saved first so a document stopped part-way is still listed (and deletable)
+    items = _rows_by_id(db, KnowledgeItem, KnowledgeItem.item_id, [doc_id])
+    _save_item(db, items, doc_id, item_type="document", title=doc_id, chunk_count=len(chunks), **item_fields)
+
+    for start in range(0, len(changed), batch_size):
+        batch = changed[start:start + batch_size]
+        report = rag_store.add_document_chunks(doc_id, source, batch) if rag_store else {}
+        landed = _landed(report, (chunk_id(doc_id, i) for i, _ in batch))
+        _count_report(counts, report)
+
+        for i, chunk in batch:
+            current_id = chunk_id(doc_id, i)
+            if current_id not in landed:
+                counts["failed"] += 1
+                continue
+            text, char_start, char_end = chunk
+            counts[_save_chunk(
+                db, fingerprints.get(current_id),
+                chunk_id=current_id,
+                parent_id=doc_id,
+                item_type="document",
+                chunk_index=i,
+                content_hash=fingerprint(*chunk, source),
+                text=text,
+                char_start=char_start,
+                char_end=char_end,
+                chunk_metadata={"source": source}
+            )] += 1
+
+        db.commit()
+        if progress:
+            progress(counts)
+
+    current_ids = {chunk_id(doc_id, i) for i in range(len(chunks))}
+    stale = [stale_id for stale_id in fingerprints if stale_id not in current_ids]
+    if stale and rag_store and rag_store.delete_document_chunks(stale):
+        for stale_id in stale:
+            db.delete(fingerprints[stale_id])
+        counts["removed"] = len(stale)
+
+    db.commit()
+    return counts
+
+
+async def ingest_file(db: Session, file_path: Path, filename: str, prune: bool = False,
+                      progress: ProgressCallback = None, connection_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Ingest a saved upload: JIRA CSVs are streamed as tickets, anything else
+    is parsed and chunked as a document. Returns the upload response.
+    Parsing, embedding and database work run on the blocking worker pool so
+    the event loop keeps serving other requests.
+    """
+    file_path = Path(file_path)
+
+    # Check if it's a JIRA CSV based on headers
+    if filename.endswith('.csv'):
+        with open(file_path, 'r', encoding='utf-8-sig', errors='replace', newline='') as text_stream:
+            csv_reader = csv.DictReader(text_stream)
+            try:
+                is_jira = is_jira_csv(csv_reader.fieldnames)
+            except Exception:
+                is_jira = False  # If not JIRA CSV, treat as document
+
+            if is_jira:
+                # Stream rows in batches; only new or changed tickets are embedded and upserted
+                report_progress = (lambda counts: progress({**counts, "type": "jira_csv"})) if progress else None
+                counts = await run_blocking(ingest_jira_csv, db, csv_reader, prune=prune,
+                                            progress=report_progress, connection_id=connection_id)
+                # A JIRA export without usable rows is still not a document
+                return {
+                    "message": (f"Successfully uploaded {filename} as JIRA history" if counts["count"]
+                                else f"No JIRA tickets found in {filename}"),
+                    "type": "jira_csv",
+                    **counts
+                }
+
+    content = file_path.read_bytes()
+
+    # Process as document using Docling parser
+    mime_type = get_mime_type(filename)
+
+    try:
+        # Use Docling for advanced parsing (97.9% table accuracy)
+        text_content = await docling_parser.parse_document(content, filename, mime_type)
+    except Exception as e:
+        print(f"Docling parsing failed, using fallback: {e}")
+        # Fallback to basic extraction for text files
+        if filename.endswith(('.txt', '.md')):
+            text_content = content.decode('utf-8')
+        else:
+            text_content = f"# {filename}\n\n[Advanced parsing unavailable - content stored as binary]"
+
+    def document_progress(counts: Dict[str, int]):
+        progress({**counts, "type": "document", "count": counts["added"] + counts["updated"] + counts["unchanged"]})
+
+    # Only new or changed chunks are embedded and upserted; vanished chunks are deleted
+    counts = await run_blocking(
+        sync_document,
+        db,
+        filename,
+        filename,
+        text_content,
+        progress=document_progress if progress else None,
+        file_path=str(file_path),
+        file_size=len(content),
+        mime_type=mime_type
+    )
+
+    return {
+        "message": f"Successfully uploaded {filename}",
+        "type": "document",
+        "size": len(text_content),
+        **counts
+    }
+
+
+def manifest_chunk_ids(db: Session, item_type: str, item_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Vector ids recorded in the chunk manifest, grouped by parent item."""
+    item_ids = list(item_ids)
+    manifest: Dict[str, List[str]] = {}
+    for start in range(0, len(item_ids), QUERY_CHUNK_SIZE):
+        for parent_id, vector_id in db.query(KnowledgeChunk.parent_id, KnowledgeChunk.chunk_id).filter(
+            KnowledgeChunk.item_type == item_type,
+            KnowledgeChunk.parent_id.in_(item_ids[start:start + QUERY_CHUNK_SIZE])
+        ):
+            manifest.setdefault(parent_id, []).append(vector_id)
+    return manifest
+
+
+def _forget_items(db: Session, item_type: str, item_ids: List[str]):
+    """Drop the manifest rows and knowledge items of removed items."""
+    for start in range(0, len(item_ids), QUERY_CHUNK_SIZE):
+        batch = item_ids[start:start + QUERY_CHUNK_SIZE]
+        db.query(KnowledgeChunk).filter(
+            KnowledgeChunk.item_type == item_type,
+            KnowledgeChunk.parent_id.in_(batch)
+        ).delete(synchronize_session=False)
+        db.query(KnowledgeItem).filter(
+            KnowledgeItem.item_type == item_type,
+            KnowledgeItem.item_id.in_(batch)
+        ).delete(synchronize_session=False)
+
+
+def delete_items(db: Session, item_type: str, item_ids: List[str]) -> Dict[str, Any]:
+    """
+    Delete many documents or tickets. Vector ids come from the chunk
+    manifest and are removed in batched delete calls; items only leave the
+    database once their vectors are gone.
+    """
+    if item_type not in ("document", "jira_ticket"):
+        raise ValueError(f"Invalid item type: {item_type}")
+
+    item_ids = list(dict.fromkeys(item_ids))
+    known = {
+        item_id for item_id, item in _rows_by_id(db, KnowledgeItem, KnowledgeItem.item_id, item_ids).items()
+        if item.item_type == item_type
+    }
+    manifest = manifest_chunk_ids(db, item_type, item_ids)
+    # Items ingested before the manifest existed fall back to a store lookup
+    untracked = [item_id for item_id in item_ids if item_id in known and item_id not in manifest]
+    found = [item_id for item_id in item_ids if item_id in known or item_id in manifest]
+
+    ok = bool(rag_store)
+    vector_ids = [vector_id for item_id in found if item_id in manifest for vector_id in manifest[item_id]]
+    if ok and item_type == "document":
+        ok = rag_store.delete_document_chunks(vector_ids) and all(
+            rag_store.delete_document(doc_id) for doc_id in untracked
+        )
+    elif ok:
+        ok = rag_store.delete_jira_tickets(vector_ids + untracked)
+
+    if not ok:
+        return {"deleted": [], "failed": found, "not_found": [i for i in item_ids if i not in found], "vectors": 0}
+
+    _forget_items(db, item_type, found)
+    db.commit()
+    return {
+        "deleted": found,
+        "failed": [],
+        "not_found": [item_id for item_id in item_ids if item_id not in found],
+        "vectors": len(vector_ids)
+    }
+
+
+def reconcile_vectors(db: Session, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Compare the vector store with the chunk manifest.
+
+    Orphans are vectors whose parent item is not in the manifest or no
+    longer has that chunk (left behind by failed deletes or re-chunking);
+    they are deleted in batches. Manifest rows without a vector are dropped
+    so the next upload re-ingests them. Items ingested before the manifest
+    existed (a knowledge item but no manifest rows) are left alone.
+    Run it while no ingestion is in progress.
+    """
+    report: Dict[str, Any] = {"dry_run": dry_run}
+    if not rag_store:
+        return report
+
+    for kind, item_type in ((JIRA, "jira_ticket"), (DOCS, "document")):
+        manifest = {
+            vector_id: parent_id for vector_id, parent_id in db.query(
+                KnowledgeChunk.chunk_id, KnowledgeChunk.parent_id
+            ).filter(KnowledgeChunk.item_type == item_type)
+        }
+        tracked_parents = set(manifest.values())
+        items = {item_id for item_id, in db.query(KnowledgeItem.item_id).filter(KnowledgeItem.item_type == item_type)}
+
+        orphans, seen = [], set()
+        try:
+            for page in rag_store.list_ids(kind):
+                for vector_id in page:
+                    seen.add(vector_id)
+                    if vector_id in manifest:
+                        continue
+                    parent_id = vector_id.rsplit("_chunk_", 1)[0] if kind == DOCS else vector_id
+                    if parent_id in tracked_parents or parent_id not in items:
+                        orphans.append(vector_id)
+        except Exception as e:
+            print(f"Cannot list {item_type} vectors for reconciliation: {e}")
+            report[item_type] = {"error": str(e)}
+            continue
+
+        missing = [vector_id for vector_id in manifest if vector_id not in seen]
+        if not dry_run:
+            rag_store.delete_ids(kind, orphans)
+            for start in range(0, len(missing), QUERY_CHUNK_SIZE):
+                db.query(KnowledgeChunk).filter(
+                    KnowledgeChunk.item_type == item_type,
+                    KnowledgeChunk.chunk_id.in_(missing[start:start + QUERY_CHUNK_SIZE])
+                ).delete(synchronize_session=False)
+            db.commit()
+
+        print(f"Reconciled {item_type} vectors: {len(seen)} stored, {len(orphans)} orphaned, {len(missing)} missing")
+        report[item_type] = {"vectors": len(seen), "orphaned": len(orphans), "missing": len(missing)}
+
+    return report
+
+
+def rebuild_lexical_index(db: Session, store=None, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Refill an empty lexical index from the chunk text kept in the database
+    (e.g. after a cold start wiped /tmp while the vector store kept its data).
+    """
+    store = store or rag_store
+    lexical = store.lexical if store else None
+    rebuilt = {}
+    if not (lexical and lexical.enabled):
+        return rebuilt
+
+    for kind, item_type in ((JIRA, "jira_ticket"), (DOCS, "document")):
+        if lexical.count(kind):
+            continue
+        rows = db.query(KnowledgeChunk).filter(
+            KnowledgeChunk.item_type == item_type,
+            KnowledgeChunk.text.isnot(None)
+        ).yield_per(batch_size)
+        batch, total = [], 0
+        for row in rows:
+            metadata = {"text": row.text, **(row.chunk_metadata or {})}
+            if kind == DOCS:
+                metadata.update(parent_id=row.parent_id, chunk_index=row.chunk_index,
+                                start=row.char_start, end=row.char_end)
+            batch.append((row.chunk_id, row.chunk_id if kind == JIRA else metadata.get("source", ""), metadata))
+            if len(batch) >= batch_size:
+                lexical.upsert(kind, batch)
+                total += len(batch)
+                batch = []
+        lexical.upsert(kind, batch)
+        total += len(batch)
+        if total:
+            print(f"Rebuilt lexical index for {total} {item_type} entries")
+        rebuilt[item_type] = total
+    return rebuilt
@@ -0,0 +1,148 @@
+"""
+Persistent cache of agent LLM results.
+Analyzing the same request twice (a reviewer re-running analyze, the frontend
+re-submitting when the issue-type schema is toggled back) returns the stored
+result instead of paying for another Gemini generation. Entries live in
+SQLite keyed by a hash of everything the prompt depends on, expire after
+LLM_CACHE_TTL_SECONDS and are evicted least-recently-used beyond
+LLM_CACHE_MAX_ENTRIES.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+# Use /tmp so the cache is writable on Vercel serverless
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/tmp/llm_cache.db")
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+DEFAULT_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+
+
+def normalize_context(text: str) -> str:
+    """Whitespace-insensitive form of a request context."""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def cache_key(agent: str, model: str, context: str, **inputs: Any) -> str:
+    """Hash of the agent, model, normalized context and any other prompt inputs."""
+    payload = {"agent": agent, "model": model, "context": normalize_context(context), **inputs}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class LLMResultCache:
+    """SQLite-backed TTL + LRU cache of JSON results with hit/miss counters."""
+
+    def __init__(self, path: str = None, max_entries: int = None, ttl_seconds: float = None):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self.ttl_seconds = DEFAULT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return
+
+        try:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_results (
+                    key TEXT PRIMARY KEY,
+                    agent TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_results_last_used ON llm_results (last_used)")
+            self._conn.commit()
+        except Exception as e:
+            print(f"WARNING: LLM result cache disabled ({self.path}): {e}")
+            self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The cached result for key, or None if missing or expired."""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT result, expires_at FROM llm_results WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now:
+                self._conn.execute("UPDATE llm_results SET last_used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            if row:
+                self._conn.execute("DELETE FROM llm_results WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+        return None
+
+    def put(self, key: str, agent: str, result: Dict[str, Any]):
+        """Store a result, evicting expired and then least-recently-used entries if over budget."""
+        if not self.enabled or self.ttl_seconds <= 0:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_results (key, agent, result, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, agent, json.dumps(result), now + self.ttl_seconds, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def _evict(self, now: float):
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_results").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        count -= self._conn.execute("DELETE FROM llm_results WHERE expires_at <= ?", (now,)).rowcount
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_results WHERE key IN (SELECT key FROM llm_results ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        entries = 0
+        if self.enabled:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM llm_results").fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# Create singleton instance
+llm_cache = LLMResultCache()
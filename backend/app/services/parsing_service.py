@@ -1,16 +1,14 @@
 """
 Lightweight document parsing service for Vercel deployment.
-Uses pypdf and python-docx instead of heavy ML libraries.
+Uses pypdf and python-docx instead of heavy ML libraries, each imported
+only when a file of that type is parsed.
 """
 import tempfile
 import os
 from pathlib import Path
 from typing import Optional
 
-# Lightweight libraries
-from pypdf import PdfReader
-from docx import Document as DocxDocument
-import pptx
+from app.services.blocking import run_blocking
 
 class LightweightParser:
     """
@@ -23,8 +21,11 @@ class LightweightParser:
     
     async def parse_document(self, file_content: bytes, filename: str, mime_type: str) -> str:
         """
-        Parse document using lightweight libraries.
+        Parse document using lightweight libraries (on the blocking worker pool).
         """
+        return await run_blocking(self._parse, file_content, filename)
+
+    def _parse(self, file_content: bytes, filename: str) -> str:
         try:
             # Create temp file
             with tempfile.NamedTemporaryFile(delete=False, suffix=Path(filename).suffix) as tmp:
@@ -36,16 +37,19 @@ class LightweightParser:
                 text = ""
                 
                 if ext == '.pdf':
+                    from pypdf import PdfReader
                     reader = PdfReader(tmp_path)
                     for page in reader.pages:
                         text += page.extract_text() + "\n\n"
                 
                 elif ext in ['.docx', '.doc']:
+                    from docx import Document as DocxDocument
                     doc = DocxDocument(tmp_path)
                     for para in doc.paragraphs:
                         text += para.text + "\n"
                         
                 elif ext == '.pptx':
+                    import pptx
                     prs = pptx.Presentation(tmp_path)
                     for slide in prs.slides:
                         for shape in slide.shapes:
@@ -0,0 +1,312 @@
+"""
+Client-side throttling for Gemini API calls.
+Every embedding and generation request goes through `gemini_limiter`, which
+spaces requests with a token bucket per model, caps concurrent calls with an
+AIMD limit (halved on 429s, grown by about one per window of successes) and
+retries throttled or transient failures with jittered exponential backoff,
+honouring any retry-after the API sends. Counters per model are exposed at
+/api/dashboard/rate-limits.
+"""
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+# Requests per minute: GEMINI_RATE_LIMITS lists "model=rpm" pairs, other
+# models get GEMINI_DEFAULT_RPM
+DEFAULT_RPM = float(os.getenv("GEMINI_DEFAULT_RPM", "60"))
+RATE_LIMITS = os.getenv("GEMINI_RATE_LIMITS", "text-embedding-004=1500,gemini-2.0-flash-exp=10")
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "6"))
+BACKOFF_BASE_SECONDS = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", "1.0"))
+BACKOFF_MAX_SECONDS = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "60"))
+
+THROTTLE_STATUS = 429
+TRANSIENT_STATUSES = {408, 500, 502, 503, 504}
+# Status names used by the gRPC-style error messages
+STATUS_NAMES = {"RESOURCE_EXHAUSTED": 429, "UNAVAILABLE": 503, "DEADLINE_EXCEEDED": 504, "INTERNAL": 500}
+RETRY_DELAY_PATTERN = re.compile(r"retry[ _-]?(?:after|delay|in)[\"':\s]*([\d.]+)\s*(ms|s)?", re.IGNORECASE)
+
+
+def model_key(model: str) -> str:
+    return model.split("/", 1)[1] if model.startswith("models/") else model
+
+
+def parse_rate_limits(spec: str) -> Dict[str, float]:
+    limits = {}
+    for entry in spec.split(","):
+        if "=" in entry:
+            model, rpm = entry.split("=", 1)
+            limits[model_key(model.strip())] = float(rpm)
+    return limits
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status of an API error (google-genai, google-api-core or requests style)."""
+    for source in (error, getattr(error, "response", None)):
+        for attribute in ("code", "status_code", "status"):
+            value = getattr(source, attribute, None)
+            if isinstance(value, int):
+                return value
+    message = str(error)
+    for name, status in STATUS_NAMES.items():
+        if name in message:
+            return status
+    match = re.match(r"\s*(\d{3})\b", message)
+    return int(match.group(1)) if match else None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from a Retry-After header or a retryDelay in the message."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            pass
+    match = RETRY_DELAY_PATTERN.search(str(error))
+    if match:
+        seconds = float(match.group(1))
+        return seconds / 1000 if (match.group(2) or "").lower() == "ms" else seconds
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    status = error_status(error)
+    if status is not None:
+        return status == THROTTLE_STATUS or status in TRANSIENT_STATUSES
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class TokenBucket:
+    """Requests-per-minute bucket; reservations are handed out in order."""
+
+    def __init__(self, requests_per_minute: float, capacity: float = None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = capacity or max(1.0, requests_per_minute / 60.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens now and return how long to wait before using them."""
+        with self._lock:
+            self._refill()
+            self.tokens -= tokens
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Hold back new callers for `seconds` (the server asked us to slow down)."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on calls in flight: +1/limit per success, halved per throttle.
+    Threads block on a condition; coroutines queue first-in first-out and are
+    handed a slot by release() instead of polling for one.
+    """
+
+    def __init__(self, maximum: int):
+        self.maximum = max(1, maximum)
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            if self.in_flight < int(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._condition:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # release() handed us a slot just before the cancel
+                    self._free()
+            raise
+
+    def release(self, throttled: bool = False):
+        with self._condition:
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._free()
+
+    def abandon(self):
+        """Give back a slot whose call was cancelled, without adjusting the limit."""
+        with self._condition:
+            self._free()
+
+    def _free(self):
+        """Give up one slot and pass free slots to queued coroutines (lock held)."""
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            loop, future = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_grant, future)
+            except RuntimeError:
+                # The waiter's event loop is closed
+                continue
+            self.in_flight += 1
+        self._condition.notify_all()
+
+
+def _grant(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ModelLimiter:
+    """Bucket, concurrency limit and counters for one model."""
+
+    def __init__(self, model: str, requests_per_minute: float):
+        self.model = model
+        self.requests_per_minute = requests_per_minute
+        self.bucket = TokenBucket(requests_per_minute)
+        self.concurrency = AdaptiveConcurrency(MAX_CONCURRENCY)
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "succeeded": 0, "throttled": 0, "retries": 0, "failed": 0, "dropped": 0}
+
+    def count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "requests_per_minute": self.requests_per_minute,
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+        }
+
+
+class GeminiRateLimiter:
+    """Routes calls through per-model limiters with retry and backoff."""
+
+    def __init__(self, default_rpm: float = None, rate_limits: Dict[str, float] = None,
+                 max_retries: int = None):
+        self.default_rpm = default_rpm or DEFAULT_RPM
+        self.rate_limits = parse_rate_limits(RATE_LIMITS) if rate_limits is None else rate_limits
+        self.max_retries = MAX_RETRIES if max_retries is None else max_retries
+        self._models: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+
+    def _limiter(self, model: str) -> ModelLimiter:
+        key = model_key(model)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = ModelLimiter(key, self.rate_limits.get(key, self.default_rpm))
+            return self._models[key]
+
+    def _retry_delay(self, limiter: ModelLimiter, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None when the error is final."""
+        throttled = error_status(error) == THROTTLE_STATUS
+        if throttled:
+            limiter.count("throttled")
+        if not is_retryable(error) or attempt >= self.max_retries:
+            limiter.count("failed")
+            return None
+
+        limiter.count("retries")
+        # Full jitter keeps parallel workers from retrying in lockstep
+        delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+            if throttled:
+                limiter.bucket.pause(retry_after)
+        print(f"Gemini {limiter.model} call failed ({error_status(error) or type(error).__name__}); "
+              f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def call(self, model: str, fn: Callable[..., Any], /, *args, **kwargs) -> Any:
+        """Call fn(*args, **kwargs) under `model`'s limits, retrying as needed."""
+        limiter = self._limiter(model)
+        for attempt in range(self.max_retries + 1):
+            time.sleep(limiter.bucket.reserve())
+            limiter.concurrency.acquire()
+            limiter.count("requests")
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                limiter.concurrency.release(throttled=error_status(e) == THROTTLE_STATUS)
+                delay = self._retry_delay(limiter, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                limiter.concurrency.abandon()
+                raise
+            limiter.concurrency.release()
+            limiter.count("succeeded")
+            return result
+
+    async def acall(self, model: str, fn: Callable[..., Any], /, *args, **kwargs) -> Any:
+        """Async variant of call(); sync functions run in a worker thread."""
+        limiter = self._limiter(model)
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(limiter.bucket.reserve())
+            await limiter.concurrency.aacquire()
+            limiter.count("requests")
+            try:
+                if asyncio.iscoroutinefunction(fn):
+                    result = await fn(*args, **kwargs)
+                else:
+                    result = await asyncio.to_thread(fn, *args, **kwargs)
+            except Exception as e:
+                limiter.concurrency.release(throttled=error_status(e) == THROTTLE_STATUS)
+                delay = self._retry_delay(limiter, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled (query-embed timeout, client disconnect, closed stream):
+                # the slot must come back or the model's calls eventually block for good
+                limiter.concurrency.abandon()
+                raise
+            limiter.concurrency.release()
+            limiter.count("succeeded")
+            return result
+
+    def record_dropped(self, model: str, count: int):
+        """Count items a caller gave up on after retries were exhausted."""
+        if count:
+            self._limiter(model).count("dropped", count)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limiters = list(self._models.values())
+        return {limiter.model: limiter.to_dict() for limiter in limiters}
+
+
+# Create singleton instance
+gemini_limiter = GeminiRateLimiter()
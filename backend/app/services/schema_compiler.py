@@ -0,0 +1,183 @@
+"""
+Compiles a connection's JIRA field configuration into a prompt-sized schema.
+Connection.field_config (from JiraService.get_field_configuration) carries
+every field with its full `schema` and `allowedValues` objects. The compiler
+keeps required fields, fields the user included in Settings and commonly used
+ones (SCHEMA_COMMON_FIELDS), drops fields the model cannot fill (users,
+attachments, links), truncates allowed values and gives custom fields
+readable names. The same compiled form maps the model's output back to real
+JIRA field keys and allowed-value spellings.
+
+Compiled schemas are cached per (connection, project, issue type) and
+invalidated when the connection's field_config is saved.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+MAX_ALLOWED_VALUES = int(os.getenv("SCHEMA_MAX_ALLOWED_VALUES", "15"))
+MAX_FIELDS = int(os.getenv("SCHEMA_MAX_FIELDS", "20"))
+# Field keys or names offered to the model even when optional
+COMMON_FIELDS = [
+    name.strip().lower() for name in os.getenv(
+        "SCHEMA_COMMON_FIELDS",
+        "summary,description,priority,labels,components,duedate,story points,acceptance criteria"
+    ).split(",") if name.strip()
+]
+CACHE_SIZE = 256
+
+# Set elsewhere (the issue type is chosen by the user) or not fillable from text
+SKIPPED_FIELDS = {"project", "issuetype", "reporter", "assignee", "attachment", "issuelinks", "parent", "watches"}
+SKIPPED_TYPES = {"user", "attachment", "issuelinks"}
+
+
+def prompt_name(field_key: str, field: Dict[str, Any]) -> str:
+    """System fields keep their key; custom fields get a snake_case name ('Story Points' -> story_points)."""
+    if not field_key.startswith("customfield_"):
+        return field_key
+    name = re.sub(r"[^a-z0-9]+", "_", (field.get('name') or "").lower()).strip("_")
+    return name or field_key
+
+
+def option_label(value: Any) -> Optional[str]:
+    """Display text of an allowedValues entry (options have 'value', most others 'name')."""
+    if isinstance(value, dict):
+        label = value.get('value') or value.get('name') or value.get('key')
+        return str(label) if label is not None else None
+    return str(value) if value is not None else None
+
+
+def describe(field: Dict[str, Any], options: List[str], total_options: int) -> str:
+    """One-line type description shown to the model."""
+    field_schema = field.get('schema') or {}
+    kind = field_schema.get('type') or "string"
+    is_list = kind == "array"
+    if options:
+        more = f" (+{total_options - len(options)} more)" if total_options > len(options) else ""
+        text = f"{'list of' if is_list else 'one of'}: {' | '.join(options)}{more}"
+    elif is_list:
+        text = f"list of {field_schema.get('items', 'string')}"
+    else:
+        text = kind
+    return f"{text}, required" if field.get('required') else text
+
+
+class CompiledSchema:
+    """Prompt schema for one issue type plus the mapping back to JIRA field keys."""
+
+    def __init__(self, issue_type: str, fields: Dict[str, Dict[str, Any]]):
+        self.issue_type = issue_type
+        # prompt name -> {key, name, required, all_options (lowercase -> exact), description}
+        self.fields = fields
+        self._aliases: Dict[str, str] = {}
+        for name, spec in fields.items():
+            for alias in (name, spec['key'], spec['name']):
+                if alias:
+                    self._aliases.setdefault(alias.lower(), name)
+
+    def prompt_schema(self) -> Dict[str, str]:
+        """{prompt name: description} for the agent prompt."""
+        return {name: spec['description'] for name, spec in self.fields.items()}
+
+    def _snap(self, spec: Dict[str, Any], value: Any) -> Any:
+        """Replace values that match an allowed value case-insensitively with its exact spelling."""
+        if not spec['all_options']:
+            return value
+        if isinstance(value, list):
+            return [self._snap(spec, item) for item in value]
+        if isinstance(value, str):
+            return spec['all_options'].get(value.strip().lower(), value)
+        return value
+
+    def map_output(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Rename the model's keys to JIRA field keys; unknown keys are kept as they are."""
+        mapped = {}
+        for key, value in result.items():
+            name = self._aliases.get(str(key).lower())
+            if name is None:
+                mapped.setdefault(key, value)
+                continue
+            spec = self.fields[name]
+            mapped[spec['key']] = self._snap(spec, value)
+        return mapped
+
+
+def compile_schema(field_config: Dict[str, Any], issue_type: str) -> Optional[CompiledSchema]:
+    """Compile field_config[issue_type]; None if the issue type is not configured."""
+    config = (field_config or {}).get(issue_type)
+    if not config or not config.get('fields'):
+        return None
+
+    candidates: List[Tuple[int, str, Dict[str, Any]]] = []
+    for position, (field_key, field) in enumerate(config['fields'].items()):
+        field_type = (field.get('schema') or {}).get('type')
+        if field_key in SKIPPED_FIELDS or field_type in SKIPPED_TYPES or field.get('included') is False:
+            continue
+        common = field_key.lower() in COMMON_FIELDS or (field.get('name') or "").lower() in COMMON_FIELDS
+        if field.get('required'):
+            rank = 0
+        elif field.get('included') or common:
+            rank = 1
+        else:
+            continue
+        candidates.append((rank * 10000 + position, field_key, field))
+
+    fields: Dict[str, Dict[str, Any]] = {}
+    for _, field_key, field in sorted(candidates)[:MAX_FIELDS]:
+        labels = [label for label in map(option_label, field.get('allowedValues') or []) if label]
+        name = prompt_name(field_key, field)
+        if name in fields:
+            name = field_key
+        fields[name] = {
+            "key": field_key,
+            "name": field.get('name') or field_key,
+            "required": bool(field.get('required')),
+            "all_options": {label.lower(): label for label in labels},
+            "description": describe(field, labels[:MAX_ALLOWED_VALUES], len(labels)),
+        }
+    return CompiledSchema(issue_type, fields)
+
+
+class SchemaCompiler:
+    """LRU cache of compiled schemas keyed by (connection, project, issue type)."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple[Any, ...], Optional[CompiledSchema]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, connection, issue_type: Optional[str] = None) -> Optional[CompiledSchema]:
+        """
+        Compiled schema for a Connection row and issue type (default: the
+        first configured one). None when there is no field configuration.
+        """
+        field_config = connection.field_config or {}
+        issue_type = issue_type or next(iter(field_config), None)
+        if not issue_type:
+            return None
+
+        # updated_at also catches field_config saved by another process
+        key = (connection.id, connection.jira_project_key, issue_type, connection.updated_at)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        compiled = compile_schema(field_config, issue_type)
+        with self._lock:
+            self._cache[key] = compiled
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return compiled
+
+    def invalidate(self, connection_id: int):
+        """Forget every compiled schema of a connection (its field_config changed)."""
+        with self._lock:
+            for key in [key for key in self._cache if key[0] == connection_id]:
+                del self._cache[key]
+
+
+# Create singleton instance
+schema_compiler = SchemaCompiler()
@@ -0,0 +1,111 @@
+"""
+Load test POST /api/requests/analyze at increasing concurrency.
+
+Sends --requests analyze calls per level, at most `concurrency` in flight,
+and reports throughput and p50/p99 latency. With a non-blocking analyze path
+throughput grows with concurrency until Gemini quota or the worker pools
+(GEMINI_MAX_CONCURRENCY, ASYNC_BLOCKING_WORKERS) are the limit; if the event
+loop is blocked it stays flat at the concurrency-1 rate.
+
+By default the app runs in-process. Without GOOGLE_API_KEY (or with
+--simulate) Gemini calls are replaced by asyncio sleeps of --llm-ms and
+--embed-ms and client-side throttling is lifted, so only the app's own
+concurrency is measured. --url targets a running server instead.
+
+Usage:
+    python bench_analyze_load.py --levels 1 4 16 --requests 32
+    python bench_analyze_load.py --url http://localhost:8000 --levels 1 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import types
+
+DESCRIPTIONS = [
+    "The daily ingestion job into the bronze layer fails with a schema mismatch",
+    "Add a dashboard showing pipeline freshness per source system",
+    "Grant the analytics team read access to the silver customer tables",
+    "Nightly dbt run takes four hours since the orders model was changed",
+]
+
+
+def simulate_gemini(llm_ms: float, embed_ms: float):
+    """Swap the shared Gemini client for one that only waits (no quota, no key needed)."""
+    from app.services.gemini_client import gemini_client
+
+    async def generate_content(model, contents, config=None):
+        await asyncio.sleep(llm_ms / 1000)
+        return types.SimpleNamespace(text='{"summary": "Simulated", "issuetype": "Task"}')
+
+    async def embed_content(model, contents, config=None):
+        await asyncio.sleep(embed_ms / 1000)
+        return types.SimpleNamespace(embeddings=[types.SimpleNamespace(values=[0.0] * 768) for _ in contents])
+
+    models = types.SimpleNamespace(generate_content=generate_content, embed_content=embed_content)
+    gemini_client.api_key = gemini_client.api_key or "simulated"
+    gemini_client._client = types.SimpleNamespace(aio=types.SimpleNamespace(models=models))
+
+
+async def run_level(client, concurrency: int, total: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/requests/analyze", json={
+                "description": f"{DESCRIPTIONS[i % len(DESCRIPTIONS)]} (load test {i})"
+            })
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start, latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="running server (default: the app in-process)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=32, help="analyze calls per level")
+    parser.add_argument("--simulate", action="store_true", help="simulated Gemini latency even with an API key")
+    parser.add_argument("--llm-ms", type=float, default=800)
+    parser.add_argument("--embed-ms", type=float, default=80)
+    args = parser.parse_args()
+
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=300)
+    else:
+        simulated = args.simulate or not os.getenv("GOOGLE_API_KEY")
+        if simulated:
+            # Lift client-side throttling before the limiter reads its settings
+            os.environ["GEMINI_RATE_LIMITS"] = ""
+            os.environ["GEMINI_DEFAULT_RPM"] = "1000000"
+        from main import app
+        if simulated:
+            simulate_gemini(args.llm_ms, args.embed_ms)
+            print(f"simulated Gemini: {args.llm_ms:.0f} ms generate, {args.embed_ms:.0f} ms embed\n")
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300)
+
+    async with client:
+        # Warm up (builds the RAG store, opens connections)
+        await run_level(client, 1, 1)
+        print(f"{'concurrency':>11}{'req/s':>9}{'speedup':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        baseline = None
+        for concurrency in args.levels:
+            elapsed, latencies = await run_level(client, concurrency, args.requests)
+            throughput = len(latencies) / elapsed
+            baseline = baseline or throughput
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{concurrency:>11}{throughput:>9.2f}{throughput / baseline:>8.1f}x"
+                  f"{statistics.median(latencies) * 1000:>9.0f}{p99 * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark the local vector store's IVF index against exact search.
+
+Builds a flat and an IVF LocalVectorIndex over the same synthetic, clustered
+unit vectors and reports recall@k plus p50/p99 query latency for a sweep of
+nprobe values, so nlist/nprobe can be chosen from data.
+
+Usage:
+    python bench_ann.py --vectors 200000 --dim 768 --queries 200 --k 10
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+
+from app.rag.store_local import LocalVectorIndex
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Gaussian mixture on the unit sphere (embeddings are clustered, not uniform)."""
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(index: LocalVectorIndex, vectors: np.ndarray, batch_size: int = 1000):
+    for start in range(0, len(vectors), batch_size):
+        index.upsert([
+            {"id": f"v{i}", "values": vectors[i], "metadata": {}}
+            for i in range(start, min(start + batch_size, len(vectors)))
+        ])
+
+
+def timed_search(index: LocalVectorIndex, queries: np.ndarray, k: int, **kwargs):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        matches = index.search(query, k, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([match_id for match_id, _, _ in matches])
+    return results, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = automatic (4 * sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = synthetic_vectors(args.vectors, args.dim, clusters=max(8, args.vectors // 500), rng=rng)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_ann_"))
+    try:
+        print(f"Indexing {args.vectors} x {args.dim} vectors...")
+        index = LocalVectorIndex(workdir / "index", args.dim, index_type="flat")
+        fill(index, vectors)
+
+        start = time.perf_counter()
+        index.train_ann(args.nlist or None)
+        print(f"Trained IVF with nlist={index.ann.nlist} in {time.perf_counter() - start:.1f}s\n")
+
+        exact, exact_latency = timed_search(index, queries, args.k, exact=True)
+        print(f"{'mode':<14}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p99 ms':>10}{'speedup':>10}")
+        print(f"{'exact':<14}{1.0:>10.3f}{np.percentile(exact_latency, 50):>10.2f}"
+              f"{np.percentile(exact_latency, 99):>10.2f}{1.0:>10.1f}")
+
+        for nprobe in args.nprobe:
+            if nprobe > index.ann.nlist:
+                continue
+            approx, latency = timed_search(index, queries, args.k, nprobe=nprobe)
+            recall = np.mean([
+                len(set(found) & set(truth)) / len(truth)
+                for found, truth in zip(approx, exact) if truth
+            ])
+            speedup = np.percentile(exact_latency, 50) / max(np.percentile(latency, 50), 1e-9)
+            print(f"{'ivf nprobe=' + str(nprobe):<14}{recall:>10.3f}{np.percentile(latency, 50):>10.2f}"
+                  f"{np.percentile(latency, 99):>10.2f}{speedup:>10.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare the sliding-window chunker against the old paragraph splitter.
+
+For each input document reports chunk count, embedding calls, embedded
+tokens, chunk size distribution, chunks too small to be useful and chunks
+the embedding model would truncate. Without arguments it runs on the
+sample architecture doc plus synthetic documents (many short lines, and
+one long page with no paragraph breaks).
+
+Usage:
+    python bench_chunker.py [files...] [--target 400 --overlap 50 --max 1000]
+"""
+import argparse
+import random
+import statistics
+from pathlib import Path
+from typing import List
+
+from app.rag.chunker import chunk_text, estimate_tokens
+from app.rag.embedding_pipeline import DEFAULT_BATCH_SIZE
+
+# text-embedding-004 input limit
+MODEL_MAX_TOKENS = 2048
+TINY_TOKENS = 20
+
+
+def paragraph_split(content: str) -> List[str]:
+    """The previous chunking: split on blank lines."""
+    return [chunk.strip() for chunk in content.split('\n\n') if chunk.strip()]
+
+
+def synthetic_documents(rng: random.Random):
+    words = ["pipeline", "table", "schema", "partition", "ingest", "warehouse", "latency", "job",
+             "airflow", "dbt", "snowflake", "source", "column", "owner", "retention", "the", "a", "of"]
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(6, 18))).capitalize() + "."
+
+    yield "short-lines.md", "\n\n".join(
+        rng.choice(["## Section", "- item", sentence(), "TODO", "| a | b |"]) for _ in range(2000)
+    )
+    yield "wall-of-text.txt", " ".join(sentence() for _ in range(6000))
+
+
+def describe(name: str, chunks: List[str]):
+    tokens = [estimate_tokens(chunk) for chunk in chunks] or [0]
+    calls = -(-len(chunks) // DEFAULT_BATCH_SIZE)
+    print(f"  {name:<10}{len(chunks):>8}{calls:>7}{sum(tokens):>10}{min(tokens):>7}"
+          f"{int(statistics.median(tokens)):>8}{max(tokens):>8}"
+          f"{sum(t < TINY_TOKENS for t in tokens):>7}{sum(t > MODEL_MAX_TOKENS for t in tokens):>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--target", type=int, default=None)
+    parser.add_argument("--overlap", type=int, default=None)
+    parser.add_argument("--max", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.files:
+        documents = [(path, Path(path).read_text(errors="replace")) for path in args.files]
+    else:
+        documents = [("test_architecture_doc.md", Path("test_architecture_doc.md").read_text())]
+        documents += list(synthetic_documents(random.Random(7)))
+
+    for name, content in documents:
+        print(f"\n{name} ({estimate_tokens(content)} tokens)")
+        print(f"  {'splitter':<10}{'chunks':>8}{'calls':>7}{'tokens':>10}{'min':>7}{'median':>8}{'max':>8}"
+              f"{'tiny':>7}{'trunc':>7}")
+        describe("paragraph", paragraph_split(content))
+        describe("window", [text for text, _, _ in chunk_text(content, args.target, args.overlap, args.max)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark serverless cold starts of the RAG store.
+
+Each run is a fresh Python process (like a new serverless instance) that
+imports the app and then serves one retrieval. Reports the median import
+time, first-query time and their total for:
+  eager             - store built at import (the old behaviour)
+  lazy, cold cache  - built on first use, Pinecone index cache empty
+  lazy, warm cache  - built on first use, index hosts cached in /tmp
+With RAG_BACKEND=pinecone the difference is the list_indexes / describe
+round trips; the local backend only shows the import-time saving.
+
+Usage:
+    python bench_cold_start.py --runs 5
+    python bench_cold_start.py --module app.services.ai_service
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import {module}
+from app.rag.store import rag_store
+imported = time.perf_counter()
+rag_store.query_similar_tickets("cold start probe", 1, mode="lexical")
+queried = time.perf_counter()
+print(json.dumps({{"import": imported - start, "first_query": queried - imported}}))
+"""
+
+SCENARIOS = [
+    ("eager", "eager", False),
+    ("lazy, cold cache", "lazy", False),
+    ("lazy, warm cache", "lazy", True),
+]
+
+
+def run_probe(module: str, rag_init: str, cache_path: Path) -> dict:
+    env = {**os.environ, "RAG_INIT": rag_init, "PINECONE_INDEX_CACHE_PATH": str(cache_path)}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=Path(__file__).parent, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="main", help="module the serverless entry point imports")
+    args = parser.parse_args()
+
+    print(f"backend: {os.getenv('RAG_BACKEND') or ('pinecone' if os.getenv('PINECONE_API_KEY') else 'local')}, "
+          f"{args.runs} runs per scenario\n")
+    print(f"{'scenario':<20}{'import ms':>12}{'1st query ms':>14}{'total ms':>12}")
+    with tempfile.TemporaryDirectory(prefix="bench_cold_start_") as workdir:
+        cache_path = Path(workdir) / "pinecone_indexes.json"
+        for name, rag_init, warm_cache in SCENARIOS:
+            timings = []
+            for _ in range(args.runs):
+                if not warm_cache:
+                    cache_path.unlink(missing_ok=True)
+                elif not cache_path.exists():
+                    run_probe(args.module, rag_init, cache_path)
+                timings.append(run_probe(args.module, rag_init, cache_path))
+            imported = statistics.median(t["import"] for t in timings) * 1000
+            queried = statistics.median(t["first_query"] for t in timings) * 1000
+            total = statistics.median(t["import"] + t["first_query"] for t in timings) * 1000
+            print(f"{name:<20}{imported:>12.1f}{queried:>14.1f}{total:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
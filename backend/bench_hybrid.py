@@ -0,0 +1,99 @@
+"""
+Benchmark vector, lexical and hybrid (RRF) ticket retrieval.
+
+Loads a JIRA CSV export into a throwaway local store, then asks three kinds
+of queries per sampled ticket and checks whether that ticket is returned:
+  key      - ticket key plus two summary words ("PROJ-1234 schema mismatch")
+  summary  - the ticket summary verbatim
+  partial  - a random half of the description words
+Reports hit@1, hit@k and p50/p99 latency per mode. Vector and hybrid modes
+need GOOGLE_API_KEY; without it only lexical retrieval is measured.
+
+Usage:
+    python bench_hybrid.py --csv jira_export.csv --queries 200 --k 5
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+
+from app.rag.backend import ticket_text
+from app.rag.store_local import LocalRAGStore
+
+
+def load_tickets(path: str):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for position, row in enumerate(csv.DictReader(f)):
+            ticket_id = row.get('Issue key', row.get('Key', f"CSV-{position}"))
+            if ticket_id:
+                yield {
+                    "id": ticket_id,
+                    "summary": row.get('Summary', ''),
+                    "description": row.get('Description', ''),
+                    "status": row.get('Status', 'Unknown'),
+                    "issuetype": row.get('Issue Type', 'Unknown')
+                }
+
+
+def make_queries(tickets, count: int, rng: random.Random):
+    queries = []
+    for ticket in rng.sample(tickets, min(count, len(tickets))):
+        summary_words = ticket['summary'].split()
+        description_words = ticket['description'].split()
+        queries.append(("key", f"{ticket['id']} {' '.join(summary_words[:2])}", ticket['id']))
+        queries.append(("summary", ticket['summary'], ticket['id']))
+        if len(description_words) >= 4:
+            partial = rng.sample(description_words, len(description_words) // 2)
+            queries.append(("partial", " ".join(partial), ticket['id']))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="test_jira_export.csv")
+    parser.add_argument("--queries", type=int, default=200, help="tickets sampled for queries")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    tickets = list(load_tickets(args.csv))
+    queries = make_queries(tickets, args.queries, random.Random(13))
+    modes = ["vector", "lexical", "hybrid"] if os.getenv("GOOGLE_API_KEY") else ["lexical"]
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_hybrid_"))
+    try:
+        store = LocalRAGStore(workdir)
+        if "vector" in modes:
+            store.add_jira_tickets(tickets)
+        else:
+            print("GOOGLE_API_KEY not set: measuring lexical retrieval only\n")
+            store.lexical.upsert("jira", [
+                (ticket['id'], ticket['id'], {"text": ticket_text(ticket)})
+                for ticket in tickets
+            ])
+        print(f"{len(tickets)} tickets, {len(queries)} queries\n")
+
+        print(f"{'mode':<10}{'query':<10}{'hit@1':>8}{'hit@' + str(args.k):>8}{'p50 ms':>10}{'p99 ms':>10}")
+        for mode in modes:
+            by_kind = {}
+            for kind, query, expected in queries:
+                start = time.perf_counter()
+                ids = store.query_similar_tickets(query, n_results=args.k, mode=mode)['ids'][0]
+                latency = (time.perf_counter() - start) * 1000
+                by_kind.setdefault(kind, []).append((ids[:1] == [expected], expected in ids, latency))
+
+            for kind, results in by_kind.items():
+                latencies = np.array([latency for _, _, latency in results])
+                print(f"{mode:<10}{kind:<10}{np.mean([r[0] for r in results]):>8.3f}"
+                      f"{np.mean([r[1] for r in results]):>8.3f}"
+                      f"{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 99):>10.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
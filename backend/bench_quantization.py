@@ -0,0 +1,106 @@
+"""
+Benchmark reduced embedding dimensions and quantized local storage.
+
+For each (dimension, quantization) pair, builds a local LocalVectorIndex and
+reports memory per vector, p50/p99 query latency and recall@k against exact
+search over full 768-dim float32 vectors.
+
+Reduced dimensions keep the leading components and renormalize, which is
+what text-embedding-004's output_dimensionality does, so each text only has
+to be embedded once. With --csv and GOOGLE_API_KEY the vectors are real
+ticket embeddings (queries are ticket summaries). Otherwise synthetic
+clustered vectors are used; they show the quantization cost but say little
+about dimension reduction.
+
+Usage:
+    python bench_quantization.py --csv jira_export.csv --k 10
+    python bench_quantization.py --vectors 100000 --dims 768 256 --k 10
+"""
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+from pathlib import Path
+import numpy as np
+
+from bench_ann import synthetic_vectors, fill, timed_search
+from app.rag.backend import FULL_EMBEDDING_DIM, ticket_text
+from app.rag.store_local import LocalRAGStore, LocalVectorIndex, QUANTIZATIONS
+
+
+def embed_csv(path: str, workdir: Path, limit: int):
+    """Embed ticket texts and summaries from a JIRA CSV export at full dimension."""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))[:limit]
+    texts = [ticket_text({
+        "summary": row.get('Summary', ''),
+        "description": row.get('Description', ''),
+        "status": row.get('Status', 'Unknown'),
+        "issuetype": row.get('Issue Type', 'Unknown')
+    }) for row in rows]
+    summaries = [row.get('Summary', '') or text for row, text in zip(rows, texts)]
+
+    store = LocalRAGStore(workdir / "embed")
+
+    def embed(batch_texts):
+        return np.concatenate([
+            np.asarray(store._get_embeddings(batch_texts[i:i + 100]), dtype=np.float32)
+            for i in range(0, len(batch_texts), 100)
+        ])
+
+    return embed(texts), embed(summaries)
+
+
+def reduce(vectors: np.ndarray, dim: int) -> np.ndarray:
+    reduced = vectors[:, :dim]
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced / np.where(norms == 0, 1.0, norms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="JIRA CSV export (needs GOOGLE_API_KEY)")
+    parser.add_argument("--vectors", type=int, default=50_000, help="synthetic vectors (or CSV row limit)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dims", type=int, nargs="+", default=[768, 512, 256, 128])
+    parser.add_argument("--quantizations", nargs="+", default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_quantization_"))
+    try:
+        if args.csv and os.getenv("GOOGLE_API_KEY"):
+            vectors, queries = embed_csv(args.csv, workdir, args.vectors)
+            queries = queries[rng.choice(len(queries), min(args.queries, len(queries)), replace=False)]
+        else:
+            if args.csv:
+                print("GOOGLE_API_KEY not set: using synthetic vectors\n")
+            vectors = synthetic_vectors(args.vectors, FULL_EMBEDDING_DIM, clusters=max(8, args.vectors // 500), rng=rng)
+            queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+            queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+        print(f"{len(vectors)} vectors, {len(queries)} queries, recall against {FULL_EMBEDDING_DIM}-dim float32\n")
+        truth = None
+        print(f"{'dim':>5}  {'storage':<9}{'bytes/vec':>10}{'recall@' + str(args.k):>11}{'p50 ms':>9}{'p99 ms':>9}")
+        for dim in sorted(args.dims, reverse=True):
+            reduced_vectors, reduced_queries = reduce(vectors, dim), reduce(queries, dim)
+            for quantization in sorted(args.quantizations, key=QUANTIZATIONS.index):
+                index = LocalVectorIndex(workdir / f"{dim}-{quantization}", dim,
+                                         index_type="flat", quantization=quantization)
+                fill(index, reduced_vectors)
+                found, latency = timed_search(index, reduced_queries, args.k)
+                if truth is None:
+                    if dim != FULL_EMBEDDING_DIM or quantization != "none":
+                        raise SystemExit(f"--dims must include {FULL_EMBEDDING_DIM} and --quantizations none")
+                    truth = found
+                recall = np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth) if t])
+                print(f"{dim:>5}  {quantization:<9}{index.bytes_per_vector:>10}{recall:>11.3f}"
+                      f"{np.percentile(latency, 50):>9.2f}{np.percentile(latency, 99):>9.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
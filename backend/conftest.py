@@ -0,0 +1,67 @@
+import os
+
+# Keep the app's module-level engine off the development database
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/sql_app_test.db")
+
+import hashlib
+import types
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+
+# Manual scripts that query the configured store as soon as they are imported
+collect_ignore = ["test_retrieval.py", "test_jira_embeddings.py"]
+
+
+def fake_embedding(text: str):
+    """Deterministic 768-dim stand-in for a Gemini embedding."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [byte / 255.0 + 0.01 for byte in digest] * 24
+
+
+@pytest.fixture
+def make_ticket():
+    def make(ticket_id: str, summary: str, status: str = "Open"):
+        return {"id": ticket_id, "summary": summary, "description": f"{summary} in the bronze layer",
+                "status": status, "issuetype": "Bug"}
+    return make
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    """
+    Local store, embedding cache and database under tmp_path, wired into
+    knowledge ingestion. Embeddings are deterministic; `embedded` lists the
+    texts that missed the cache.
+    """
+    from app.rag import backend
+    from app.rag.embedding_cache import EmbeddingCache
+    from app.rag.store_local import LocalRAGStore
+    from app.services import knowledge_ingestion
+    from app.services.gemini_client import gemini_client
+
+    engine = create_engine(f"sqlite:///{tmp_path}/kb.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    monkeypatch.setattr(gemini_client, "api_key", "test")
+    monkeypatch.setattr(backend, "embedding_cache", EmbeddingCache(str(tmp_path / "embeddings.db")))
+    embedded = []
+    store = LocalRAGStore(tmp_path / "store")
+    store._embed_uncached = lambda texts: [embedded.append(text) or fake_embedding(text) for text in texts]
+    monkeypatch.setattr(knowledge_ingestion, "rag_store", store)
+
+    yield types.SimpleNamespace(db=db, store=store, embedded=embedded, path=tmp_path, vector=fake_embedding)
+    db.close()
+
+
+@pytest.fixture
+def unthrottled_gemini(monkeypatch):
+    """Gemini calls without the production per-model rate limits."""
+    from app.services import gemini_client
+    from app.services.rate_limiter import GeminiRateLimiter
+
+    monkeypatch.setattr(gemini_client, "gemini_limiter", GeminiRateLimiter(default_rpm=60000, rate_limits={}))
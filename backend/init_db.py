@@ -4,6 +4,9 @@ Initialize database tables
 from app.database import engine, Base
 from app.models.connection import Connection
 from app.models.request import Request
+from app.models.knowledge_item import KnowledgeItem
+from app.models.knowledge_chunk import KnowledgeChunk
+from app.models.ingestion_job import IngestionJob
 
 # Create all tables
 Base.metadata.create_all(bind=engine)
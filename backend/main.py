@@ -10,8 +10,11 @@ load_dotenv()
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from app.database import engine, Base, SessionLocal
+from app.rag.store import rag_store, RAG_INIT
 from app.api.endpoints import requests, connections, dashboard, knowledge
+from app.services.ingestion_jobs import ingestion_queue
+from app.services.knowledge_ingestion import rebuild_lexical_index
 
 # Create database tables on startup (works with both SQLite locally and PostgreSQL on Vercel)
 try:
@@ -41,6 +44,34 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def resume_ingestion_jobs():
+    """Resume background ingestion jobs left queued or interrupted by a restart."""
+    ingestion_queue.start()
+
+
+def restore_lexical_index(store):
+    """Refill the BM25 index from the database if /tmp was wiped."""
+    db = SessionLocal()
+    try:
+        rebuild_lexical_index(db, store)
+    except Exception as e:
+        print(f"Warning: Could not rebuild lexical index: {e}")
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def prepare_rag_store():
+    """
+    The RAG store is built on first use (RAG_INIT=lazy) so cold starts stay
+    fast; with RAG_INIT=background it is warmed in a thread right away.
+    """
+    rag_store.on_ready(restore_lexical_index)
+    if RAG_INIT == "background":
+        rag_store.warm_up(background=True)
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
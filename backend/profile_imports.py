@@ -0,0 +1,71 @@
+"""
+Profile what importing the app costs.
+
+Runs `python -X importtime -c "import <module>"` in a fresh process and
+prints the slowest modules by cumulative time, the total and any heavy SDKs
+or parsers that were pulled in (they should load on first use instead).
+
+Usage:
+    python profile_imports.py
+    python profile_imports.py --module app.services.ai_service --top 40
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Loaded on first use; importing the app must not pull these in
+LAZY_MODULES = ["google.generativeai", "google.genai", "pinecone", "pypdf", "docx", "pptx", "numpy"]
+
+PROBE = """
+import sys
+import {module}
+print("loaded:" + ",".join(name for name in {lazy!r} if name in sys.modules))
+"""
+
+
+def profile(module: str = "main") -> Tuple[List[Tuple[str, int, int]], List[str]]:
+    """
+    Import `module` in a fresh interpreter. Returns (name, self_us, cumulative_us)
+    per imported module and the LAZY_MODULES that were loaded.
+    """
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, lazy=LAZY_MODULES)],
+        cwd=Path(__file__).parent, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    report = result.stdout.strip().splitlines()[-1]
+    loaded = [name for name in report[len("loaded:"):].split(",") if name]
+    return rows, loaded
+
+
+def total_ms(rows: List[Tuple[str, int, int]], module: str = "main") -> float:
+    """Cumulative import time of `module` itself."""
+    cumulative: Dict[str, int] = {name: cumulative_us for name, _, cumulative_us in rows}
+    return cumulative.get(module, 0) / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    rows, loaded = profile(args.module)
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+    print(f"\nimport {args.module}: {total_ms(rows, args.module):.1f} ms across {len(rows)} modules")
+    print(f"heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
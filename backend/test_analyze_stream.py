@@ -0,0 +1,98 @@
+import asyncio
+import json
+import types
+
+import httpx
+import pytest
+
+from main import app
+from app.agents import request_creator_agent
+from app.rag.store import LazyRAGStore
+from app.services.gemini_client import gemini_client
+from app.services.llm_cache import LLMResultCache
+
+
+class FakeGemini:
+    """Stands in for the google-genai client: streams `parts` and records whether the stream was closed."""
+
+    def __init__(self, embed):
+        self.embed = embed
+        self.parts = []
+        self.closed = False
+        self.aio = types.SimpleNamespace(models=types.SimpleNamespace(
+            generate_content_stream=self.generate_content_stream, embed_content=self.embed_content))
+
+    async def generate_content_stream(self, model, contents, config=None):
+        async def chunks():
+            try:
+                for part in self.parts:
+                    await asyncio.sleep(0)
+                    yield types.SimpleNamespace(text=part)
+            finally:
+                self.closed = True
+        return chunks()
+
+    async def embed_content(self, model, contents, config=None):
+        return types.SimpleNamespace(embeddings=[types.SimpleNamespace(values=self.embed(text)) for text in contents])
+
+
+@pytest.fixture
+def gemini(kb, make_ticket, monkeypatch, unthrottled_gemini):
+    """The temporary knowledge base wired into the request creator, with a fake Gemini client."""
+    kb.store.add_jira_tickets([make_ticket("OPS-1", "Daily load fails", "Done")])
+    fake = FakeGemini(kb.vector)
+    monkeypatch.setattr(request_creator_agent, "rag_store", LazyRAGStore(lambda: kb.store))
+    monkeypatch.setattr(request_creator_agent, "llm_cache", LLMResultCache(str(kb.path / "llm.db")))
+    monkeypatch.setattr(gemini_client, "_client", fake)
+    return fake
+
+
+async def analyze(payload):
+    """(event, data) pairs of one streamed analyze call."""
+    events = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        async with client.stream("POST", "/api/requests/analyze/stream", json=payload) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+def test_stages_are_streamed_and_the_result_is_cached(gemini):
+    gemini.parts = ['{"summary": "Fix', ' the daily load", ', '"issuetype": "Bug"}']
+    events = asyncio.run(analyze({"description": "The daily load fails"}))
+    assert [event for event, _ in events] == ["retrieval", "token", "token", "token", "result"]
+    assert events[0][1]["ids"]["similar_tickets"] == ["OPS-1"]
+    assert "".join(data["text"] for event, data in events if event == "token").startswith('{"summary"')
+    assert events[-1][1]["result"]["summary"] == "Fix the daily load"
+
+    again = asyncio.run(analyze({"description": "The  daily load fails"}))
+    assert [event for event, _ in again] == ["retrieval", "result"]
+    assert again[-1][1]["cached"] is True
+
+
+def test_invalid_model_output_falls_back(gemini):
+    gemini.parts = ["[]"]
+    events = asyncio.run(analyze({"description": "The daily load fails", "bypass_cache": True}))
+    assert events[-1][0] == "result"
+    assert events[-1][1]["fallback"] is True
+    assert events[-1][1]["result"]["description"] == "The daily load fails"
+
+
+def test_closing_the_stream_stops_generation(gemini):
+    gemini.parts = ['{"a"', ': 1', '}'] * 5
+
+    async def first_token():
+        stages = request_creator_agent.request_creator.stream_request("The daily load fails", use_cache=False)
+        async for event, _ in stages:
+            if event == "token":
+                break
+        await stages.aclose()
+
+    asyncio.run(first_token())
+    assert gemini.closed
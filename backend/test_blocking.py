@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import blocking
+from app.services.blocking import run_blocking
+
+
+def test_blocking_calls_overlap_up_to_the_pool_size_without_freezing_the_loop(monkeypatch):
+    active = {"now": 0, "peak": 0}
+    intervals = []
+    lock = threading.Lock()
+
+    def slow_query(value, delay=0.1):
+        started = time.perf_counter()
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(delay)
+        with lock:
+            active["now"] -= 1
+            intervals.append((started, time.perf_counter()))
+        return value * 2
+
+    async def scenario():
+        ticks_during_calls = 0
+
+        async def ticker():
+            nonlocal ticks_during_calls
+            while True:
+                await asyncio.sleep(0.01)
+                if active["now"]:
+                    ticks_during_calls += 1
+
+        ticking = asyncio.create_task(ticker())
+        results = await asyncio.gather(*(run_blocking(slow_query, i, delay=0.1) for i in range(4)))
+        ticking.cancel()
+        return results, ticks_during_calls
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(blocking, "_executor", pool)
+    results, ticks_during_calls = asyncio.run(scenario())
+    pool.shutdown()
+
+    assert results == [0, 2, 4, 6]
+    # Calls ran side by side, never more than the pool's two at once
+    assert active["peak"] == 2
+    assert any(start < other_end and other_start < end
+               for i, (start, end) in enumerate(intervals) for other_start, other_end in intervals[i + 1:])
+    # The loop kept serving other coroutines while the calls ran
+    assert ticks_during_calls > 0
@@ -0,0 +1,37 @@
+from app.rag.chunker import CHARS_PER_TOKEN, chunk_text, estimate_tokens
+
+DOCUMENT = "\n\n".join(
+    f"Section {i}. " + " ".join(f"Step {j} loads the bronze table and checks the row count." for j in range(30))
+    for i in range(5)
+)
+
+
+def test_chunks_are_exact_slices_with_offsets():
+    chunks = chunk_text(DOCUMENT, target_tokens=100, overlap_tokens=20, max_tokens=150)
+    assert len(chunks) > 5
+    for text, start, end in chunks:
+        assert text == DOCUMENT[start:end]
+        assert text == text.strip()
+        assert estimate_tokens(text) <= 150
+    # Neighbours overlap, and together they cover the whole document
+    starts = [start for _, start, _ in chunks]
+    ends = [end for _, _, end in chunks]
+    assert starts == sorted(starts)
+    assert all(next_start < end for next_start, end in zip(starts[1:], ends))
+    assert starts[0] == 0 and ends[-1] == len(DOCUMENT)
+
+
+def test_cuts_prefer_sentence_and_paragraph_boundaries():
+    chunks = chunk_text(DOCUMENT, target_tokens=100, overlap_tokens=0, max_tokens=150)
+    assert all(text.endswith(".") for text, _, _ in chunks)
+    # Without overlap the chunks tile the text, separated only by whitespace
+    for (_, _, end), (_, next_start, _) in zip(chunks, chunks[1:]):
+        assert DOCUMENT[end:next_start].strip() == ""
+
+
+def test_text_without_boundaries_is_cut_at_the_limit():
+    content = "x" * (40 * CHARS_PER_TOKEN)
+    chunks = chunk_text(content, target_tokens=10, overlap_tokens=0, max_tokens=10)
+    assert [len(text) for text, _, _ in chunks] == [10 * CHARS_PER_TOKEN] * 4
+    assert chunk_text("   \n\n  ") == []
+    assert chunk_text("  short note  ") == [("short note", 2, 12)]
@@ -0,0 +1,45 @@
+from app.agents.context_builder import build_rag_context
+from app.rag.backend import format_matches
+from app.rag.chunker import estimate_tokens
+
+LONG_DESCRIPTION = "The bronze job stopped after the source file changed its header row. " * 40
+
+
+def retrieved():
+    tickets = [
+        ("OPS-12", 0.9, {"text": f"Summary: Daily ingestion failed\nDescription: {LONG_DESCRIPTION}",
+                         "issuetype": "Bug", "status": "Done"}),
+        # Same ticket text stored twice: listed once
+        ("OPS-13", 0.85, {"text": f"Summary: Daily ingestion failed\nDescription:  {LONG_DESCRIPTION}",
+                          "issuetype": "Bug", "status": "Done"}),
+        ("OPS-20", 0.4, {"text": "Summary: Dashboard slow\nDescription: Gold queries scan every partition.",
+                         "issuetype": "Task", "status": "Unknown"}),
+    ]
+    docs = [("runbook.md_chunk_0", 0.7, {"text": "Restart the ingestion   worker\nwith the backfill flag.",
+                                         "source": "runbook.md"})]
+    return {"similar_tickets": format_matches(tickets), "relevant_docs": format_matches(docs)}
+
+
+def test_items_are_deduplicated_trimmed_and_rendered_one_per_line():
+    text, usage = build_rag_context(retrieved(), budget=1000, snippet_tokens=30)
+    lines = text.splitlines()
+    assert lines[0] == "Similar past tickets:"
+    assert lines[1].startswith("- OPS-12 (Bug, Done): Daily ingestion failed. The bronze job stopped")
+    assert lines[1].endswith("...") and estimate_tokens(lines[1]) <= 40
+    assert lines[2] == "- OPS-20 (Task): Dashboard slow. Gold queries scan every partition."
+    assert lines[3:] == ["Relevant documentation:", "- [runbook.md] Restart the ingestion worker with the backfill flag."]
+    assert usage["sections"]["similar_tickets"]["ids"] == ["OPS-12", "OPS-20"]
+    assert usage["dropped"] == 0
+    assert usage["tokens"] == sum(section["tokens"] for section in usage["sections"].values())
+
+
+def test_budget_keeps_the_most_relevant_items_that_fit():
+    full, _ = build_rag_context(retrieved(), budget=1000, snippet_tokens=30)
+    text, usage = build_rag_context(retrieved(), budget=60, snippet_tokens=30)
+    assert usage["tokens"] <= 60
+    # The doc no longer fits after the top ticket, but the shorter, less relevant ticket still does
+    assert usage["sections"]["similar_tickets"]["ids"] == ["OPS-12", "OPS-20"]
+    assert usage["sections"]["relevant_docs"]["ids"] == []
+    assert usage["dropped"] == 1
+    assert "Relevant documentation:" in full and "Relevant documentation:" not in text
+    assert build_rag_context(None) == ("", build_rag_context({})[1])
@@ -0,0 +1,43 @@
+from app.rag.embedding_cache import EmbeddingCache
+
+
+def vector(text: str):
+    return [float(len(text)), 1.0, 0.5]
+
+
+def test_repeats_are_served_from_the_cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.db"), max_entries=100)
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return [vector(text) for text in texts]
+
+    cached_embed = cache.wrap("models/text-embedding-004", "retrieval_document", embed)
+    assert cached_embed(["a", "bb", "a"]) == [vector("a"), vector("bb"), vector("a")]
+    assert cached_embed(["bb", "ccc"]) == [vector("bb"), vector("ccc")]
+    # Each distinct text is embedded once; the model prefix does not split entries
+    assert calls == [["a", "bb"], ["ccc"]]
+    assert cache.get_many("text-embedding-004", "retrieval_document", ["ccc"]) == [vector("ccc")]
+    assert cache.get_many("text-embedding-004", "retrieval_query", ["ccc"]) == [None]
+
+
+def test_least_recently_used_entries_are_evicted_in_batches(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache(path, max_entries=100)
+    texts = [f"text {i}" for i in range(100)]
+    cache.put_many("m", "t", texts, [vector(text) for text in texts])
+    # Overwrites are not new entries
+    cache.put_many("m", "t", texts[:10], [vector(text) for text in texts[:10]])
+    assert cache.stats()["entries"] == 100 and cache.evictions == 0
+
+    cache.get_many("m", "t", texts[:3])
+    cache.put_many("m", "t", ["new"], [vector("new")])
+    # One over the bound evicts it plus 5% slack, oldest first
+    assert cache.evictions == 6
+    assert cache.stats()["entries"] == 95
+    assert None not in cache.get_many("m", "t", texts[:3] + ["new"])
+    assert cache.get_many("m", "t", texts[10:16]) == [None] * 6
+
+    # The in-memory count is restored from the file
+    assert EmbeddingCache(path, max_entries=100)._entries == 95
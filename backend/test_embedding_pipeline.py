@@ -0,0 +1,44 @@
+import threading
+import time
+
+from app.rag.embedding_pipeline import EmbeddingPipeline
+
+
+def test_texts_are_embedded_in_batches_with_bounded_concurrency():
+    batches = []
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def embed(texts):
+        with lock:
+            batches.append(len(texts))
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.02)
+        with lock:
+            active["now"] -= 1
+        return [[float(len(text))] for text in texts]
+
+    pipeline = EmbeddingPipeline(embed, batch_size=4, max_in_flight=2)
+    texts = [f"text {'x' * i}" for i in range(10)]
+    vectors = pipeline.embed_all(texts)
+
+    assert vectors == [[float(len(text))] for text in texts]
+    assert sorted(batches) == [2, 4, 4]
+    assert active["peak"] == 2
+    assert pipeline.stats.texts_embedded == 10 and pipeline.stats.max_in_flight == 2
+
+
+def test_failed_batches_are_skipped_and_reported():
+    def embed(texts):
+        if "bad" in texts:
+            raise ConnectionError("quota exhausted")
+        return [[1.0] for _ in texts]
+
+    pipeline = EmbeddingPipeline(embed, batch_size=2, max_in_flight=1)
+    items = [("a", "ok"), ("b", "bad"), ("c", "ok"), ("d", "ok")]
+    embedded = [payload for batch in pipeline.run(items) for payload, _ in batch]
+
+    assert sorted(embedded) == ["c", "d"]
+    assert pipeline.failed_payloads == ["a", "b"]
+    assert (pipeline.stats.batches_failed, pipeline.stats.texts_failed) == (1, 2)
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import types
+
+import pytest
+
+from app.services.gemini_client import EMBED_BATCH_SIZE, EMBEDDING_MODEL, GeminiClient
+
+
+class FakeModels:
+    """Records the size of each embed request."""
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_content(self, model, contents, config=None):
+        self.batches.append(len(contents))
+        return types.SimpleNamespace(embeddings=[types.SimpleNamespace(values=[float(len(text))])
+                                                 for text in contents])
+
+    async def aembed_content(self, model, contents, config=None):
+        await asyncio.sleep(0)
+        return self.embed_content(model, contents, config)
+
+
+def test_one_client_is_built_and_shared_across_threads():
+    with pytest.raises(RuntimeError):
+        GeminiClient(api_key="").client
+
+    shared = GeminiClient(api_key="test")
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(shared.client)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(client) for client in clients}) == 1
+
+
+def test_embeddings_are_sent_in_batches_and_counted(unthrottled_gemini):
+    models = FakeModels()
+    client = GeminiClient(api_key="test")
+    client._client = types.SimpleNamespace(
+        models=models, aio=types.SimpleNamespace(models=types.SimpleNamespace(embed_content=models.aembed_content)))
+    texts = [f"ticket {i}" for i in range(2 * EMBED_BATCH_SIZE + 50)]
+
+    assert client.embed(texts) == [[float(len(text))] for text in texts]
+    assert models.batches == [EMBED_BATCH_SIZE, EMBED_BATCH_SIZE, 50]
+
+    # The async path sends the batches concurrently but keeps the input order
+    assert asyncio.run(client.aembed(texts)) == [[float(len(text))] for text in texts]
+    stats = client.stats()[f"embed:{EMBEDDING_MODEL}"]
+    assert (stats["calls"], stats["items"], stats["errors"]) == (6, 2 * len(texts), 0)
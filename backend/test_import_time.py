@@ -0,0 +1,16 @@
+import os
+
+from profile_imports import profile, total_ms
+
+# `import main` must fit in this budget without loading SDKs or parsers meant for first use
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+
+
+def test_startup_import_budget():
+    rows, loaded = profile("main")
+    elapsed = total_ms(rows)
+    assert not loaded, f"import main loaded {', '.join(loaded)}; import them on first use"
+    assert elapsed <= IMPORT_TIME_BUDGET_MS, (
+        f"import main took {elapsed:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms); "
+        f"run profile_imports.py to see what grew"
+    )
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.ingestion_job import IngestionJob
+from app.models.knowledge_item import KnowledgeItem
+from app.rag.store import LazyRAGStore
+from app.rag.store_local import LocalRAGStore
+from app.services import ingestion_jobs, knowledge_ingestion
+from app.services.gemini_client import gemini_client
+from app.services.ingestion_jobs import IngestionJobQueue, utcnow
+
+# Long enough for several chunks at CHUNK_TARGET_TOKENS
+DOCUMENT = "\n\n".join(f"Section {i}. " + "The bronze ingestion job loads raw files. " * 60 for i in range(6))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A throwaway database swapped in for the job queue's session factory."""
+    engine = create_engine(f"sqlite:///{tmp_path}/jobs.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(ingestion_jobs, "SessionLocal", session_factory)
+    # No API key: chunks are counted as failed, but every batch still runs
+    monkeypatch.setattr(gemini_client, "api_key", "")
+    monkeypatch.setattr(knowledge_ingestion, "rag_store", LazyRAGStore(lambda: LocalRAGStore(tmp_path / "store")))
+    session = session_factory()
+    yield session
+    session.close()
+
+
+def add_job(db, **fields) -> int:
+    job = IngestionJob(filename="notes.txt", file_path="notes.txt", **fields)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_claim_skips_jobs_with_a_live_lease(db):
+    queue = IngestionJobQueue(lease_seconds=60)
+    queued = add_job(db, status="queued")
+    live = add_job(db, status="running", worker_id="other", heartbeat_at=utcnow())
+    expired = add_job(db, status="running", worker_id="other", heartbeat_at=utcnow() - timedelta(minutes=5))
+
+    assert queue._claimable_ids(db) == [queued, expired]
+    assert queue._claim(db, queued)
+    assert not queue._claim(db, queued)
+    assert not queue._claim(db, live)
+    assert queue._claim(db, expired)
+    assert not IngestionJobQueue(lease_seconds=60)._claim(db, expired)
+    db.expire_all()
+    assert db.get(IngestionJob, expired).worker_id == queue.worker_id
+    assert db.get(IngestionJob, live).worker_id == "other"
+
+
+def test_document_progress_is_reported_per_chunk_batch(db):
+    reports = []
+    counts = knowledge_ingestion.sync_document(db, "notes.md", "notes.md", DOCUMENT, batch_size=2,
+                                               progress=lambda counts: reports.append(dict(counts)))
+    chunks = counts["failed"]
+    assert chunks > 2
+    assert len(reports) == (chunks + 1) // 2
+    assert [report["failed"] for report in reports][:2] == [2, 4]
+
+
+def test_cancel_stops_a_document_job_after_the_current_batch(db, tmp_path, monkeypatch):
+    path = tmp_path / "notes.txt"
+    path.write_text(DOCUMENT)
+    job_id = add_job(db, status="queued", cancel_requested=True)
+    db.query(IngestionJob).filter(IngestionJob.id == job_id).update({"file_path": str(path)})
+    db.commit()
+
+    monkeypatch.setattr(knowledge_ingestion, "DOC_BATCH_SIZE", 1)
+    IngestionJobQueue()._run(job_id)
+
+    db.expire_all()
+    job = db.get(IngestionJob, job_id)
+    assert job.status == "cancelled"
+    assert job.items_failed == 1
+    # The partly ingested document stays listed so it can be deleted or re-uploaded
+    assert db.query(KnowledgeItem).filter(KnowledgeItem.item_id == "notes.txt").count() == 1
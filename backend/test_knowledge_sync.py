@@ -0,0 +1,117 @@
+import asyncio
+
+from app.models.knowledge_chunk import KnowledgeChunk
+from app.models.knowledge_item import KnowledgeItem
+from app.rag.backend import DOCS, JIRA, ticket_text
+from app.services import knowledge_content
+from app.services.knowledge_ingestion import (
+    delete_items, ingest_file, ingest_jira_csv, reconcile_vectors, sync_document, sync_jira_tickets
+)
+
+DOCUMENT = "\n\n".join(f"Step {i}. " + "Reload the bronze table. " * 80 for i in range(3)).strip()
+
+
+def stored_ids(kb, kind: str):
+    return sorted(vector_id for page in kb.store.list_ids(kind) for vector_id in page)
+
+
+def test_only_new_and_changed_tickets_are_embedded(kb, make_ticket):
+    tickets = [make_ticket("OPS-1", "Load fails"), make_ticket("OPS-2", "Slow dashboard"),
+               make_ticket("OPS-3", "Missing rows")]
+    counts = sync_jira_tickets(kb.db, tickets)
+    assert (counts["added"], counts["embedded"], counts["upserted"]) == (3, 3, 3)
+
+    kb.embedded.clear()
+    upload = [tickets[0], make_ticket("OPS-2", "Slow dashboard", status="Done")]
+    counts = sync_jira_tickets(kb.db, upload, prune=True)
+    assert {key: counts[key] for key in ("added", "updated", "unchanged", "removed")} == {
+        "added": 0, "updated": 1, "unchanged": 1, "removed": 1
+    }
+    # A status change rewrites the vector; the unchanged text comes from the embedding cache
+    assert kb.embedded == []
+    assert kb.store.indexes[JIRA].fetch(["OPS-2"])["OPS-2"]["status"] == "Done"
+    assert "OPS-3" not in kb.store.indexes[JIRA].fetch(["OPS-3"])
+    assert kb.db.query(KnowledgeChunk).count() == 2
+
+
+def test_tickets_stored_before_the_manifest_are_adopted(kb, make_ticket):
+    current, legacy = make_ticket("OPS-1", "Load fails"), make_ticket("OPS-2", "Slow dashboard")
+    kb.store.add_jira_tickets([current])
+    # Stored by an older version: same text, no project metadata
+    text = ticket_text(legacy)
+    kb.store._upsert(JIRA, [{"id": "OPS-2", "values": kb.vector(text),
+                             "metadata": {"text": text, "status": "Open", "issuetype": "Bug"}}])
+    kb.embedded.clear()
+
+    counts = sync_jira_tickets(kb.db, [current, legacy, make_ticket("OPS-3", "Missing rows")])
+    assert (counts["adopted"], counts["added"], counts["embedded"]) == (2, 1, 1)
+    assert kb.embedded == [ticket_text(make_ticket("OPS-3", "Missing rows"))]
+    assert kb.store.indexes[JIRA].fetch(["OPS-2"])["OPS-2"]["project"] == "OPS"
+
+    counts = sync_jira_tickets(kb.db, [current, legacy])
+    assert (counts["unchanged"], counts["adopted"], counts["embedded"]) == (2, 0, 0)
+
+
+def test_jira_csv_is_streamed_in_batches(kb):
+    rows = [{"Issue key": f"OPS-{i}", "Summary": f"Ticket {i}", "Status": "Open"} for i in range(5)]
+    reports = []
+    counts = ingest_jira_csv(kb.db, iter(rows), batch_size=2, progress=lambda counts: reports.append(counts["count"]))
+    assert (counts["count"], counts["added"]) == (5, 5)
+    assert reports == [2, 4, 5]
+
+
+def test_jira_csv_without_tickets_is_not_ingested_as_a_document(kb):
+    for name, content in (("empty.csv", "Issue key,Summary,Status\n"), ("blank.csv", "Issue key,Summary\n,\n,\n")):
+        path = kb.path / name
+        path.write_text(content)
+        result = asyncio.run(ingest_file(kb.db, path, name))
+        assert (result["type"], result["count"], result["added"]) == ("jira_csv", 0, 0)
+    assert kb.db.query(KnowledgeItem).count() == 0
+    assert kb.embedded == []
+
+
+def test_bulk_delete_removes_manifest_vectors_and_rows(kb):
+    sync_document(kb.db, "runbook.md", "runbook.md", DOCUMENT)
+    sync_document(kb.db, "faq.md", "faq.md", "Dashboards read from the gold layer.")
+    chunks = kb.db.query(KnowledgeChunk).filter(KnowledgeChunk.parent_id == "runbook.md").count()
+    assert chunks > 1
+
+    result = delete_items(kb.db, "document", ["runbook.md", "runbook.md", "missing.md"])
+    assert (result["deleted"], result["not_found"], result["vectors"]) == (["runbook.md"], ["missing.md"], chunks)
+    assert stored_ids(kb, DOCS) == ["faq.md_chunk_0"]
+    assert kb.db.query(KnowledgeChunk).count() == 1
+    assert [item.item_id for item in kb.db.query(KnowledgeItem)] == ["faq.md"]
+
+
+def test_reconcile_drops_orphaned_vectors_and_missing_manifest_rows(kb, make_ticket):
+    sync_jira_tickets(kb.db, [make_ticket("OPS-1", "Load fails"), make_ticket("OPS-2", "Slow dashboard")])
+    # Left behind by a failed delete, and lost from the store behind the manifest's back
+    kb.store.add_jira_tickets([make_ticket("OPS-9", "Deleted long ago")])
+    kb.store.delete_ids(JIRA, ["OPS-2"])
+
+    assert reconcile_vectors(kb.db, dry_run=True)["jira_ticket"] == {"vectors": 2, "orphaned": 1, "missing": 1}
+    assert stored_ids(kb, JIRA) == ["OPS-1", "OPS-9"]
+
+    reconcile_vectors(kb.db)
+    assert stored_ids(kb, JIRA) == ["OPS-1"]
+    assert [row.chunk_id for row in kb.db.query(KnowledgeChunk)] == ["OPS-1"]
+
+
+def test_listing_and_content_are_served_from_the_database(kb, make_ticket, monkeypatch):
+    sync_document(kb.db, "runbook.md", "runbook.md", DOCUMENT, file_path="runbook.md")
+    sync_jira_tickets(kb.db, [make_ticket("OPS-1", "Load fails", "Done")])
+
+    monkeypatch.setattr(knowledge_content, "rag_store", None)
+    assert [item["id"] for item in knowledge_content.list_items(kb.db, "document")] == ["runbook.md"]
+    assert len(knowledge_content.list_items(kb.db)) == 2
+    # Overlapping chunks are stitched back into the original text
+    assert knowledge_content.get_document_content(kb.db, "runbook.md")["content"] == DOCUMENT
+    assert knowledge_content.get_jira_ticket_content(kb.db, "OPS-1") == {
+        "id": "OPS-1", "status": "Done", "issuetype": "Bug",
+        "content": ticket_text(make_ticket("OPS-1", "Load fails"))
+    }
+
+    # Rows from before chunk text was kept locally fall back to the store
+    kb.db.query(KnowledgeChunk).filter(KnowledgeChunk.parent_id == "OPS-1").update({"text": None})
+    monkeypatch.setattr(knowledge_content, "rag_store", kb.store)
+    assert knowledge_content.get_jira_ticket_content(kb.db, "OPS-1")["status"] == "Done"
@@ -0,0 +1,57 @@
+import time
+import threading
+import types
+
+from app.rag import store as store_module
+from app.rag.store import LazyRAGStore
+
+
+def fake_store():
+    return types.SimpleNamespace(backend_name="test store")
+
+
+def test_ready_hooks_run_after_the_build_without_holding_it_up():
+    lazy = LazyRAGStore(fake_store)
+    release = threading.Event()
+    seen = []
+
+    def slow_hook(store):
+        # Calling back into the proxy must not deadlock
+        seen.append(lazy.get() is store)
+        release.wait(5)
+        seen.append("done")
+
+    lazy.on_ready(slow_hook)
+    started = time.perf_counter()
+    assert lazy.get() is not None
+    assert time.perf_counter() - started < 1
+    assert lazy.backend_name == "test store"
+
+    release.set()
+    lazy.ready_hooks.join(5)
+    assert seen == [True, "done"]
+
+    # Registered after the build: runs right away
+    late = []
+    lazy.on_ready(late.append)
+    assert late == [lazy.get()]
+
+
+def test_failed_build_is_retried_after_backoff(monkeypatch):
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise ConnectionError("index lookup timed out")
+        return fake_store()
+
+    monkeypatch.setattr(store_module, "RAG_INIT_RETRY_SECONDS", 0.2)
+    lazy = LazyRAGStore(flaky)
+    assert not lazy
+    # Within the backoff window: no new attempt
+    assert lazy.get() is None
+    assert len(attempts) == 1
+    time.sleep(0.25)
+    assert lazy
+    assert len(attempts) == 2
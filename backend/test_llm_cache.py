@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from app.services.llm_cache import LLMResultCache, cache_key
+
+
+def test_key_ignores_whitespace_but_not_prompt_inputs():
+    key = cache_key("request_creator", "gemini", "Load  fails\n on Monday", issue_type="Bug")
+    assert key == cache_key("request_creator", "gemini", " Load fails on Monday ", issue_type="Bug")
+    assert key != cache_key("request_creator", "gemini", "Load fails on Monday", issue_type="Task")
+    assert key != cache_key("request_creator", "gemini-pro", "Load fails on Monday", issue_type="Bug")
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache = LLMResultCache(str(tmp_path / "llm.db"), max_entries=10, ttl_seconds=0.2)
+    cache.put("a", "request_creator", {"summary": "Load fails"})
+    assert cache.get("a") == {"summary": "Load fails"}
+    time.sleep(0.25)
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = LLMResultCache(str(tmp_path / "llm.db"), max_entries=2, ttl_seconds=60)
+    cache.put("a", "request_creator", {"n": 1})
+    time.sleep(0.01)
+    cache.put("b", "request_creator", {"n": 2})
+    time.sleep(0.01)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == {"n": 1}
+    time.sleep(0.01)
+    cache.put("c", "request_creator", {"n": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1} and cache.get("c") == {"n": 3}
+    assert cache.evictions == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_malformed_routing_is_not_cached(tmp_path, monkeypatch):
+    from app.agents import intake_router_agent
+    from app.agents.intake_router_agent import intake_router
+    from app.services.gemini_client import gemini_client
+
+    outputs = ['["Bug"]', '{"type": "Bug"}',
+               '{"type": "Bug", "confidence": 0.9, "target_agent": "DecompositionAgent", "reasoning": "error"}']
+
+    async def agenerate(prompt, **options):
+        return outputs.pop(0)
+
+    cache = LLMResultCache(str(tmp_path / "llm.db"), max_entries=10, ttl_seconds=60)
+    monkeypatch.setattr(intake_router_agent, "llm_cache", cache)
+    monkeypatch.setattr(gemini_client, "api_key", "test")
+    monkeypatch.setattr(gemini_client, "agenerate", agenerate)
+
+    for expected in ("Unknown", "Unknown", "Bug"):
+        assert asyncio.run(intake_router.route_request("Nightly load fails"))["type"] == expected
+    assert cache.stats()["entries"] == 1
+    assert asyncio.run(intake_router.route_request("Nightly load fails"))["target_agent"] == "DecompositionAgent"
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from app.rag.backend import matches_filters, normalize_filters
+from app.rag.store_local import LocalVectorIndex
+
+DIM = 32
+
+# 2024-01-01, UTC
+JANUARY = 1704067200
+
+
+def random_vectors(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def clustered_vectors(count: int, clusters: int = 40, seed: int = 0) -> np.ndarray:
+    """Unit vectors scattered around random centres, like topical embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, DIM))
+    vectors = centres[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def fill(index: LocalVectorIndex, vectors: np.ndarray, metadata=None):
+    index.upsert([
+        {"id": f"v{i}", "values": vector.tolist(), "metadata": metadata(i) if metadata else {}}
+        for i, vector in enumerate(vectors)
+    ])
+
+
+def test_upsert_overwrites_delete_reuses_rows_and_state_persists(tmp_path):
+    vectors = random_vectors(20)
+    index = LocalVectorIndex(tmp_path, DIM, index_type="flat", quantization="none")
+    fill(index, vectors, metadata=lambda i: {"text": f"ticket {i}"})
+    assert len(index) == 20
+    assert index.search(vectors[3].tolist(), 1)[0][:1] == ("v3",)
+
+    # Same id again: overwritten in place, not duplicated
+    index.upsert([{"id": "v3", "values": vectors[4].tolist(), "metadata": {"text": "moved"}}])
+    assert len(index) == 20
+    assert {match[0] for match in index.search(vectors[4].tolist(), 2)} == {"v3", "v4"}
+
+    row = index.id_to_row["v5"]
+    index.delete(["v5", "missing"])
+    assert "v5" not in [match[0] for match in index.search(vectors[5].tolist(), 20)]
+    index.upsert([{"id": "new", "values": vectors[5].tolist(), "metadata": {}}])
+    assert index.id_to_row["new"] == row and index.size == 20
+
+    reopened = LocalVectorIndex(tmp_path, DIM, index_type="flat", quantization="none")
+    assert len(reopened) == 20
+    assert reopened.fetch(["v3", "v5"]) == {"v3": {"text": "moved"}}
+    assert reopened.search(vectors[5].tolist(), 1)[0][0] == "new"
+
+
+def test_ivf_search_recalls_exact_neighbours(tmp_path):
+    vectors = clustered_vectors(3000)
+    queries = clustered_vectors(50, seed=1)
+    index = LocalVectorIndex(tmp_path, DIM, index_type="ivf", quantization="none")
+    fill(index, vectors)
+    index.train_ann(nlist=64)
+    assert index.ann.trained
+
+    found = expected = 0
+    for query in queries:
+        exact = {match[0] for match in index.search(query.tolist(), 10, exact=True)}
+        approximate = {match[0] for match in index.search(query.tolist(), 10, nprobe=8)}
+        found += len(exact & approximate)
+        expected += len(exact)
+    assert found / expected >= 0.9
+
+    # Deleted rows drop out of IVF results; new rows are assigned incrementally
+    top = index.search(queries[0].tolist(), 1, nprobe=8)[0][0]
+    index.delete([top])
+    assert top not in [match[0] for match in index.search(queries[0].tolist(), 10, nprobe=8)]
+    index.upsert([{"id": "new", "values": queries[0].tolist(), "metadata": {}}])
+    assert index.search(queries[0].tolist(), 1, nprobe=1)[0][0] == "new"
+
+
+def test_filtered_search_only_scores_matching_rows(tmp_path):
+    vectors = clustered_vectors(400)
+
+    def metadata(i):
+        return {"project": "OPS" if i % 4 == 0 else "DATA", "status": "Open", "created_ts": JANUARY + i}
+
+    index = LocalVectorIndex(tmp_path, DIM, index_type="flat", quantization="none")
+    fill(index, vectors, metadata)
+    filters = normalize_filters({"project": "OPS", "created_before": JANUARY + 199})
+    found = index.search(vectors[1].tolist(), 100, filters=filters)
+
+    assert len(found) == 50
+    assert all(matches_filters(match[2], filters) for match in found)
+    # The unfiltered best match is outside the filter
+    assert index.search(vectors[1].tolist(), 1)[0][0] == "v1"
+    assert index.search(vectors[1].tolist(), 5, filters=normalize_filters({"project": "NONE"})) == []
+
+    # Writes invalidate the cached filter columns
+    index.upsert([{"id": "v1", "values": vectors[1].tolist(), "metadata": metadata(0)}])
+    assert index.search(vectors[1].tolist(), 1, filters=filters)[0][0] == "v1"
+
+
+def test_int8_scores_match_float32(tmp_path):
+    vectors = random_vectors(600)
+    query = vectors[7] + 0.1 * random_vectors(1, seed=1)[0]
+    exact = LocalVectorIndex(tmp_path / "flat", DIM, index_type="flat", quantization="none")
+    int8 = LocalVectorIndex(tmp_path / "int8", DIM, index_type="flat", quantization="int8")
+    fill(exact, vectors)
+    fill(int8, vectors)
+
+    assert int8.bytes_per_vector == DIM + 4
+    approximate = int8._scores(query / np.linalg.norm(query), None)
+    assert np.abs(approximate - exact._scores(query / np.linalg.norm(query), None)).max() < 0.02
+
+    expected = exact.search(query.tolist(), 10)
+    found = int8.search(query.tolist(), 10)
+    # The shortlist is rescored in float32, so ids and scores match exact search
+    assert [match[0] for match in found] == [match[0] for match in expected]
+    assert np.allclose([match[1] for match in found], [match[1] for match in expected], atol=1e-5)
+
+    # Reopening rebuilds the codes from the float32 rows on disk
+    reopened = LocalVectorIndex(tmp_path / "int8", DIM, index_type="flat", quantization="int8")
+    assert [match[0] for match in reopened.search(query.tolist(), 10)] == [match[0] for match in expected]
+
+
+def test_float16_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        LocalVectorIndex(tmp_path, DIM, quantization="float16")
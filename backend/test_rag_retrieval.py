@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from app.rag.backend import rrf_fuse, ticket_text
+from app.rag.rerank import diversify
+
+DOCS = [
+    {"id": "runbook.md", "source": "runbook.md", "content": "Rerun the bronze load after fixing the source file."},
+    {"id": "faq.md", "source": "faq.md", "content": "Dashboards read from the gold layer."},
+]
+
+
+@pytest.fixture
+def tickets(make_ticket):
+    return [
+        make_ticket("OPS-1", "Daily load fails"),
+        make_ticket("OPS-2", "Dashboard is slow"),
+        make_ticket("OPS-3", "Rows missing after merge"),
+        make_ticket("DATA-4", "Schema drift in orders"),
+        make_ticket("DATA-5", "Duplicate customer keys"),
+    ]
+
+
+@pytest.fixture
+def seeded(kb, tickets):
+    kb.store.add_jira_tickets(tickets)
+    kb.store.add_documents(DOCS)
+    kb.embedded.clear()
+    return kb
+
+
+def test_query_is_embedded_once_for_both_collections(seeded):
+    context = seeded.store.query_context("why did the daily load fail", n_tickets=2, n_docs=1,
+                                         mode="vector", rerank=False)
+    assert seeded.embedded == ["why did the daily load fail"]
+    assert len(context["similar_tickets"]["ids"][0]) == 2
+    assert len(context["relevant_docs"]["ids"][0]) == 1
+
+    # A precomputed embedding skips the embedding call entirely
+    seeded.embedded.clear()
+    seeded.store.query_context("another question", mode="vector", rerank=False, query_embedding=[0.5] * 768)
+    assert seeded.embedded == []
+
+
+def test_rrf_rewards_ids_ranked_high_in_several_lists():
+    vector = [("a", 0.9, {}), ("b", 0.8, {}), ("c", 0.7, {})]
+    lexical = [("c", 12.0, {}), ("a", 9.0, {}), ("d", 3.0, {})]
+    fused = rrf_fuse([vector, lexical], 3, k=60)
+    assert [match_id for match_id, _, _ in fused] == ["a", "c", "b"]
+    assert rrf_fuse([vector, vector], 1, k=60)[0][1] == 1.0
+
+
+def test_hybrid_search_finds_exact_ticket_keys(seeded):
+    found = seeded.store.query_similar_tickets("what happened in DATA-5", n_results=3, mode="hybrid", rerank=False)
+    assert found["ids"][0][0] == "DATA-5"
+
+    # Lexical mode answers without an embedding call
+    found = seeded.store.query_similar_tickets("OPS-3", n_results=1, mode="lexical", rerank=False)
+    assert found["ids"][0] == ["OPS-3"]
+    assert seeded.embedded == ["what happened in DATA-5"]
+
+    # Hybrid degrades to BM25 results when the query cannot be embedded
+    def unavailable(texts):
+        raise ConnectionError("embedding quota exhausted")
+
+    seeded.store._embed_uncached = unavailable
+    found = seeded.store.query_similar_tickets("merge rows missing", n_results=3, mode="hybrid", rerank=False)
+    assert found["ids"][0] == ["OPS-3"]
+
+
+def test_mmr_collapses_near_duplicates_and_prefers_diverse_results():
+    base, other = np.eye(4)[0], np.eye(4)[1]
+    vectors = {"a": base, "a2": base + 0.01 * other, "a3": base, "b": base + other,
+               "c": np.eye(4)[2], "d": np.eye(4)[3]}
+    matches = [(match_id, score, {"text": match_id}) for match_id, score in
+               (("a", 0.95), ("a2", 0.94), ("a3", 0.93), ("b", 0.9), ("c", 0.8), ("d", 0.5))]
+    picked = diversify(matches, 3, vectors, lambda_=0.5)
+
+    assert [match_id for match_id, _, _ in picked] == ["a", "c", "b"]
+    assert picked[0][2]["duplicate_count"] == 2 and picked[0][2]["duplicate_ids"] == ["a2", "a3"]
+    assert "duplicate_count" not in picked[1][2]
+    # Pure relevance keeps the ranking but still collapses duplicates
+    assert [match_id for match_id, _, _ in diversify(matches, 3, vectors, lambda_=1.0)] == ["a", "b", "c"]
+
+
+def test_reranked_search_returns_one_representative_per_duplicate_group(seeded, tickets, make_ticket):
+    # Six more copies of OPS-1, as a nightly failure leaves behind
+    seeded.store.add_jira_tickets([make_ticket(f"OPS-{i}", "Daily load fails") for i in range(10, 16)])
+
+    found = seeded.store.query_similar_tickets(ticket_text(tickets[0]), n_results=3, mode="vector", rerank=True)
+    assert len(found["ids"][0]) == 3
+    assert len(set(found["documents"][0])) == 3
+    assert found["documents"][0][0] == ticket_text(tickets[0])
+    assert found["metadatas"][0][0]["duplicate_count"] == 6
@@ -0,0 +1,123 @@
+import asyncio
+import types
+
+from app.services.rate_limiter import AdaptiveConcurrency, GeminiRateLimiter
+
+
+def test_async_waiters_are_served_in_order():
+    async def scenario():
+        concurrency = AdaptiveConcurrency(1)
+        await concurrency.aacquire()
+        served = []
+
+        async def waiter(i):
+            await concurrency.aacquire()
+            served.append(i)
+
+        tasks = [asyncio.create_task(waiter(i)) for i in range(4)]
+        await asyncio.sleep(0)
+        for _ in range(4):
+            concurrency.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return served, concurrency.in_flight
+
+    served, in_flight = asyncio.run(scenario())
+    assert served == [0, 1, 2, 3]
+    assert in_flight == 1
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        concurrency = AdaptiveConcurrency(1)
+        await concurrency.aacquire()
+        waiter = asyncio.create_task(concurrency.aacquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        concurrency.release()
+        await asyncio.wait_for(concurrency.aacquire(), 1)
+        return concurrency.in_flight
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_acall_caps_calls_in_flight():
+    limiter = GeminiRateLimiter(default_rpm=1_000_000, rate_limits={}, max_retries=0)
+    limiter._limiter("test-model").concurrency = AdaptiveConcurrency(2)
+    active = {"now": 0, "peak": 0}
+
+    async def call():
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        return True
+
+    async def scenario():
+        return await asyncio.gather(*(limiter.acall("test-model", call) for _ in range(8)))
+
+    assert all(asyncio.run(scenario()))
+    assert active["peak"] == 2
+    assert limiter.stats()["test-model"]["succeeded"] == 8
+
+
+def test_cancelled_calls_give_their_slots_back():
+    limiter = GeminiRateLimiter(default_rpm=1_000_000, rate_limits={}, max_retries=0)
+    limiter._limiter("test-model").concurrency = AdaptiveConcurrency(3)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        # Timed out the way _aembed_query times out a slow query embedding
+        for _ in range(3):
+            try:
+                await asyncio.wait_for(limiter.acall("test-model", hang), 0.01)
+            except asyncio.TimeoutError:
+                pass
+        # A leaked slot would leave this waiting forever
+        return await asyncio.wait_for(limiter.acall("test-model", asyncio.sleep, 0, "ok"), 1)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert limiter.stats()["test-model"]["in_flight"] == 0
+
+
+def test_cancelled_stream_gives_its_slot_back(monkeypatch):
+    from app.services import gemini_client as gemini_client_module
+    from app.services.gemini_client import GeminiClient
+
+    limiter = GeminiRateLimiter(default_rpm=1_000_000, rate_limits={}, max_retries=0)
+    monkeypatch.setattr(gemini_client_module, "gemini_limiter", limiter)
+
+    async def generate_content_stream(model, contents, config=None):
+        async def chunks():
+            # The model never sends its first chunk
+            await asyncio.sleep(10)
+            yield types.SimpleNamespace(text="{}")
+        return chunks()
+
+    client = GeminiClient(api_key="test")
+    client._client = types.SimpleNamespace(aio=types.SimpleNamespace(
+        models=types.SimpleNamespace(generate_content_stream=generate_content_stream)))
+
+    async def first_chunk():
+        async for chunk in client.astream("prompt", model="test-model"):
+            return chunk
+
+    try:
+        asyncio.run(asyncio.wait_for(first_chunk(), 0.05))
+    except asyncio.TimeoutError:
+        pass
+    assert limiter.stats()["test-model"]["in_flight"] == 0
+
+
+def test_ingest_without_api_key_is_skipped(tmp_path, monkeypatch, make_ticket):
+    from app.services.gemini_client import gemini_client
+    from app.rag.store_local import LocalRAGStore
+
+    monkeypatch.setattr(gemini_client, "api_key", "")
+    store = LocalRAGStore(tmp_path)
+    assert store.embedding_model is None
+    assert store.add_jira_tickets([make_ticket("OPS-1", "Ingestion failed")]) == {}
+    assert store.add_documents([{"id": "doc", "source": "doc.md", "content": "Runbook text"}]) == {}
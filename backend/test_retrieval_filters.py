@@ -0,0 +1,49 @@
+from app.rag.backend import matches_filters, normalize_filters, ticket_metadata
+from app.rag.store_pinecone import pinecone_filter
+
+# 2024-01-01 and 2024-02-01, UTC
+JANUARY, FEBRUARY = 1704067200, 1706745600
+
+
+def test_filters_are_normalized_to_value_lists_and_a_date_range():
+    filters = normalize_filters({"project": "OPS", "status": ["Open", "Done"], "issuetype": "",
+                                 "connection_id": 7, "created_after": "2024-01-01", "created_before": None})
+    assert filters == {"project": ["OPS"], "connection_id": ["7"], "status": ["Open", "Done"],
+                       "created_ts": (JANUARY, None)}
+    assert normalize_filters({"created_before": "01/Feb/24"}) == {"created_ts": (None, FEBRUARY)}
+    assert normalize_filters(None) == {}
+
+    metadata = ticket_metadata({"id": "OPS-12", "status": "Open", "issuetype": "Bug", "connection_id": 7,
+                                "created_ts": JANUARY + 60})
+    assert metadata["project"] == "OPS"
+    assert matches_filters(metadata, filters)
+    assert not matches_filters({**metadata, "status": "Blocked"}, filters)
+    assert not matches_filters({key: value for key, value in metadata.items() if key != "created_ts"}, filters)
+
+    assert pinecone_filter(filters) == {"project": {"$in": ["OPS"]}, "connection_id": {"$in": ["7"]},
+                                        "status": {"$in": ["Open", "Done"]}, "created_ts": {"$gte": JANUARY}}
+
+
+def test_project_filters_search_matching_namespaces_and_the_default_one(monkeypatch):
+    from app.rag.store_pinecone import PineconeRAGStore
+
+    class FakeIndex:
+        def __init__(self, namespaces):
+            self.namespaces = namespaces
+            self.queried = []
+
+        def describe_index_stats(self):
+            return {"namespaces": {namespace: {} for namespace in self.namespaces}}
+
+        def query(self, namespace, **options):
+            self.queried.append(namespace)
+            return {"matches": []}
+
+    monkeypatch.delenv("PINECONE_API_KEY", raising=False)
+    store = PineconeRAGStore()
+
+    for project, expected in ((["OPS"], ["", "OPS"]), (["Operations"], ["", "DATA", "OPS"])):
+        store.jira_index = FakeIndex(["", "OPS", "DATA"])
+        store._namespace_cache.clear()
+        store._query_matches("jira", [0.0], 5, normalize_filters({"project": project}), include_values=False)
+        assert sorted(store.jira_index.queried) == expected
@@ -0,0 +1,84 @@
+import asyncio
+
+from app.services.schema_compiler import compile_schema
+
+FIELD_CONFIG = {
+    "Story": {
+        "fields": {
+            "summary": {"name": "Summary", "required": True, "schema": {"type": "string"}},
+            "issuetype": {"name": "Issue Type", "required": True, "schema": {"type": "issuetype"}},
+            "assignee": {"name": "Assignee", "schema": {"type": "user"}},
+            "priority": {"name": "Priority", "schema": {"type": "priority"},
+                         "allowedValues": [{"name": "High"}, {"name": "Medium"}, {"name": "Low"}]},
+            "customfield_10016": {"name": "Story Points", "schema": {"type": "number"}},
+            "customfield_10100": {"name": "Team", "included": True, "schema": {"type": "option"},
+                                  "allowedValues": [{"value": "Data Platform"}, {"value": "Analytics"}]},
+            "customfield_10200": {"name": "Legacy Code", "schema": {"type": "string"}},
+        }
+    }
+}
+
+
+def test_compile_keeps_fillable_fields_only():
+    compiled = compile_schema(FIELD_CONFIG, "Story")
+    schema = compiled.prompt_schema()
+    assert list(schema) == ["summary", "priority", "story_points", "team"]
+    assert schema["summary"] == "string, required"
+    assert schema["team"] == "one of: Data Platform | Analytics"
+    assert compile_schema(FIELD_CONFIG, "Bug") is None
+
+
+def test_map_output_uses_jira_keys_and_allowed_spellings():
+    compiled = compile_schema(FIELD_CONFIG, "Story")
+    mapped = compiled.map_output({"summary": "Fix ingest", "Story Points": 3, "team": "data platform",
+                                  "priority": "HIGH", "notes": "kept"})
+    assert mapped == {"summary": "Fix ingest", "customfield_10016": 3, "customfield_10100": "Data Platform",
+                      "priority": "High", "notes": "kept"}
+
+
+def test_analyze_falls_back_when_output_is_not_an_object(monkeypatch):
+    """Valid JSON that is not an object ([] or "n/a") must not reach map_output."""
+    from app.agents import request_creator_agent
+    from app.rag.store import LazyRAGStore
+    from app.services.ai_service import ai_service
+    from app.services.gemini_client import gemini_client
+
+    def no_store():
+        raise RuntimeError("RAG disabled for this test")
+
+    outputs = []
+
+    async def agenerate(prompt, **options):
+        return outputs.pop(0)
+
+    monkeypatch.setattr(gemini_client, "api_key", "test")
+    monkeypatch.setattr(gemini_client, "agenerate", agenerate)
+    monkeypatch.setattr(request_creator_agent, "rag_store", LazyRAGStore(no_store))
+    compiled = compile_schema(FIELD_CONFIG, "Story")
+    for output in ("[]", '"n/a"'):
+        outputs.append(output)
+        result = asyncio.run(ai_service.extract_request_details(
+            "Nightly load is slow", use_cache=False, compiled_schema=compiled))
+        assert result["description"] == "Nightly load is slow"
+        assert result["summary"].startswith("New Request:")
+
+
+def test_analyze_prefers_the_connections_compiled_schema(kb, monkeypatch):
+    """A known connection wins over a hand-built jira_schema."""
+    from app.api.endpoints.requests import AnalyzeRequest, analyze_request
+    from app.models.connection import Connection
+    from app.services.ai_service import ai_service
+
+    connection = Connection(name="JIRA", type="jira", status="active", field_config=FIELD_CONFIG)
+    kb.db.add(connection)
+    kb.db.commit()
+    seen = {}
+
+    async def extract_request_details(context, files=None, jira_schema=None, **options):
+        seen.update(options)
+        return {}
+
+    monkeypatch.setattr(ai_service, "extract_request_details", extract_request_details)
+    asyncio.run(analyze_request(AnalyzeRequest(description="Nightly load is slow", connection_id=connection.id,
+                                               jira_schema={"summary": "Summary (Required)"}), kb.db))
+    assert seen["compiled_schema"].issue_type == "Story"
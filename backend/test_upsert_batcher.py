@@ -0,0 +1,68 @@
+import threading
+
+import requests
+import urllib3
+
+from app.rag.upsert_batcher import UpsertBatcher, is_transient, vector_payload_bytes
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def vectors(count: int, text: str = "x"):
+    return [{"id": f"v{i}", "values": [0.5] * 8, "metadata": {"text": text}} for i in range(count)]
+
+
+def test_batches_respect_vector_count_and_payload_bytes():
+    sent = []
+    lock = threading.Lock()
+
+    def upsert(batch):
+        with lock:
+            sent.append(len(batch))
+
+    with UpsertBatcher(upsert, max_vectors=4, workers=2) as batcher:
+        batcher.add(vectors(10))
+    assert sorted(sent) == [2, 4, 4]
+
+    sent.clear()
+    size = vector_payload_bytes(vectors(1, "y" * 100)[0])
+    batcher = UpsertBatcher(upsert, max_vectors=100, max_bytes=3 * size, workers=1)
+    batcher.add(vectors(7, "y" * 100))
+    report = batcher.close()
+    assert sent == [3, 3, 1]
+    assert all(batch["bytes"] <= 3 * size for batch in report["batches"])
+    assert report["upserted"] == 7
+
+
+def test_transient_errors_are_retried_and_permanent_ones_reported():
+    attempts = {}
+
+    def upsert(batch):
+        first = batch[0]["id"]
+        attempts[first] = attempts.get(first, 0) + 1
+        if first == "v0" and attempts[first] == 1:
+            raise HTTPError(503)
+        if first == "v2":
+            raise HTTPError(400)
+
+    batcher = UpsertBatcher(upsert, max_vectors=2, workers=1, max_retries=3, backoff_seconds=0)
+    batcher.add(vectors(6))
+    report = batcher.close()
+
+    assert (report["upserted"], report["failed"], report["retries"]) == (4, 2, 1)
+    assert report["failed_ids"] == ["v2", "v3"]
+    assert attempts == {"v0": 2, "v2": 1, "v4": 1}
+
+
+def test_only_network_errors_without_a_status_are_transient():
+    assert is_transient(HTTPError(503)) and is_transient(HTTPError(429))
+    assert not is_transient(HTTPError(422))
+    for error in (ConnectionResetError(), TimeoutError(), requests.exceptions.ReadTimeout(),
+                  urllib3.exceptions.ProtocolError("Connection aborted.")):
+        assert is_transient(error), error
+    for error in (ValueError("bad vector"), KeyError("values"), TypeError()):
+        assert not is_transient(error), error
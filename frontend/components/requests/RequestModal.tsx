@@ -67,29 +67,6 @@ export function RequestModal({ isOpen, onClose, request, onUpdate }: RequestModa
         }
     }, [request, isOpen]);
 
-    // Helper to construct schema for AI
-    const getJiraSchema = (issueType: string) => {
-        if (!activeConnection?.field_config || !issueType) return null;
-
-        const config = activeConnection.field_config[issueType];
-        if (!config || !config.fields) return null;
-
-        const schema: Record<string, string> = {};
-
-        Object.entries(config.fields).forEach(([key, field]: [string, any]) => {
-            if (field.included) {
-                // Create a description for the AI based on field type and name
-                let description = field.name;
-                if (field.required) description += " (Required)";
-                if (field.type === 'array') description += " (List of values)";
-
-                schema[key] = description;
-            }
-        });
-
-        return schema;
-    };
-
     const handleAnalyze = async () => {
         if (!formData.description) return;
 
@@ -105,16 +82,14 @@ export function RequestModal({ isOpen, onClose, request, onUpdate }: RequestModa
                 }
             }
 
-            // Get current JIRA schema to guide the AI
-            const jiraSchema = getJiraSchema(currentIssueType);
-            console.log('Sending JIRA Schema to AI:', jiraSchema);
-
-            // Call analyze endpoint with schema
-            const result = await api.analyzeRequest(formData.description, undefined, jiraSchema || undefined);
+            // The backend compiles this connection's JIRA schema to guide the AI
+            const result = await api.analyzeRequest(
+                formData.description, undefined, activeConnection?.id, currentIssueType || undefined
+            );
 
             console.log('AI Analysis Result:', result);
 
-            // Map fields directly since AI now uses our schema keys
+            // Map fields directly since the result is keyed by JIRA field keys
             setDynamicFields(prev => ({ ...prev, ...result }));
 
             // Update main form data
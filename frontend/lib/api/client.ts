@@ -47,10 +47,10 @@ export const api = {
       method: 'PATCH',
       body: JSON.stringify(updates)
     }),
-  analyzeRequest: (description: string, files?: string[], jiraSchema?: Record<string, any>) =>
+  analyzeRequest: (description: string, files?: string[], connectionId?: number, issueType?: string) =>
     apiCall<any>('/requests/analyze', {
       method: 'POST',
-      body: JSON.stringify({ description, files, jira_schema: jiraSchema })
+      body: JSON.stringify({ description, files, connection_id: connectionId, issue_type: issueType })
     }),
 
   releaseRequests: (ids: number[]) =>